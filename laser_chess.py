@@ -1,7 +1,7 @@
 import numpy as np
-from typing import Sequence, Tuple, Union
+import random
+from typing import Iterator, NamedTuple, Sequence, Tuple, Union
 from laser_chess_consts import *
-from copy import deepcopy
 
 """
 LaserChess, invented by Luke Hooper and Michael Larson, is a strategy game
@@ -73,7 +73,7 @@ def make_empty_board() -> np.ndarray:
   Makes a board with just the laser pieces pointing vertically
   into the board.
   """
-  board = np.zeros((ROWS, COLUMNS))
+  board = np.zeros((ROWS, COLUMNS), dtype=BOARD_DTYPE)
   board[0, 0] = LASER_V2
   board[ROWS - 1, COLUMNS - 1] = LASER_V1
   return board
@@ -137,6 +137,213 @@ def coord_within_bounds(location: Tuple[int, int]) -> bool:
   """
   return (0 <= location[0] < ROWS) and (0 <= location[1] < COLUMNS)
 
+"""
+Precomputed tables for the laser.
+
+Squares are numbered row by row from 0 to ROWS * COLUMNS - 1, so the laser
+can walk the flattened board by square number instead of adding tuples.
+The laser's direction is numbered by its index in LASER_DIRECTIONS.
+"""
+
+LASER_DIRECTIONS = (N, E, S, W)
+DIRECTION_INDEX = {direction: i for i, direction in enumerate(LASER_DIRECTIONS)}
+STOP = -1  # the laser goes no further
+
+# SQUARE_COORD[square] is the board coordinate of that square number.
+SQUARE_COORD = tuple((i, j) for i in range(ROWS) for j in range(COLUMNS))
+
+# LASER_STEP[direction][square] is the square the laser enters next,
+# or STOP if it leaves the board.
+LASER_STEP = tuple(
+  tuple((i + dy) * COLUMNS + (j + dx) if coord_within_bounds((i + dy, j + dx))
+        else STOP for i, j in SQUARE_COORD)
+  for dy, dx in LASER_DIRECTIONS)
+
+def _reflect(piece: int, direction: Tuple[int, int]) -> Tuple[int, bool]:
+  """
+  Finds what happens to a laser going in direction when it enters a square
+  holding piece. Returns the direction index the laser leaves in (or STOP),
+  and whether the piece is hit (and so eliminated).
+  """
+  piece_type = find_piece(piece)
+  orient = find_orient(piece)
+  if piece_type == DEFLECTOR:
+    mirror = {FLEC_NE: {W: N, S: E},
+              FLEC_NW: {E: N, S: W},
+              FLEC_SW: {E: S, N: W},
+              FLEC_SE: {N: E, W: S}}[orient]
+    if direction in mirror:
+      return (DIRECTION_INDEX[mirror[direction]], False)
+    return (STOP, True)
+  elif piece_type == SWITCH:
+    mirror = {SWITCH_NESW: {N: W, E: S, S: E, W: N},
+              SWITCH_NWSE: {N: E, E: N, S: W, W: S}}[orient]
+    return (DIRECTION_INDEX[mirror[direction]], False)
+  elif piece_type == DEFENDER:
+    # The laser is blocked only if it hits the shield face on.
+    shield_hit_by = {FEND_E: W, FEND_N: S, FEND_W: E, FEND_S: N}[orient]
+    return (STOP, direction != shield_hit_by)
+  elif piece_type == KING:
+    return (STOP, True)
+  else: # empty squares and lasers let the laser through
+    return (DIRECTION_INDEX[direction], False)
+
+# REFLECTION_TABLE[piece][direction index] is (outgoing direction index or
+# STOP, whether the piece is hit), for every piece integer including 0.
+REFLECTION_TABLE = {
+  piece: tuple(_reflect(piece, direction) for direction in LASER_DIRECTIONS)
+  for piece in INT_TO_PRETTY if not piece is None}
+
+"""
+Precomputed tables for generating moves.
+"""
+
+# The order moves are tried in for each piece.
+MOVE_ORDER = tuple(LEGAL_MOVES)
+ROTATE = -2  # stands for "the piece stays on its square"
+
+# MOVE_TARGETS[square] lists (move_type, square the piece ends up on) for
+# every move in MOVE_ORDER, where the square is ROTATE for rotations and
+# STOP if the move leaves the board.
+MOVE_TARGETS = tuple(
+  tuple((move, ROTATE) if move in ROTATION_MOVES else
+        (move, (i + move[0]) * COLUMNS + (j + move[1])
+               if coord_within_bounds((i + move[0], j + move[1])) else STOP)
+        for move in MOVE_ORDER)
+  for i, j in SQUARE_COORD)
+
+# DISTINCT_ROTATIONS[piece_type] are the rotations of that piece that each
+# lead to a different position. CW and ACW are the same for pieces with 2
+# orientations, and rotating a king does nothing.
+ROTATION_ORDER = tuple(move for move in MOVE_ORDER if move in ROTATION_MOVES)
+DISTINCT_ROTATIONS = {
+  piece_type: frozenset(
+    ROTATION_ORDER[:min(num_orientations(piece_type) - 1, len(ROTATION_ORDER))])
+  for piece_type in PIECE_TYPES}
+
+# FORBIDDEN_SQUARES[player] are the square numbers player's pieces may
+# never move onto.
+FORBIDDEN_SQUARES = {
+  FIRST: frozenset(square for square, (i, j) in enumerate(SQUARE_COORD)
+                   if j == 0 or (i, j) in {(0, COLUMNS - 2),
+                                           (ROWS - 1, COLUMNS - 2)}),
+  SECOND: frozenset(square for square, (i, j) in enumerate(SQUARE_COORD)
+                    if j == COLUMNS - 1 or (i, j) in {(0, 1), (ROWS - 1, 1)})}
+
+"""
+Zobrist keys for identifying positions.
+
+Every (square, piece) pair gets a random 64-bit number, and so does the
+second player being the one to move. A position's key is the XOR of the
+numbers of everything in it, so a move only has to XOR in and out the
+squares it changes. The numbers come from a fixed seed so keys are the same
+in every run and every process.
+"""
+
+ZOBRIST_SEED = 20210601
+_zobrist_random = random.Random(ZOBRIST_SEED)
+
+# ZOBRIST_PIECES[square][piece] is the number of piece on that square number.
+# Empty squares are 0, so they change nothing.
+ZOBRIST_PIECES = tuple(
+  {piece: (_zobrist_random.getrandbits(64) if piece != 0 else 0)
+   for piece in REFLECTION_TABLE}
+  for _ in SQUARE_COORD)
+ZOBRIST_SECOND = _zobrist_random.getrandbits(64)
+
+def zobrist_board_key(board: np.ndarray) -> int:
+  """
+  Computes the Zobrist key of the pieces on board from scratch (not
+  counting whose turn it is).
+  """
+  key = 0
+  for square, piece in enumerate(np.ravel(board).tolist()):
+    key ^= ZOBRIST_PIECES[square][piece]
+  return key
+
+def square_mask(coords: Sequence[Tuple[int, int]]) -> int:
+  """
+  Returns the bitmask with bit row * COLUMNS + column set for each of the
+  coordinates.
+  """
+  mask = 0
+  for i, j in coords:
+    mask |= 1 << (i * COLUMNS + j)
+  return mask
+
+class LaserPath(NamedTuple):
+  """
+  Where a player's laser goes if it is fired: the squares it passes (in
+  order), the same squares as a bitmask (see square_mask), and the piece
+  it hits on the last square, or None if it hits nothing.
+  """
+  path: Tuple[Tuple[int, int], ...]
+  mask: int
+  piece: Union[int, None]
+
+class MoveRecord(NamedTuple):
+  """
+  Everything LaserChess.push changes on the board, so that LaserChess.pop
+  can put it back exactly as it was.
+
+  new_location is None for rotations; old_piece is the piece at location
+  before the move (so its orientation before a rotation). captured_piece
+  and captured_coord are None if the laser eliminated nothing. turn and
+  winner are the values before the move was made, and so is board_key,
+  the Zobrist key of the board.
+  """
+  location: Tuple[int, int]
+  move_type: Union[Tuple[int, int], int]
+  new_location: Union[Tuple[int, int], None]
+  old_piece: int
+  captured_piece: Union[int, None]
+  captured_coord: Union[Tuple[int, int], None]
+  turn: int
+  winner: int
+  board_key: int
+
+class BoardState():
+  """
+  A compact snapshot of a Laser Chess position: the board as an 8 x 10
+  int8 array, whose turn it is, and the winner. It is cheap to copy and
+  to turn into bytes, for keeping many positions around.
+
+  The board is indexed exactly like LaserChess.board.
+  """
+  __slots__ = ('board', 'turn', 'winner')
+
+  def __init__(self, board: np.ndarray, turn: int = FIRST, winner: int = 0):
+    """
+    requires: board is an 8 x 10 int8 Numpy array (not copied)
+              turn is FIRST or SECOND, winner is FIRST, SECOND or 0
+    """
+    self.board = board
+    self.turn = turn
+    self.winner = winner
+
+  def copy(self) -> 'BoardState':
+    """
+    Returns a copy of the state that doesn't share the board.
+    """
+    return BoardState(self.board.copy(), self.turn, self.winner)
+
+  def to_bytes(self) -> bytes:
+    """
+    Packs the state into ROWS * COLUMNS + 2 bytes: the board row by row,
+    then the turn and the winner.
+    """
+    return self.board.tobytes() + \
+      np.array((self.turn, self.winner), dtype=BOARD_DTYPE).tobytes()
+
+  @classmethod
+  def from_bytes(cls, data: bytes) -> 'BoardState':
+    """
+    Unpacks a state packed by to_bytes.
+    """
+    values = np.frombuffer(data, dtype=BOARD_DTYPE)
+    board = values[:ROWS * COLUMNS].reshape((ROWS, COLUMNS)).copy()
+    return cls(board, int(values[-2]), int(values[-1]))
+
 class LaserChess():
   """
   The LaserChess object is the representation of the
@@ -173,9 +380,187 @@ class LaserChess():
     assert KING_1 in setup_method # first player king
     assert KING_2 in setup_method # second player king
 
-    self.board = deepcopy(setup_method)
+    self.board = np.array(setup_method, dtype=BOARD_DTYPE)
     self.turn = player_to_move
     self.winner = 0
+    self._move_stack = []
+    self.rehash()
+
+  @classmethod
+  def from_state(cls, state: BoardState) -> 'LaserChess':
+    """
+    Makes a game from a BoardState, without checking the board again.
+    The game doesn't share the state's board.
+    """
+    lzch = cls.__new__(cls)
+    lzch.board = state.board.copy()
+    lzch.turn = state.turn
+    lzch.winner = state.winner
+    lzch._move_stack = []
+    lzch.rehash()
+    return lzch
+
+  def state(self) -> BoardState:
+    """
+    Returns a BoardState snapshot of the game, which doesn't share the board.
+    """
+    return BoardState(self.board.copy(), self.turn, self.winner)
+
+  def copy(self) -> 'LaserChess':
+    """
+    Returns a copy of the game, much cheaper than deepcopy. Moves pushed
+    before the copy can still be popped from it.
+    """
+    lzch = self.from_state(BoardState(self.board, self.turn, self.winner))
+    # pop puts back the dicts saved by push and changes them afterwards,
+    # so the copy gets its own
+    lzch._move_stack = [(record, dict(laser_paths), dict(occupied),
+                         dict(kings))
+                        for record, laser_paths, occupied, kings
+                        in self._move_stack]
+    lzch._laser_paths = dict(self._laser_paths)
+    return lzch
+
+  @property
+  def zobrist_key(self) -> int:
+    """
+    The 64-bit Zobrist key of the position: the pieces on the board and
+    whose turn it is. Equal positions have equal keys.
+    """
+    if self.turn == SECOND:
+      return self._board_key ^ ZOBRIST_SECOND
+    return self._board_key
+
+  def rehash(self) -> None:
+    """
+    Recomputes the Zobrist key, the occupied squares and the kings from
+    scratch, and forgets the cached laser paths. They are all kept up to
+    date by every move and laser shot, so this is only needed after
+    changing self.board directly.
+    """
+    self._board_key = zobrist_board_key(self.board)
+    self._laser_paths = {FIRST: None, SECOND: None}
+    self._occupied = {FIRST: 0, SECOND: 0}
+    self._kings = {FIRST: None, SECOND: None}
+    for square, piece in enumerate(self.board.ravel().tolist()):
+      if piece != 0:
+        player = find_player(piece)
+        self._occupied[player] |= 1 << square
+        if find_piece(piece) == KING:
+          self._kings[player] = SQUARE_COORD[square]
+
+  def piece_count(self, player: int) -> int:
+    """
+    Returns how many pieces player has on the board.
+    """
+    return bin(self._occupied[player]).count("1")
+
+  def king_coord(self, player: int) -> Union[Tuple[int, int], None]:
+    """
+    Returns where player's king is, or None if it has been captured.
+    """
+    return self._kings[player]
+
+  def laser_engaged_pieces(self) -> int:
+    """
+    Returns how many pieces of FIRST minus how many pieces of SECOND are
+    on the path of either laser (the lasers included).
+    """
+    mask = self.laser_path(FIRST).mask | self.laser_path(SECOND).mask
+    return bin(mask & self._occupied[FIRST]).count("1") - \
+           bin(mask & self._occupied[SECOND]).count("1")
+
+  def laser_path(self, player: int) -> LaserPath:
+    """
+    Returns where player's laser would go if it were fired now, as a
+    LaserPath, without firing it.
+
+    The paths of both lasers are cached. A move can only change a laser's
+    path if it changes a square the laser passes, so after each change to
+    the board only the lasers passing the changed squares are traced again.
+
+    requires: player is FIRST or SECOND
+    """
+    laser_path = self._laser_paths[player]
+    if laser_path is None:
+      path, hit = self._trace_laser(player)
+      laser_path = LaserPath(tuple(path), square_mask(path),
+                             self.board[path[-1]] if hit else None)
+      self._laser_paths[player] = laser_path
+    return laser_path
+
+  def laser_paths_after_move(self, location: Tuple[int, int],
+                             move_type: Union[Tuple[int, int], int]) \
+      -> Tuple[LaserPath, LaserPath]:
+    """
+    Returns the LaserPath of FIRST's and SECOND's laser as they would be
+    right after the piece on location makes move_type (before its laser is
+    fired), without making the move. The cached path of a laser the move
+    doesn't touch is returned as it is.
+
+    requires: move_type is a legal move of the piece on location
+              (see legal_moves)
+    """
+    square = location[0] * COLUMNS + location[1]
+    piece = self.board[location]
+    if move_type in ROTATION_MOVES:
+      piece_type = find_piece(piece)
+      orient = (find_orient(piece) + move_type) % num_orientations(piece_type)
+      changes = {square: make_piece(find_player(piece), piece_type, orient)}
+    else:
+      new_square = square + move_type[0] * COLUMNS + move_type[1]
+      changes = {square: self.board.flat[new_square], new_square: piece}
+    changed = 0
+    for changed_square in changes:
+      changed |= 1 << int(changed_square)
+
+    laser_paths = []
+    for player in (FIRST, SECOND):
+      laser_path = self.laser_path(player)
+      if laser_path.mask & changed:
+        path, hit = self._trace_laser(player, changes)
+        end_square = path[-1][0] * COLUMNS + path[-1][1]
+        laser_path = LaserPath(tuple(path), square_mask(path),
+                               changes.get(end_square,
+                                           self.board.flat[end_square])
+                               if hit else None)
+      laser_paths.append(laser_path)
+    return tuple(laser_paths)
+
+  def _squares_changed(self, mask: int) -> None:
+    """
+    Forgets the cached laser paths passing any of the squares in mask.
+    """
+    laser_paths = self._laser_paths
+    for player in PLAYER:
+      if laser_paths[player] is not None and laser_paths[player].mask & mask:
+        laser_paths[player] = None
+
+  def _track_swap(self, location: Tuple[int, int],
+                  new_location: Tuple[int, int]) -> None:
+    """
+    Updates the Zobrist key, the cached laser paths, the occupied squares
+    and the kings for the pieces on location and new_location swapping
+    places. Call it before swapping them on the board.
+    """
+    square = int(location[0] * COLUMNS + location[1])
+    new_square = int(new_location[0] * COLUMNS + new_location[1])
+    piece = self.board[location]
+    new_piece = self.board[new_location]
+    self._board_key ^= ZOBRIST_PIECES[square][piece] \
+                       ^ ZOBRIST_PIECES[new_square][new_piece] \
+                       ^ ZOBRIST_PIECES[square][new_piece] \
+                       ^ ZOBRIST_PIECES[new_square][piece]
+    swapped = (1 << square) | (1 << new_square)
+    self._squares_changed(swapped)
+    # a piece moving to an empty square, or a switch swapping with a
+    # deflector or defender, which are the same player's or not
+    player = find_player(piece)
+    self._occupied[player] ^= swapped
+    if new_piece != 0:
+      self._occupied[find_player(new_piece)] ^= swapped
+    if find_piece(piece) == KING:
+      self._kings[player] = (int(new_location[0]), int(new_location[1]))
 
   def print_winner(self) -> None:
     if self.winner == FIRST:
@@ -224,7 +609,12 @@ class LaserChess():
       piece = find_piece(coord_piece)
       orient = find_orient(coord_piece)
       orient = (orient + move_type) % num_orientations(piece)
-      self.board[location] = make_piece(player, piece, orient)
+      new_piece = make_piece(player, piece, orient)
+      square = location[0] * COLUMNS + location[1]
+      self._board_key ^= ZOBRIST_PIECES[square][coord_piece] \
+                         ^ ZOBRIST_PIECES[square][new_piece]
+      self._squares_changed(1 << int(square))
+      self.board[location] = new_piece
       move_is_made = True
     elif move_type in MOVE_MOVES:
       new_location = tuple_add(location, move_type)
@@ -243,11 +633,13 @@ class LaserChess():
         move_is_made = False
       elif self.board[new_location] == 0:
         move_is_made = True
+        self._track_swap(location, new_location)
         self.board[location], self.board[new_location] = \
           self.board[new_location], self.board[location]
       elif find_piece(self.board[location]) == SWITCH \
           and find_piece(self.board[new_location]) in {DEFLECTOR, DEFENDER}:
         move_is_made = True
+        self._track_swap(location, new_location)
         self.board[location], self.board[new_location] = \
           self.board[new_location], self.board[location]
       else:
@@ -255,6 +647,49 @@ class LaserChess():
             
     return move_is_made
 
+  def legal_moves(self, player: int = None, distinct: bool = False) \
+      -> Iterator[Tuple[Tuple[int, int], Union[Tuple[int, int], int]]]:
+    """
+    Generates every (location, move_type) pair that make_move accepts for
+    player (or self.turn), straight from the rules instead of trying each
+    move: own pieces may always rotate, and may move to an empty adjacent
+    square (or a switch may swap with an adjacent deflector or defender)
+    unless it is a laser or the square is forbidden for player.
+
+    If distinct is True, only one move is generated for each position the
+    moves lead to: kings aren't rotated (it changes nothing), and switches
+    and lasers, with only 2 orientations, are only rotated one way.
+
+    Squares are taken row by row and moves in MOVE_ORDER, the same order
+    laser_chess_ai has always tried them in.
+
+    requires: player is FIRST or SECOND, or None
+    """
+    if player is None:
+      player = self.turn
+    board = self.board.ravel().tolist()
+    forbidden = FORBIDDEN_SQUARES[player]
+
+    for square, piece in enumerate(board):
+      if piece * player <= 0: # empty, or the other player's piece
+        continue
+      coord = SQUARE_COORD[square]
+      piece_type = find_piece(piece)
+      if distinct:
+        rotations = DISTINCT_ROTATIONS[piece_type]
+      for move, new_square in MOVE_TARGETS[square]:
+        if new_square == ROTATE:
+          if not distinct or move in rotations:
+            yield (coord, move)
+        elif piece_type == LASER or new_square == STOP \
+             or new_square in forbidden:
+          continue
+        elif board[new_square] == 0:
+          yield (coord, move)
+        elif piece_type == SWITCH and \
+             find_piece(board[new_square]) in {DEFLECTOR, DEFENDER}:
+          yield (coord, move)
+
   def _shoot_laser_path_piece(self, player_turn = None, capture = True):
     """
     The player in player_turn shoots the laser. This returns the path of the
@@ -274,117 +709,67 @@ class LaserChess():
     if self.winner != 0: # or self.movemade == False:
       return (destroyed_piece, laser_path)
 
-    piece_captured = False
+    laser_path, piece_captured = self._trace_laser(self.turn)
 
-    if self.turn == SECOND:
-      laser_coord = (0, 0)
-      if LASER_HORT == find_orient(self.board[laser_coord]):
-        laser_dir = E
-      else:
-        laser_dir = S
-    else: # self.turn == FIRST
-      laser_coord = (ROWS - 1, COLUMNS - 1)
-      if LASER_HORT == find_orient(self.board[laser_coord]):
-        laser_dir = W
-      else:
-        laser_dir = N
-    
-    while coord_within_bounds(laser_coord):
-      laser_path.append(laser_coord)
-      coord_piece = self.board[laser_coord]
-
-      if find_piece(coord_piece) == DEFLECTOR:
-        if find_orient(coord_piece) == FLEC_NE:
-          if laser_dir == W:
-            laser_dir = N
-          elif laser_dir == S:
-            laser_dir = E
-          else:
-            piece_captured = True
-            break
-        elif find_orient(coord_piece) == FLEC_NW:
-          if laser_dir == E:
-            laser_dir = N
-          elif laser_dir == S:
-            laser_dir = W
-          else:
-            piece_captured = True
-            break
-        elif find_orient(coord_piece) == FLEC_SW:
-          if laser_dir == E:
-            laser_dir = S
-          elif laser_dir == N:
-            laser_dir = W
-          else:
-            piece_captured = True
-            break
-        elif find_orient(coord_piece) == FLEC_SE:
-          if laser_dir == N:
-            laser_dir = E
-          elif laser_dir == W:
-            laser_dir = S
-          else:
-            piece_captured = True
-            break
-        else:
-          assert False, "invalid orientation"
-      elif find_piece(coord_piece) == SWITCH:
-        if find_orient(coord_piece) == SWITCH_NESW:
-          if laser_dir == N:
-            laser_dir = W
-          elif laser_dir == E:
-            laser_dir = S
-          elif laser_dir == S:
-            laser_dir = E
-          elif laser_dir == W:
-            laser_dir = N
-        elif find_orient(coord_piece) == SWITCH_NWSE:
-          if laser_dir == N:
-            laser_dir = E
-          elif laser_dir == E:
-            laser_dir = N
-          elif laser_dir == S:
-            laser_dir = W
-          elif laser_dir == W:
-            laser_dir = S
-        else:
-          assert False, "invalid orientation"
-      elif find_piece(coord_piece) == DEFENDER:
-        if find_orient(coord_piece) == FEND_E:
-          if laser_dir != W:
-            piece_captured = True
-        elif find_orient(coord_piece) == FEND_N:
-          if laser_dir != S:
-            piece_captured = True
-        elif find_orient(coord_piece) == FEND_W:
-          if laser_dir != E:
-            piece_captured = True
-        elif find_orient(coord_piece) == FEND_S:
-          if laser_dir != N:
-            piece_captured = True
-        else:
-          assert False, "invalid orientation"
-        break
-      elif find_piece(coord_piece) == KING:
-        king_owner = find_player(coord_piece)
-        
-        # winner is the opponent of the owner's shot king
-        if capture == True:
-          self.winner = -king_owner
-        piece_captured = True
-        break
-      elif find_piece(coord_piece) in {LASER, 0}:
-        assert True
-      else:
-        assert False, "invalid piece"
-      laser_coord = tuple_add(laser_coord, laser_dir)
-
-    if capture and piece_captured:
-      destroyed_piece = self.board[laser_coord]
-      self.board[laser_coord] = 0
+    if piece_captured and capture:
+      destroyed_piece = self._laser_capture(laser_path[-1])
 
     self.turn = -self.turn  # change turns
     return (destroyed_piece, laser_path)
+
+  def _laser_capture(self, laser_coord: Tuple[int, int]) -> int:
+    """
+    Eliminates the piece hit by a laser at laser_coord, and returns it.
+    If it is a king, the opponent of its owner wins.
+    """
+    coord_piece = self.board[laser_coord]
+    player = find_player(coord_piece)
+    if find_piece(coord_piece) == KING:
+      # winner is the opponent of the owner's shot king
+      self.winner = -player
+      self._kings[player] = None
+    square = int(laser_coord[0] * COLUMNS + laser_coord[1])
+    self._board_key ^= ZOBRIST_PIECES[square][coord_piece]
+    self._squares_changed(1 << square)
+    self._occupied[player] &= ~(1 << square)
+    self.board[laser_coord] = 0
+    return coord_piece
+
+  def _trace_laser(self, player: int, changes: dict = None) \
+      -> Tuple[list, bool]:
+    """
+    Follows the laser of player from its corner through the board, without
+    changing anything. Returns the list of squares the laser passes, and
+    whether the piece on the last square is hit.
+
+    If changes is given, the laser is traced as if the board had the piece
+    changes[square] on each of its square numbers instead.
+
+    requires: player is FIRST or SECOND
+    """
+    board = self.board.ravel().tolist()
+    if changes:
+      for square, piece in changes.items():
+        board[square] = piece
+    if player == SECOND:
+      square = 0
+      horizontal, vertical = E, S
+    else: # player == FIRST
+      square = ROWS * COLUMNS - 1
+      horizontal, vertical = W, N
+    if LASER_HORT == find_orient(board[square]):
+      direction = DIRECTION_INDEX[horizontal]
+    else:
+      direction = DIRECTION_INDEX[vertical]
+
+    laser_path = []
+    while square != STOP:
+      laser_path.append(SQUARE_COORD[square])
+      direction, hit = REFLECTION_TABLE[board[square]][direction]
+      if direction == STOP:
+        return (laser_path, hit)
+      square = LASER_STEP[direction][square]
+    return (laser_path, False)
                                
   def shoot_laser(self, player_turn = None) -> Union[int, None]:
     """
@@ -436,6 +821,84 @@ class LaserChess():
       self.winner = -find_player(piece_eliminated) # other player wins
     return (valid_move, piece_eliminated)
 
+  def push(self, location: Tuple[int, int], \
+           move_type: Union[Tuple[int, int], int], \
+           player_turn = None, laser = True) -> Union[MoveRecord, None]:
+    """
+    Makes the move like move_then_laser does (or just like make_move if
+    laser is False), but remembers what the move changed so that pop can
+    take it back. This lets a search walk the game tree on one board
+    instead of copying it for every move.
+
+    Returns the MoveRecord of the move, or None if the move is invalid,
+    in which case nothing changes.
+
+    requires: location is within the board and move_type is a valid mode
+    """
+    prev_turn = self.turn
+    prev_winner = self.winner
+    prev_key = self._board_key
+    prev_laser_paths = dict(self._laser_paths)
+    prev_occupied = dict(self._occupied)
+    prev_kings = dict(self._kings)
+    if not player_turn is None:
+      self.turn = player_turn
+    old_piece = self.board[location]
+
+    if not self.make_move(location, move_type, self.turn):
+      self.turn = prev_turn
+      return None
+
+    if move_type in MOVE_MOVES:
+      new_location = (location[0] + move_type[0], location[1] + move_type[1])
+    else:
+      new_location = None
+
+    # The laser is fired like _shoot_laser_path_piece does, but its path
+    # comes from the cache when the move didn't touch it.
+    captured_piece = None
+    captured_coord = None
+    if laser and self.winner == 0:
+      laser_path = self.laser_path(self.turn)
+      if not laser_path.piece is None:
+        captured_coord = laser_path.path[-1]
+        captured_piece = self._laser_capture(captured_coord)
+      self.turn = -self.turn
+
+    record = MoveRecord(location, move_type, new_location, old_piece,
+                        captured_piece, captured_coord, prev_turn, prev_winner,
+                        prev_key)
+    self._move_stack.append((record, prev_laser_paths, prev_occupied,
+                             prev_kings))
+    return record
+
+  def pop(self) -> MoveRecord:
+    """
+    Takes back the last move made by push, restoring the board, the turn
+    and the winner. Returns the MoveRecord of the move taken back.
+
+    requires: there is a move made by push that hasn't been popped
+    """
+    record, laser_paths, occupied, kings = self._move_stack.pop()
+
+    # The laser fired after the move, so its capture is put back first.
+    if not record.captured_coord is None:
+      self.board[record.captured_coord] = record.captured_piece
+
+    if record.new_location is None:
+      self.board[record.location] = record.old_piece
+    else:
+      self.board[record.location], self.board[record.new_location] = \
+        self.board[record.new_location], self.board[record.location]
+
+    self.turn = record.turn
+    self.winner = record.winner
+    self._board_key = record.board_key
+    self._laser_paths = laser_paths
+    self._occupied = occupied
+    self._kings = kings
+    return record
+
   def __str__(self) -> str:
     """
     Returns the string representing the board as a bunch of geometric shapes.
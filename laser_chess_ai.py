@@ -1,26 +1,276 @@
 import laser_chess
 from laser_chess import LaserChess
 from laser_chess_consts import *
+from laser_chess_batch import boards_after_moves, trace_lasers
+from laser_chess_tt import EXACT, LOWER, UPPER, TranspositionTable, \
+    position_key
 
 import numpy as np
-from typing import Tuple, List, Union, Callable
-from math import inf
-from copy import deepcopy
+from typing import TYPE_CHECKING, Tuple, List, NamedTuple, Union, Callable
+from math import inf, nextafter
+import time
+
+if TYPE_CHECKING:
+    from laser_chess_book import OpeningBook
+    from laser_chess_tablebase import Tablebases
 
 PIECE_VALUE = 5
 KING_VALUE = 15 * PIECE_VALUE
 FUTURE_SIGHT = 0.6
 
+# The deepest iterative_deepening goes, however much time is left.
+MAX_DEPTH = 32
+
+class SearchTimeout(Exception):
+    """Raised inside a search when its deadline passes."""
+
 # Type alliases:
 MoveType = Union[int, Tuple[int, int]]  # MoveType is in LEGAL_MOVES
 CoordType = Tuple[int, int]  # CoordType is between (0, 0) and (7, 9) inclusive
 
-def minimax(lzch: LaserChess, depth: int, max_player: int) \
+# How many moves past the nominal depth quiescence search may look.
+QUIESCENCE_DEPTH = 2
+
+# How many killer moves are kept for each ply.
+KILLERS_PER_PLY = 2
+
+# How much shallower the search after a null move is than the position's.
+NULL_MOVE_REDUCTION = 2
+
+# Late move reductions search quiet moves one move shallower once this
+# many moves of a position have been searched, at depth LMR_MIN_DEPTH and
+# deeper.
+LMR_FULL_MOVES = 3
+LMR_MIN_DEPTH = 3
+
+def move_square_mask(coord: CoordType, move: MoveType) -> int:
+    """The squares (as a laser_chess.square_mask) a move changes."""
+    mask = 1 << (coord[0] * COLUMNS + coord[1])
+    if move in MOVE_MOVES:
+        mask |= 1 << ((coord[0] + move[0]) * COLUMNS + coord[1] + move[1])
+    return mask
+
+class SearchStats:
+    """Counts what a search does, and times where it spends it. Pass one
+    to minimax or iterative_deepening to fill it in; without one, the
+    search only checks that it is None.
+
+    nodes[ply] is how many positions were searched at each ply, and
+    quiescence_nodes how many more quiescence search went through past
+    them. leaves is how many positions were evaluated, and cutoffs how
+    many beta cutoffs there were, first_move_cutoffs of them at the first
+    move tried. The times are in seconds. push_time is the time spent in
+    the search's pushes (its move_then_laser, firing the laser included).
+    laser_time is the time spent tracing both lasers before evaluating or
+    generating moves, which then take the paths from the board's cache."""
+
+    def __init__(self):
+        self.nodes = []
+        self.quiescence_nodes = 0
+        self.leaves = 0
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+        self.move_generation_time = 0.0
+        self.push_time = 0.0
+        self.laser_time = 0.0
+        self.evaluate_time = 0.0
+        self.elapsed = 0.0
+
+    @property
+    def total_nodes(self) -> int:
+        return sum(self.nodes) + self.quiescence_nodes
+
+    @property
+    def nodes_per_second(self) -> float:
+        if self.elapsed == 0:
+            return 0.0
+        return self.total_nodes / self.elapsed
+
+    @property
+    def first_move_cutoff_rate(self) -> float:
+        if self.cutoffs == 0:
+            return 0.0
+        return self.first_move_cutoffs / self.cutoffs
+
+    def visit(self, ply: int) -> None:
+        if len(self.nodes) <= ply:
+            self.nodes.extend([0] * (ply + 1 - len(self.nodes)))
+        self.nodes[ply] += 1
+
+    def cutoff(self, first_move: bool) -> None:
+        self.cutoffs += 1
+        if first_move:
+            self.first_move_cutoffs += 1
+
+    def _trace_lasers(self, lzch: LaserChess) -> None:
+        start = time.perf_counter()
+        lzch.laser_path(FIRST)
+        lzch.laser_path(SECOND)
+        self.laser_time += time.perf_counter() - start
+
+    def push(self, lzch: LaserChess, coord: CoordType, move: MoveType,
+             player: int) -> None:
+        """lzch.push, timed."""
+        start = time.perf_counter()
+        lzch.push(coord, move, player)
+        self.push_time += time.perf_counter() - start
+
+    def evaluate(self, lzch: LaserChess, player: int) -> float:
+        """evaluate_board, counted and timed."""
+        self._trace_lasers(lzch)
+        start = time.perf_counter()
+        leaf_eval = evaluate_board(lzch, player)
+        self.evaluate_time += time.perf_counter() - start
+        self.leaves += 1
+        return leaf_eval
+
+    def generate_moves(self, allowed_moves, lzch: LaserChess, player: int) \
+        -> List[Tuple[CoordType, MoveType]]:
+        """allowed_moves(lzch, player), timed."""
+        self._trace_lasers(lzch)
+        start = time.perf_counter()
+        moves = allowed_moves(lzch, player)
+        self.move_generation_time += time.perf_counter() - start
+        return moves
+
+    def merge(self, other: 'SearchStats') -> None:
+        """Adds other's counts and times to these."""
+        for ply, nodes in enumerate(other.nodes):
+            if nodes:
+                self.visit(ply)
+                self.nodes[ply] += nodes - 1
+        for attribute in ("quiescence_nodes", "leaves", "cutoffs",
+                          "first_move_cutoffs", "move_generation_time",
+                          "push_time", "laser_time", "evaluate_time",
+                          "elapsed"):
+            setattr(self, attribute,
+                    getattr(self, attribute) + getattr(other, attribute))
+
+    def __str__(self) -> str:
+        return (f"{self.total_nodes} nodes in {self.elapsed:.3f} s "
+                f"({self.nodes_per_second:.0f} nodes/s), "
+                f"{self.quiescence_nodes} in quiescence, "
+                f"{self.leaves} leaves\n"
+                f"nodes per ply: {self.nodes}\n"
+                f"{self.cutoffs} cutoffs, "
+                f"{self.first_move_cutoff_rate:.0%} at the first move\n"
+                f"move generation {self.move_generation_time:.3f} s, "
+                f"push {self.push_time:.3f} s, "
+                f"laser tracing {self.laser_time:.3f} s, "
+                f"evaluate_board {self.evaluate_time:.3f} s")
+
+class MoveOrdering:
+    """Puts the moves of a search in the order most likely to be best, so
+    alpha-beta cuts off as early as possible. The moves tried first are:
+    1. the hash move, the best move the transposition table found before,
+    2. the moves touching either laser's path, which can make or stop a
+       capture (like moves_that_change_laser, but only checking whether
+       the move changes a square the laser passes, not tracing it again),
+    3. the killer moves of the ply, which caused a cutoff in a sibling
+       position, and
+    4. the rest, best history score first. A move's history score grows
+       by depth ** 2 every time it causes a cutoff anywhere.
+
+    It also counts how many cutoffs happen at the first move tried. The
+    closer first_move_cutoff_rate is to 1, the closer the search is to
+    ideal pruning."""
+
+    def __init__(self):
+        self.killers = []
+        self.history = {}
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+
+    @property
+    def first_move_cutoff_rate(self) -> float:
+        if self.cutoffs == 0:
+            return 0.0
+        return self.first_move_cutoffs / self.cutoffs
+
+    def order(self, lzch: LaserChess, moves: List[Tuple[CoordType, MoveType]],
+              player: int, ply: int, hash_move = None) \
+        -> List[Tuple[CoordType, MoveType]]:
+        """Returns moves, the legal moves of player at ply, in order."""
+        laser_mask = lzch.laser_path(FIRST).mask | lzch.laser_path(SECOND).mask
+        killers = self.killers[ply] if ply < len(self.killers) else ()
+        history = self.history
+
+        def priority(coord_move):
+            coord, move = coord_move
+            if coord_move == hash_move:
+                return 4
+            if move_square_mask(coord, move) & laser_mask:
+                return 3
+            if coord_move in killers:
+                return 2
+            return 1
+
+        # sorting is stable, so equal moves stay in the order generated
+        return sorted(moves, reverse=True, key=lambda coord_move: (
+            priority(coord_move), history.get((player, ) + coord_move, 0)))
+
+    def cutoff(self, player: int, ply: int, depth: int, coord: CoordType,
+               move: MoveType, first_move: bool) -> None:
+        """Records that the move of player at ply caused a cutoff, with
+        depth left to search."""
+        self.cutoffs += 1
+        if first_move:
+            self.first_move_cutoffs += 1
+        while len(self.killers) <= ply:
+            self.killers.append([])
+        killers = self.killers[ply]
+        if not (coord, move) in killers:
+            killers.insert(0, (coord, move))
+            del killers[KILLERS_PER_PLY:]
+        key = (player, coord, move)
+        self.history[key] = self.history.get(key, 0) + depth ** 2
+
+def minimax(lzch: LaserChess, depth: int, max_player: int, \
+            table: TranspositionTable = None, \
+            ordering: MoveOrdering = None, \
+            quiescence_depth: int = QUIESCENCE_DEPTH, \
+            book: 'OpeningBook' = None, \
+            tablebases: 'Tablebases' = None, \
+            stats: SearchStats = None, \
+            null_move: bool = False, \
+            late_move_reductions: bool = False, \
+            pv: list = None) \
     -> Tuple[float, CoordType, MoveType]:
     """We use the minimax algorithm to find the *hopefully* optimal move given
-    the player and the board."""
-    move_thought = _minimax_filtered(lzch, depth, max_player, \
-                                     allowed_moves = all_legal_moves)
+    the player and the board.
+
+    Positions searched are remembered in table, and what the moves did in
+    ordering, new ones if they're None. Pass the same ones again to reuse
+    them in the next search. Past depth, moves changing what a laser
+    captures are searched up to quiescence_depth more moves. If book has
+    the position searched at least depth deep, its move is returned
+    without searching, and positions in tablebases aren't searched
+    either. What the search does is added to stats, if it's given.
+
+    null_move and late_move_reductions turn on the selective search of
+    _minimax_filtered, which is faster but may miss the best move.
+
+    If pv is given (a list), it is filled with the principal variation:
+    the line of (coord, move) both players are expected to play, starting
+    with the move returned, up to depth moves long."""
+    if book is not None:
+        entry = book.lookup(lzch, max_player)
+        if entry is not None and entry.depth >= depth:
+            if not pv is None:
+                pv[:] = [(entry.coord, entry.move)]
+            return (entry.score, entry.coord, entry.move)
+    if table is None:
+        table = TranspositionTable()
+    if ordering is None:
+        ordering = MoveOrdering()
+    move_thought = _search(lzch, depth, max_player, stats, table = table,
+                           ordering = ordering,
+                           quiescence_depth = quiescence_depth,
+                           tablebases = tablebases, null_move = null_move,
+                           late_move_reductions = late_move_reductions,
+                           pv = pv)
+    if not pv is None:
+        _extend_pv(lzch, max_player, table, pv, depth)
     """
     if (max_player == FIRST and move_thought[0] == -inf) or \
        (max_player == SECOND and move_thought[0] == inf):
@@ -28,16 +278,285 @@ def minimax(lzch: LaserChess, depth: int, max_player: int) \
                                          allowed_moves=all_legal_moves)
     """
     return move_thought
+
+def iterative_deepening(lzch: LaserChess, time_limit_ms: float, \
+                        max_player: int, table: TranspositionTable = None, \
+                        max_depth: int = MAX_DEPTH, \
+                        ordering: MoveOrdering = None, \
+                        quiescence_depth: int = QUIESCENCE_DEPTH, \
+                        book: 'OpeningBook' = None, \
+                        tablebases: 'Tablebases' = None, \
+                        stats: SearchStats = None, \
+                        report: Callable = None, \
+                        null_move: bool = False, \
+                        late_move_reductions: bool = False, \
+                        pv: list = None) \
+    -> Tuple[float, CoordType, MoveType]:
+    """Searches like minimax at depth 1, 2, 3, ... until time_limit_ms
+    milliseconds have passed, and returns what the deepest search that
+    finished found. The search running out of time is abandoned, leaving
+    lzch as it was.
+
+    Depth 1 is always searched to the end, so there is always a move. Each
+    search tries the best moves of the one before first, since they are in
+    table, and shares ordering with it (new ones if they're None). A
+    position in book isn't searched at all: the book's move is returned.
+    Nor are positions in tablebases.
+
+    What all the searches do is added to stats, if it's given. If report
+    is given, report(depth, move_thought, iteration_stats) is called after
+    each depth is searched, with that search's own SearchStats.
+    null_move, late_move_reductions and pv are as for minimax, pv being
+    the line the deepest search that finished found."""
+    if book is not None:
+        entry = book.lookup(lzch, max_player)
+        if entry is not None:
+            if not pv is None:
+                pv[:] = [(entry.coord, entry.move)]
+            return (entry.score, entry.coord, entry.move)
+    deadline = time.perf_counter() + time_limit_ms / 1000
+    if table is None:
+        table = TranspositionTable()
+    if ordering is None:
+        ordering = MoveOrdering()
+    move_thought = None
+    for depth in range(1, max_depth + 1):
+        # a won or lost game won't change with a deeper search
+        if not move_thought is None and abs(move_thought[0]) == inf:
+            break
+        iteration_stats = None
+        if not stats is None or not report is None:
+            iteration_stats = SearchStats()
+        iteration_pv = None if pv is None else []
+        try:
+            move_thought = _search(
+                lzch, depth, max_player, iteration_stats, table = table,
+                deadline = deadline if depth > 1 else None,
+                ordering = ordering, quiescence_depth = quiescence_depth,
+                tablebases = tablebases, null_move = null_move,
+                late_move_reductions = late_move_reductions,
+                pv = iteration_pv)
+        except SearchTimeout:
+            break
+        finally:
+            if not stats is None:
+                stats.merge(iteration_stats)
+        if not pv is None:
+            _extend_pv(lzch, max_player, table, iteration_pv, depth)
+            pv[:] = iteration_pv
+        if not report is None:
+            report(depth, move_thought, iteration_stats)
+    return move_thought
+
+def _search(lzch: LaserChess, depth: int, max_player: int, \
+            stats: SearchStats, **search_args) \
+    -> Tuple[float, CoordType, MoveType]:
+    """_minimax_filtered over the distinct legal moves, timed into stats
+    if it isn't None."""
+    if stats is None:
+        return _minimax_filtered(lzch, depth, max_player, distinct_legal_moves,
+                                 **search_args)
+    start = time.perf_counter()
+    try:
+        return _minimax_filtered(lzch, depth, max_player, distinct_legal_moves,
+                                 stats = stats, **search_args)
+    finally:
+        stats.elapsed += time.perf_counter() - start
+
+def _extend_pv(lzch: LaserChess, player: int, table: TranspositionTable, \
+               pv: list, length: int) -> None:
+    """Extends pv, the principal variation of lzch's position with player
+    to move, to length moves with the best moves in table. A line found by
+    the search stops early where a position's score came from the table."""
+    pushed = 0
+    try:
+        for coord, move in pv:
+            lzch.push(coord, move, player)
+            pushed += 1
+            player = -player
+        while len(pv) < length and lzch.winner == 0:
+            entry = table.probe(position_key(lzch, player))
+            if entry is None or entry[3] is None:
+                break
+            coord, move = entry[3], entry[4]
+            # a different position with the same bucket can't be told apart
+            # only by a move that isn't legal
+            if lzch.push(coord, move, player) is None:
+                break
+            pushed += 1
+            pv.append((coord, move))
+            player = -player
+    finally:
+        for _ in range(pushed):
+            lzch.pop()
+
+class RootMove(NamedTuple):
+    """One of the best moves multi_pv finds: its exact score, and the line
+    expected after it (starting with it)."""
+    score: float
+    coord: CoordType
+    move: MoveType
+    pv: list
+
+def multi_pv(lzch: LaserChess, depth: int, max_player: int, k: int = 3, \
+             table: TranspositionTable = None, \
+             ordering: MoveOrdering = None, \
+             quiescence_depth: int = QUIESCENCE_DEPTH) -> List[RootMove]:
+    """Finds the k best moves of max_player, each with its exact score
+    and principal variation, best first, searching like minimax.
+
+    It costs little more than finding the best move: minimax cuts off a
+    root move as soon as it can't beat the best one so far, and multi_pv
+    only once it can't beat the k-th best. Moves that can't aren't scored
+    exactly, and aren't returned."""
+    if table is None:
+        table = TranspositionTable()
+    if ordering is None:
+        ordering = MoveOrdering()
+    if lzch.winner != 0 or depth == 0:
+        return []
+    key = position_key(lzch, max_player)
+    entry = table.probe(key)
+    hash_move = None if entry is None else (entry[3], entry[4])
+    moves = ordering.order(lzch, distinct_legal_moves(lzch, max_player),
+                           max_player, 0, hash_move)
+
+    best = []  # the best moves so far, best first
+    for coord, move in moves:
+        # the k-th best so far is the score to beat
+        bound = best[k - 1].score if len(best) >= k else -max_player * inf
+        if max_player == FIRST:
+            alpha, beta = bound, inf
+        else:
+            alpha, beta = -inf, bound
+        line = []
+        lzch.push(coord, move, max_player)
+        try:
+            score = _minimax_filtered(lzch, depth - 1, -max_player,
+                                      distinct_legal_moves, alpha, beta,
+                                      table = table, ordering = ordering,
+                                      ply = 1,
+                                      quiescence_depth = quiescence_depth,
+                                      pv = line)[0]
+        finally:
+            lzch.pop()
+        if max_player * score > max_player * bound or len(best) < k:
+            best.append(RootMove(score, coord, move, [(coord, move)] + line))
+            best.sort(key=lambda root_move: -max_player * root_move.score)
+            del best[k:]
+
+    if best:
+        table.store(key, depth, best[0].score, EXACT, best[0].coord,
+                    best[0].move)
+    for root_move in best:
+        _extend_pv(lzch, max_player, table, root_move.pv, depth)
+    return best
         
 # allowed_moves = Callable[[LaserChess, int], List[Tuple[CoordType, MoveType]]
 def _minimax_filtered(
     lzch: LaserChess, depth: int, max_player: int, \
-    allowed_moves, alpha = -inf, beta = inf) -> Tuple[float, CoordType, MoveType]:
+    allowed_moves, alpha = -inf, beta = inf, \
+    table: TranspositionTable = None, deadline: float = None, \
+    ordering: MoveOrdering = None, ply: int = 0, \
+    quiescence_depth: int = 0, batch_leaves: bool = False, \
+    tablebases: 'Tablebases' = None, stats: SearchStats = None, \
+    null_move: bool = False, late_move_reductions: bool = False, \
+    pv: list = None) \
+    -> Tuple[float, CoordType, MoveType]:
     """We use the minimax algorithm to find the *hopefully* optimal move
-    with some alpha-beta pruning."""
+    with some alpha-beta pruning.
+
+    If table is given, positions already searched at least as deep are
+    looked up in it instead of searched again (or narrow alpha and beta if
+    only a bound is known), and every position searched is stored in it.
+
+    If deadline (a time.perf_counter() time) passes, SearchTimeout is
+    raised, with every move pushed taken back.
+
+    If ordering is given, it orders the moves and learns from the cutoffs.
+    ply is how many moves deep lzch is in the search.
+
+    At depth 0, the position is evaluated by _quiescence with
+    quiescence_depth moves to go (which is evaluate_board if it's 0). If
+    it's 0 and batch_leaves is True, positions at depth 1 evaluate all
+    their children together with evaluate_boards instead. That skips the
+    pushes and pops, but gives up the cutoffs among the children, so it
+    is only faster when there are few of them to give up.
+
+    Positions in tablebases are scored by them instead of searched, and at
+    the root (ply 0) their best move is returned, if they have it. If stats
+    is given, the search is counted in it.
+
+    Two kinds of selective search can be turned on, which make the search
+    faster but may make it miss the best move:
+    - null_move: below the root, max_player first passes (see
+      _null_move_allowed for when), and the other player's reply is
+      searched NULL_MOVE_REDUCTION moves shallower. If passing is still
+      good enough for a cutoff, a real move would be too, so there's one.
+    - late_move_reductions: once LMR_FULL_MOVES moves have been searched,
+      the quiet moves (which don't touch either laser's path, so change
+      neither laser) are searched one move shallower, just to check they
+      can't beat the best so far. One that can is searched again in full.
+
+    If pv is given (an empty list), the principal variation found is put
+    in it: the best move, then the child's principal variation, each node
+    passing its children a list of their own (a triangular PV table). A
+    position scored from table gets only its best move."""
+
+    if not deadline is None and time.perf_counter() >= deadline:
+        raise SearchTimeout()
+    if not stats is None:
+        stats.visit(ply)
     
-    if lzch.winner != 0 or depth == 0:
-        return (evaluate_board(lzch, max_player), None, None)
+    if lzch.winner != 0:
+        if stats is None:
+            return (evaluate_board(lzch, max_player), None, None)
+        return (stats.evaluate(lzch, max_player), None, None)
+
+    if not tablebases is None:
+        tablebase_eval = tablebases.score(lzch, max_player)
+        if not tablebase_eval is None:
+            if ply > 0:
+                return (tablebase_eval, None, None)
+            # at the root, the move is needed too, unless the tables can't
+            # give it, and then the position is searched
+            tablebase_move = tablebases.best_move(lzch, max_player)
+            if not tablebase_move is None:
+                return tablebase_move
+
+    hash_move = None
+    if not table is None:
+        key = position_key(lzch, max_player)
+        entry = table.probe(key)
+        if not entry is None:
+            entry_depth, entry_eval, bound, coord, move = entry
+            hash_move = (coord, move)
+            if entry_depth >= depth:
+                if bound == EXACT:
+                    if not pv is None and not coord is None:
+                        pv[:] = [(coord, move)]
+                    return (entry_eval, coord, move)
+                elif bound == LOWER:
+                    alpha = max(alpha, entry_eval)
+                elif bound == UPPER:
+                    beta = min(beta, entry_eval)
+                if beta <= alpha:
+                    return (entry_eval, coord, move)
+
+    if depth == 0:
+        leaf_eval = _quiescence(lzch, max_player, alpha, beta,
+                                quiescence_depth, deadline, stats)
+        if not table is None:
+            if leaf_eval <= alpha:
+                bound = UPPER
+            elif leaf_eval >= beta:
+                bound = LOWER
+            else:
+                bound = EXACT
+            table.store(key, 0, leaf_eval, bound, None, None)
+        return (leaf_eval, None, None)
+
+    orig_alpha, orig_beta = alpha, beta
     
     if max_player == FIRST:
         best_eval = -inf
@@ -48,24 +567,193 @@ def _minimax_filtered(
         compare = lambda x, y: x <= y
         update = lambda a, b, e: (a, min(b, e))
 
-    # Consider ALL legal moves
-    moves_considered = allowed_moves(lzch, max_player)
+    def search_child(child_depth: int, child_alpha: float, child_beta: float,
+                     child_null_move: bool = null_move,
+                     child_pv: list = None) -> float:
+        return _minimax_filtered(lzch, child_depth, -max_player, \
+                                 allowed_moves, child_alpha, child_beta, \
+                                 table, deadline, ordering, ply + 1, \
+                                 quiescence_depth, batch_leaves, \
+                                 tablebases, stats, child_null_move, \
+                                 late_move_reductions, \
+                                 child_pv)[0]  # [0] = take eval only
+
+    if null_move and ply > 0 and depth > NULL_MOVE_REDUCTION and \
+       _null_move_allowed(lzch, max_player, alpha, beta):
+        # The window only says whether the score reaches beta (alpha for
+        # SECOND): there is no float between its ends.
+        if max_player == FIRST:
+            null_eval = search_child(depth - 1 - NULL_MOVE_REDUCTION,
+                                     nextafter(beta, -inf), beta, False)
+            if null_eval >= beta:
+                return (null_eval, None, None)
+        else:
+            null_eval = search_child(depth - 1 - NULL_MOVE_REDUCTION,
+                                     alpha, nextafter(alpha, inf), False)
+            if null_eval <= alpha:
+                return (null_eval, None, None)
 
-    for coord, move in moves_considered:
-        child_lzch = deepcopy(lzch)
-        legal, piece = child_lzch.move_then_laser(coord, move, max_player)
-        cur_eval = _minimax_filtered(child_lzch, depth - 1, -max_player, \
-                                     allowed_moves, alpha, beta)[0]  # [0] = take eval only
+    # Consider ALL legal moves, the best one found last time first
+    if stats is None:
+        moves_considered = allowed_moves(lzch, max_player)
+    else:
+        moves_considered = stats.generate_moves(allowed_moves, lzch,
+                                                max_player)
+
+    if batch_leaves and depth == 1 and quiescence_depth == 0:
+        # Every child is a leaf, so they are all scored at once instead of
+        # one push, evaluate_board and pop at a time. That's exact, whatever
+        # alpha and beta are.
+        child_evals = evaluate_boards(
+            boards_after_moves(lzch.board, max_player, moves_considered),
+            -max_player)
+        if not stats is None:
+            stats.leaves += len(moves_considered)
+        reverse_evals = child_evals[::-1] * max_player
+        best_index = len(moves_considered) - 1 - int(reverse_evals.argmax())
+        best_eval = child_evals[best_index]
+        best_coord, best_move = moves_considered[best_index]
+        if not pv is None:
+            pv[:] = [(best_coord, best_move)]
+        if not table is None:
+            table.store(key, depth, best_eval, EXACT, best_coord, best_move)
+        return (best_eval, best_coord, best_move)
+
+    if not ordering is None:
+        moves_considered = ordering.order(lzch, moves_considered, max_player,
+                                          ply, hash_move)
+    elif not hash_move is None and hash_move in moves_considered:
+        moves_considered.remove(hash_move)
+        moves_considered.insert(0, hash_move)
+
+    reduce = late_move_reductions and depth >= LMR_MIN_DEPTH
+    if reduce:
+        laser_mask = lzch.laser_path(FIRST).mask | lzch.laser_path(SECOND).mask
+
+    for move_number, (coord, move) in enumerate(moves_considered):
+        child_pv = None if pv is None else []
+        if stats is None:
+            lzch.push(coord, move, max_player)
+        else:
+            stats.push(lzch, coord, move, max_player)
+        try:
+            if reduce and move_number >= LMR_FULL_MOVES and \
+               move_square_mask(coord, move) & laser_mask == 0:
+                # only whether the move beats alpha (beta for SECOND)
+                if max_player == FIRST:
+                    cur_eval = search_child(depth - 2, alpha,
+                                            nextafter(alpha, inf))
+                    research = cur_eval > alpha
+                else:
+                    cur_eval = search_child(depth - 2, nextafter(beta, -inf),
+                                            beta)
+                    research = cur_eval < beta
+                if research:
+                    child_pv = None if pv is None else []
+                    cur_eval = search_child(depth - 1, alpha, beta,
+                                            child_pv = child_pv)
+            else:
+                cur_eval = search_child(depth - 1, alpha, beta,
+                                        child_pv = child_pv)
+        finally:
+            lzch.pop()
         if compare(cur_eval, best_eval):
             best_eval = cur_eval
             best_coord = coord
             best_move = move
+            if not pv is None:
+                pv[:] = [(coord, move)] + child_pv
         alpha, beta = update(alpha, beta, cur_eval)
-        del child_lzch
         if beta <= alpha:
+            if not ordering is None:
+                ordering.cutoff(max_player, ply, depth, coord, move,
+                                move_number == 0)
+            if not stats is None:
+                stats.cutoff(move_number == 0)
             break
+
+    if not table is None:
+        # Every move scoring at most alpha means the real score could be
+        # lower still, and a cutoff at beta means it could be higher.
+        if best_eval <= orig_alpha:
+            bound = UPPER
+        elif best_eval >= orig_beta:
+            bound = LOWER
+        else:
+            bound = EXACT
+        table.store(key, depth, best_eval, bound, best_coord, best_move)
     return (best_eval, best_coord, best_move)
     
+def _null_move_allowed(lzch: LaserChess, player: int, alpha: float, \
+                       beta: float) -> bool:
+    """Whether player may pass in a null move search: only if player's king
+    isn't on the other player's laser path (passing would leave it to be
+    hit), there is a beta (alpha for SECOND) to reach, and the position
+    already looks good enough to reach it."""
+    bound = beta if player == FIRST else alpha
+    if abs(bound) == inf:
+        return False
+    king = lzch.king_coord(player)
+    if king is None or \
+       lzch.laser_path(-player).mask >> (king[0] * COLUMNS + king[1]) & 1:
+        return False
+    return player * evaluate_board(lzch, player) >= player * bound
+
+def _quiescence(lzch: LaserChess, max_player: int, alpha: float, beta: float, \
+                depth: int, deadline: float = None, \
+                stats: SearchStats = None) -> float:
+    """Evaluates the position with max_player to move, looking depth more
+    moves ahead, but only at the moves changing what a laser captures.
+    Any other move leaves both lasers as they are, so max_player can
+    "stand pat" instead: the evaluation as it is now is taken to be what
+    max_player gets without a capture, and only the captures that do better
+    are searched, with alpha-beta pruning."""
+    if not deadline is None and time.perf_counter() >= deadline:
+        raise SearchTimeout()
+
+    if stats is None:
+        stand_pat = evaluate_board(lzch, max_player)
+    else:
+        stand_pat = stats.evaluate(lzch, max_player)
+    if lzch.winner != 0 or depth == 0:
+        return stand_pat
+
+    best_eval = stand_pat
+    if max_player == FIRST:
+        if stand_pat >= beta:
+            return stand_pat
+        alpha = max(alpha, stand_pat)
+    else:
+        if stand_pat <= alpha:
+            return stand_pat
+        beta = min(beta, stand_pat)
+
+    if stats is None:
+        capture_moves = moves_that_change_captures(lzch, max_player)
+    else:
+        capture_moves = stats.generate_moves(moves_that_change_captures, lzch,
+                                             max_player)
+    for coord, move in capture_moves:
+        if stats is None:
+            lzch.push(coord, move, max_player)
+        else:
+            stats.quiescence_nodes += 1
+            stats.push(lzch, coord, move, max_player)
+        try:
+            cur_eval = _quiescence(lzch, -max_player, alpha, beta, depth - 1,
+                                   deadline, stats)
+        finally:
+            lzch.pop()
+        if max_player == FIRST:
+            best_eval = max(best_eval, cur_eval)
+            alpha = max(alpha, cur_eval)
+        else:
+            best_eval = min(best_eval, cur_eval)
+            beta = min(beta, cur_eval)
+        if beta <= alpha:
+            break
+    return best_eval
+
 def evaluate_board(lzch: LaserChess, player: int) -> float:
     """Evaluates the heuristic value of the board position, depending on
     the current player. + means it leans to FIRST player, - means it
@@ -89,34 +777,26 @@ def evaluate_board(lzch: LaserChess, player: int) -> float:
 
     # NOTE TO SELF: REWRITE THIS FUNCTION.
 
-    # number of pieces FIRST vs SECOND
-    first_counts = count_player_pieces(lzch, FIRST)
-    second_counts = count_player_pieces(lzch, SECOND)
+    # number of pieces FIRST vs SECOND, which lzch keeps count of
+    first_counts = lzch.piece_count(FIRST)
+    second_counts = lzch.piece_count(SECOND)
 
     dif_pieces = first_counts - second_counts
 
     eval_points = PIECE_VALUE * dif_pieces
     
     # the current laser paths of both players
-    piece1, path1 = lzch._shoot_laser_path_piece(FIRST, capture=False)
-    piece2, path2 = lzch._shoot_laser_path_piece(SECOND, capture=False)
+    laser1_end = lzch.laser_path(FIRST).path[-1]
+    laser2_end = lzch.laser_path(SECOND).path[-1]
 
-    laser1_end = path1[-1]
-    laser2_end = path2[-1]
-
-    laser_squares = set(path1) | set(path2)
-    laser_engaged_pieces = 0
-    for coord in laser_squares:
-        if lzch.board[coord] > 0:
-            laser_engaged_pieces += 1
-        elif lzch.board[coord] < 0:
-            laser_engaged_pieces -= 1
+    # pieces on the laser paths, FIRST's minus SECOND's
+    laser_engaged_pieces = lzch.laser_engaged_pieces()
 
     eval_points += PIECE_VALUE * FUTURE_SIGHT * laser_engaged_pieces
 
     # Looking for the kings' positions.
-    king1_coord = find_king(lzch.board, FIRST)
-    king2_coord = find_king(lzch.board, SECOND)
+    king1_coord = lzch.king_coord(FIRST)
+    king2_coord = lzch.king_coord(SECOND)
 
     king_eval1 = eval_laser_in_kings(laser1_end, king1_coord, king2_coord)
     king_eval2 = eval_laser_in_kings(laser2_end, king1_coord, king2_coord)
@@ -140,6 +820,64 @@ def evaluate_board(lzch: LaserChess, player: int) -> float:
     return eval_points
         
 
+def evaluate_boards(boards: np.ndarray, player: int) -> np.ndarray:
+    """Evaluates an (N, 8, 10) stack of boards at once, with player to
+    move on all of them, and returns the N values evaluate_board would.
+
+    A game is won when the other player's king is missing from the board,
+    since that's the only way a game ends."""
+    boards = np.asarray(boards, dtype=BOARD_DTYPE).reshape(-1, ROWS, COLUMNS)
+    n = len(boards)
+    flat = boards.reshape(n, ROWS * COLUMNS)
+
+    # number of pieces FIRST vs SECOND
+    dif_pieces = np.count_nonzero(flat > 0, axis=1) - \
+                 np.count_nonzero(flat < 0, axis=1)
+    eval_points = PIECE_VALUE * dif_pieces
+
+    # the current laser paths of both players
+    laser1_end, _, path1 = trace_lasers(boards, FIRST, paths=True)
+    laser2_end, _, path2 = trace_lasers(boards, SECOND, paths=True)
+    laser_squares = (path1 | path2).reshape(n, ROWS * COLUMNS)
+    laser_engaged_pieces = (np.sign(flat) * laser_squares).sum(axis=1)
+    eval_points = eval_points + \
+                  PIECE_VALUE * FUTURE_SIGHT * laser_engaged_pieces
+
+    # Looking for the kings' positions.
+    king1 = flat == KING_1
+    king2 = flat == KING_2
+    king1_coord = np.stack(np.divmod(king1.argmax(axis=1), COLUMNS), axis=1)
+    king2_coord = np.stack(np.divmod(king2.argmax(axis=1), COLUMNS), axis=1)
+
+    def dist_recips(p1, p2):
+        # dist_recip for each row of p1 and p2
+        return 1 / ((p1[:, 1] - p2[:, 1]) ** 2 + (p1[:, 0] - p2[:, 0]) ** 2 + 1)
+
+    king_eval1 = dist_recips(laser1_end, king2_coord) - \
+                 dist_recips(laser1_end, king1_coord)
+    king_eval2 = dist_recips(laser2_end, king2_coord) - \
+                 dist_recips(laser2_end, king1_coord)
+
+    # This evaluates how in danger your king is.
+    def on(coords, end):
+        return (coords == end).all(axis=1)
+
+    if player == FIRST:
+        in_danger = on(king1_coord, laser1_end) | on(king1_coord, laser2_end)
+        attacking = on(king2_coord, laser1_end)
+        eval_points = np.where(in_danger, eval_points - KING_VALUE,
+                      np.where(attacking, eval_points + KING_VALUE * FUTURE_SIGHT,
+                               eval_points + (king_eval1 + king_eval2)))
+    elif player == SECOND:
+        in_danger = on(king2_coord, laser2_end) | on(king2_coord, laser1_end)
+        attacking = on(king1_coord, laser2_end)
+        eval_points = np.where(in_danger, eval_points + KING_VALUE,
+                      np.where(attacking, eval_points - KING_VALUE * FUTURE_SIGHT,
+                               eval_points + (king_eval1 + king_eval2)))
+
+    eval_points = np.where(king1.any(axis=1), eval_points, -inf)
+    return np.where(king2.any(axis=1), eval_points, inf)
+
 def find_king(board: np.ndarray, player: int) -> Tuple[int, int]:
     """Finds the location of player's king, as a tuple.
        requires: board is 8 x 10
@@ -200,95 +938,117 @@ def moves_that_change_laser(lzch: LaserChess, player: int) \
     if lzch.winner != 0:
         return laser_change
 
-    # First, you determine the initial path of the laser. Because
-    # you shoot the laser, the piece could be lost, so you must
-    # put it back and reset the winner, if need be.
-    init_piece1, init_path1 = lzch._shoot_laser_path_piece(FIRST)
-    if init_piece1 != None:
-        lzch.board[init_path1[-1]] = init_piece1
-    if lzch.winner != 0:
-       lzch.winner = 0
+    # First, you determine the initial path of the laser and the piece
+    # it would eliminate, without shooting it.
+    init_laser1 = lzch.laser_path(FIRST)
+    init_laser2 = lzch.laser_path(SECOND)
 
-    init_piece2, init_path2 = lzch._shoot_laser_path_piece(SECOND)
-    if init_piece2 != None:
-        lzch.board[init_path2[-1]] = init_piece2
-    if lzch.winner != 0:
-        lzch.winner = 0
-
-    # Find the locations that player owns
-    player_locs = player_locations(lzch, player)
-    for coord in player_locs:
-        coord = tuple(coord)
-        for move in LEGAL_MOVES:
-            moves_laser = False
-            copy_lzch = deepcopy(lzch)
-            if copy_lzch.make_move(coord, move, player):
-                # If it changes the direction of the laser or
-                # affects how the captured piece is captured,
-                # it is considered. (That's both directions, btw.)
-                final_piece1, final_path1 = copy_lzch._shoot_laser_path_piece(FIRST)
-                if final_piece1 != None:
-                    copy_lzch.board[final_path1[-1]] = final_piece1
-                if lzch.winner != 0:
-                    lzch.winner = 0
-
-                if (final_path1 != init_path1) or (final_piece1 != init_piece1):
-                    moves_laser = True
-
-                final_piece2, final_path2 = copy_lzch._shoot_laser_path_piece(SECOND)
-                if final_piece2 != None:
-                    copy_lzch.board[final_path2[-1]] = final_piece2
-                if lzch.winner != 0:
-                    lzch.winner = 0
-
-                if (final_path2 != init_path2) or (final_piece2 != init_piece2):
-                    moves_laser = True
-
-                if moves_laser == True:
-                    laser_change.append((coord, move))
-            del copy_lzch
+    # A move can only change a laser if it changes a square the laser
+    # passes, so only those moves are traced, and lzch isn't changed.
+    laser_mask = init_laser1.mask | init_laser2.mask
+    for coord, move in lzch.legal_moves(player):
+        if not move_square_mask(coord, move) & laser_mask:
+            continue
+        # If it changes the direction of the laser or
+        # affects how the captured piece is captured,
+        # it is considered. (That's both directions, btw.)
+        final_laser1, final_laser2 = lzch.laser_paths_after_move(coord, move)
+        if (final_laser1 != init_laser1) or (final_laser2 != init_laser2):
+            laser_change.append((coord, move))
 
     return laser_change
 
+def laser_captures(lzch: LaserChess) -> list:
+    # What each laser would capture if fired: the square and the piece,
+    # or None, for FIRST then SECOND.
+    captures = []
+    for player in (FIRST, SECOND):
+        laser = lzch.laser_path(player)
+        if laser.piece is None:
+            captures.append(None)
+        else:
+            captures.append((laser.path[-1], laser.piece))
+    return captures
+
+def moves_that_change_captures(lzch: LaserChess, player: int) \
+    -> List[Tuple[CoordType, MoveType]]:
+    # Returns the distinct moves of player that change what either laser
+    # would capture. Like moves_that_change_laser, only the moves touching
+    # a laser are traced.
+    if lzch.winner != 0:
+        return []
+
+    init_lasers = (lzch.laser_path(FIRST), lzch.laser_path(SECOND))
+    init_captures = laser_captures(lzch)
+    laser_mask = init_lasers[0].mask | init_lasers[1].mask
+    capture_change = []
+    for coord, move in lzch.legal_moves(player, distinct=True):
+        if not move_square_mask(coord, move) & laser_mask:
+            continue
+        final_captures = []
+        for laser in lzch.laser_paths_after_move(coord, move):
+            if laser.piece is None:
+                final_captures.append(None)
+            else:
+                final_captures.append((laser.path[-1], laser.piece))
+        if final_captures != init_captures:
+            capture_change.append((coord, move))
+    return capture_change
+
 def all_legal_moves(lzch: LaserChess, player: int) \
     -> List[Tuple[CoordType, MoveType]]:
     # Returns the list of all legal moves.
-    legal_moves = []
-    player_locs = player_locations(lzch, player)
-    for coord in player_locs:
-        coord = tuple(coord)
-        for move in LEGAL_MOVES:
-            copy_lzch = deepcopy(lzch)
-            if copy_lzch.make_move(coord, move, player):
-                legal_moves.append((coord, move))
-            del copy_lzch
-    return legal_moves
+    return list(lzch.legal_moves(player))
+
+def distinct_legal_moves(lzch: LaserChess, player: int) \
+    -> List[Tuple[CoordType, MoveType]]:
+    # Returns one legal move for each position the legal moves lead to,
+    # leaving out rotations that change nothing or repeat another one.
+    return list(lzch.legal_moves(player, distinct=True))
 
 def legal_minus_laser(lzch: LaserChess, player: int):
-    # Returns the moves that don't move the laser.
+    # Returns the moves that don't move the laser. It only traces the moves
+    # touching a laser, so it's cheap enough to use in a search.
     legal_moves = set(all_legal_moves(lzch, player))
     laser_moved = set(moves_that_change_laser(lzch, player))
 
     return legal_moves - laser_moved
     
+# FIRST wins at once by moving the deflector on (3, 9) up, which deep
+# searches used to miss.
+TACTICAL_BOARD = np.array([[-11, 0,   0,  0, -43, -50, -43, -23, 0,  0],
+                           [  0, 0, -22,  0,   0,   0,   0,   0, 0,  0],
+                           [  0, 0,   0, 21,   0, -30,   0,   0, 0,  0],
+                           [-20, 0,  22,  0,  30, -31,   0, -23, 0, 22],
+                           [-23, 0,  20,  0,  31,  30,   0, -20, 0,  0],
+                           [  0, 0,   0,  0,   0,   0, -23,   0, 0,  0],
+                           [  0, 0,   0,  0,   0,   0,   0,  20, 0,  0],
+                           [  0, 0,  21, 41,  50,  41,   0,   0, 0, 11]],
+                          dtype=BOARD_DTYPE)
+
 if __name__ == "__main__":
+    import sys
     from time import process_time as ptime
+    from laser_chess_mcts import MCTS
+    # the engine playing both sides: minimax, or mcts if given
+    engine = sys.argv[1] if len(sys.argv) > 1 else "minimax"
+    mcts_engine = MCTS()
+    stats = SearchStats()
     # yeah this weird. it can't find the obvious move to win for deep levels
-    board =  np.array([[-11, 0,   0,  0, -43, -50, -43, -23, 0,  0],
-                       [  0, 0, -22,  0,   0,   0,   0,   0, 0,  0],
-                       [  0, 0,   0, 21,   0, -30,   0,   0, 0,  0],
-                       [-20, 0,  22,  0,  30, -31,   0, -23, 0, 22],
-                       [-23, 0,  20,  0,  31,  30,   0, -20, 0,  0],
-                       [  0, 0,   0,  0,   0,   0, -23,   0, 0,  0],
-                       [  0, 0,   0,  0,   0,   0,   0,  20, 0,  0],
-                       [  0, 0,  21, 41,  50,  41,   0,   0, 0, 11]])
+    board = TACTICAL_BOARD
     turn = FIRST
     a = LaserChess(ACE)
     start = ptime()
     while a.winner == 0:
-        evalu, coord, move = minimax(a, depth=3, max_player=turn)
+        if engine == "mcts":
+            evalu, coord, move = mcts_engine.search(a, max_player=turn)
+        else:
+            evalu, coord, move = minimax(a, depth=3, max_player=turn,
+                                         stats=stats)
         print(coord, move)
         a.move_then_laser(coord, move)
         print(a.board)
         turn /= -1
     print(ptime() - start)
+    if engine != "mcts":
+        print(stats)
@@ -0,0 +1,152 @@
+import numpy as np
+from typing import Tuple, Union
+from laser_chess_consts import *
+from laser_chess import DIRECTION_INDEX, LASER_DIRECTIONS, LASER_STEP, \
+  REFLECTION_TABLE, STOP, find_orient, find_piece, make_piece, \
+  num_orientations
+
+"""
+Tracing the lasers of many boards at once.
+
+The boards are stacked into an (N, ROWS, COLUMNS) int8 array and all N
+lasers take each step together: one round of NumPy fancy indexing looks up
+the piece each laser is on, the reflection table turns it into the
+laser's next direction, and the step table moves the laser to its next
+square. Lasers that stop or leave the board drop out of the next round.
+
+The results are the same as LaserChess._shoot_laser_path_piece would give
+on each board (with capture=False), except that the winner isn't checked:
+a board whose game is over is traced like any other.
+"""
+
+SQUARES = ROWS * COLUMNS
+
+# Piece integers are shifted by CODE_OFFSET to index the tables below.
+CODE_OFFSET = 64
+
+def _reflection_arrays() -> Tuple[np.ndarray, np.ndarray]:
+  """
+  Turns laser_chess.REFLECTION_TABLE into two arrays indexed by
+  [piece + CODE_OFFSET, direction]: the direction the laser leaves in
+  (STOP if it stops) and whether the piece is hit.
+  """
+  next_direction = np.full((2 * CODE_OFFSET, len(LASER_DIRECTIONS)), STOP,
+                           dtype=np.int8)
+  hit = np.zeros((2 * CODE_OFFSET, len(LASER_DIRECTIONS)), dtype=bool)
+  for piece, outcomes in REFLECTION_TABLE.items():
+    for direction, (out_direction, piece_hit) in enumerate(outcomes):
+      next_direction[piece + CODE_OFFSET, direction] = out_direction
+      hit[piece + CODE_OFFSET, direction] = piece_hit
+  return next_direction, hit
+
+NEXT_DIRECTION, PIECE_HIT = _reflection_arrays()
+
+# STEP[direction, square] is the next square, or STOP off the board.
+STEP = np.array(LASER_STEP, dtype=np.int16)
+
+# The corner each player's laser sits on, and the direction it fires in
+# when horizontal (orientation LASER_HORT) or vertical.
+LASER_SQUARE = {FIRST: SQUARES - 1, SECOND: 0}
+HORIZONTAL_DIRECTION = {FIRST: DIRECTION_INDEX[W], SECOND: DIRECTION_INDEX[E]}
+VERTICAL_DIRECTION = {FIRST: DIRECTION_INDEX[N], SECOND: DIRECTION_INDEX[S]}
+
+def trace_lasers(boards: np.ndarray, players: Union[int, np.ndarray],
+                 paths: bool = False) -> tuple:
+  """
+  Traces the laser of players[i] on boards[i], for all N boards at once.
+
+  Returns (end_squares, captured), or (end_squares, captured, path_masks)
+  if paths is True:
+  - end_squares is an (N, 2) array with the last square each laser is on
+    (the same as path[-1] from LaserChess),
+  - captured is an (N,) int8 array of the piece each laser hits there, or 0
+    if it hits nothing, and
+  - path_masks is an (N, ROWS, COLUMNS) bool array of the squares each
+    laser passes.
+
+  requires: boards is an (N, ROWS, COLUMNS) array of piece integers with
+            the lasers in their corners
+            players is FIRST or SECOND, or an (N,) array of them
+  """
+  flat = np.asarray(boards, dtype=BOARD_DTYPE).reshape(-1, SQUARES)
+  n = flat.shape[0]
+  players = np.broadcast_to(np.asarray(players), (n,))
+  first = players == FIRST
+
+  square = np.where(first, LASER_SQUARE[FIRST], LASER_SQUARE[SECOND])
+  laser = flat[np.arange(n), square]
+  horizontal = (np.abs(laser) % 10) == LASER_HORT
+  direction = np.where(
+    horizontal,
+    np.where(first, HORIZONTAL_DIRECTION[FIRST], HORIZONTAL_DIRECTION[SECOND]),
+    np.where(first, VERTICAL_DIRECTION[FIRST], VERTICAL_DIRECTION[SECOND]))
+  square = square.astype(np.int16)
+  direction = direction.astype(np.int8)
+
+  end_square = square.copy()
+  captured = np.zeros(n, dtype=BOARD_DTYPE)
+  if paths:
+    path_masks = np.zeros((n, SQUARES), dtype=bool)
+
+  # Indices of the lasers still moving, with their square and direction.
+  active = np.arange(n)
+  for _ in range(len(LASER_DIRECTIONS) * SQUARES):
+    if active.size == 0:
+      break
+    end_square[active] = square
+    if paths:
+      path_masks[active, square] = True
+    piece = flat[active, square].astype(np.int16) + CODE_OFFSET
+    out_direction = NEXT_DIRECTION[piece, direction]
+    stopped = out_direction == STOP
+    hit = stopped & PIECE_HIT[piece, direction]
+    captured[active[hit]] = piece[hit] - CODE_OFFSET
+
+    moving = ~stopped
+    next_square = STEP[out_direction[moving], square[moving]]
+    on_board = next_square != STOP
+    active = active[moving][on_board]
+    square = next_square[on_board]
+    direction = out_direction[moving][on_board]
+
+  end_squares = np.stack(np.divmod(end_square, COLUMNS), axis=1)
+  if paths:
+    return (end_squares, captured, path_masks.reshape(n, ROWS, COLUMNS))
+  return (end_squares, captured)
+
+def boards_after_moves(board: np.ndarray, player: int, moves: list) \
+    -> np.ndarray:
+  """
+  Returns the (N, ROWS, COLUMNS) boards after player makes each of the N
+  moves on board and fires the laser, the same as LaserChess.push would
+  leave them.
+
+  requires: moves are legal moves of player on board (see
+            LaserChess.legal_moves), in a game that isn't over
+  """
+  flat = np.asarray(board, dtype=BOARD_DTYPE).ravel()
+  cells = flat.tolist()
+  rows = []
+  squares = []
+  pieces = []
+  for row, (coord, move) in enumerate(moves):
+    square = coord[0] * COLUMNS + coord[1]
+    piece = cells[square]
+    if move in ROTATION_MOVES:
+      piece_type = find_piece(piece)
+      orient = (find_orient(piece) + move) % num_orientations(piece_type)
+      rows.append(row)
+      squares.append(square)
+      pieces.append(make_piece(player, piece_type, orient))
+    else:
+      new_square = square + move[0] * COLUMNS + move[1]
+      rows += [row, row]
+      squares += [square, new_square]
+      pieces += [cells[new_square], piece]
+
+  boards = np.repeat(flat[np.newaxis], len(moves), axis=0)
+  boards[rows, squares] = pieces
+  end_squares, captured = trace_lasers(boards, player)
+  hit = np.flatnonzero(captured)
+  boards[hit, end_squares[hit, 0] * COLUMNS + end_squares[hit, 1]] = 0
+  return boards.reshape(-1, ROWS, COLUMNS)
@@ -0,0 +1,256 @@
+import laser_chess
+from laser_chess import LaserChess
+from laser_chess_consts import *
+from laser_chess_batch import boards_after_moves, trace_lasers
+from laser_chess_tt import TranspositionTable
+from laser_chess_parallel import parallel_minimax
+import laser_chess_ai
+
+import numpy as np
+import os
+
+from timeit import repeat, timeit
+from typing import Dict, Tuple
+
+"""Benchmarks for the Laser Chess engine. Run this module to print them."""
+
+def bench_zobrist(number: int = 100000, repeats: int = 7) \
+        -> Dict[str, float]:
+    """Times, in microseconds (the best of repeats runs), what a search
+    pays on each move to get the position's key: make_move, which keeps
+    the Zobrist key up to date, then reading the key, against make_move,
+    then hashing the board's bytes. It also times the parts on their own.
+
+    Measured on ACE (Python 3.11, one core):
+      make_move, then zobrist_key           2.45 us
+      make_move, then hash of the bytes     2.74 us
+      zobrist key update (in make_move)     0.13 us
+      zobrist_key read                      0.09 us
+      hash of board.tobytes()               0.17 us
+    So the incremental key saves about 0.3 us a move (about 11%), not
+    more: the board is only 80 bytes, so hashing them is cheap already,
+    and make_move costs far more than either. Its real gain is being a
+    64-bit key the transposition table can index directly."""
+    lzch = LaserChess(ACE)
+    table = laser_chess.ZOBRIST_PIECES
+    location = (ROWS - 1, COLUMNS - 1)
+    square = location[0] * COLUMNS + location[1]
+
+    def update_key():
+        # what make_move does to the key when it rotates the laser
+        lzch._board_key ^= table[square][LASER_V1] ^ table[square][LASER_H1]
+
+    def hash_bytes():
+        return hash((lzch.board.tobytes(), lzch.turn))
+
+    def move_then_key():
+        lzch.make_move(location, CW, FIRST)
+        return lzch.zobrist_key
+
+    def move_then_hash_bytes():
+        lzch.make_move(location, CW, FIRST)
+        return hash_bytes()
+
+    results = {
+        "make_move, then zobrist_key": move_then_key,
+        "make_move, then hash of the bytes": move_then_hash_bytes,
+        "zobrist key update (in make_move)": update_key,
+        "zobrist_key read": lambda: lzch.zobrist_key,
+        "hash of board.tobytes()": hash_bytes,
+        "zobrist key from scratch":
+            lambda: laser_chess.zobrist_board_key(lzch.board)}
+    return {name: min(repeat(function, number=number, repeat=repeats))
+                  / number * 1e6
+            for name, function in results.items()}
+
+def branching_factors() -> Dict[str, Tuple[int, int]]:
+    """Counts the legal moves of the first player in each standard setup,
+    all of them and only those leading to distinct positions."""
+    counts = {}
+    for name, setup in STANDARD_SETUPS.items():
+        lzch = LaserChess(setup)
+        counts[name] = (len(list(lzch.legal_moves(FIRST))),
+                        len(list(lzch.legal_moves(FIRST, distinct=True))))
+    return counts
+
+def print_branching_factors() -> None:
+    print("Branching factor (first player, all moves -> distinct positions)")
+    for name, (all_moves, distinct_moves) in branching_factors().items():
+        saved = 100 * (all_moves - distinct_moves) / all_moves
+        print(f"  {name:<30} {all_moves:4d} -> {distinct_moves:4d} "
+              f"({saved:.1f}% fewer)")
+
+def bench_batch_trace(number: int = 100000) -> Dict[str, float]:
+    """Measures how many lasers laser_chess_batch.trace_lasers traces per
+    second, on copies of each standard setup, against LaserChess tracing
+    them one at a time."""
+    boards = np.concatenate([np.repeat(setup[np.newaxis], number // 5, axis=0)
+                             for setup in STANDARD_SETUPS.values()])
+    players = np.resize(np.array([FIRST, SECOND]), len(boards))
+    lzch = LaserChess(ACE)
+
+    batch_time = timeit(lambda: trace_lasers(boards, players), number=1)
+    paths_time = timeit(lambda: trace_lasers(boards, players, paths=True),
+                        number=1)
+    single_time = timeit(lambda: lzch._trace_laser(FIRST), number=number)
+    return {"batch": len(boards) / batch_time,
+            "batch with path masks": len(boards) / paths_time,
+            "one at a time": number / single_time}
+
+def bench_leaf_evaluation(number: int = 100) -> Dict[str, float]:
+    """Times, in microseconds, scoring all the children of SOPHIE's first
+    position one push, evaluate_board and pop at a time, against making
+    them with boards_after_moves and scoring them with evaluate_boards."""
+    lzch = LaserChess(SOPHIE)
+    moves = laser_chess_ai.distinct_legal_moves(lzch, FIRST)
+
+    def one_at_a_time():
+        for coord, move in moves:
+            lzch.push(coord, move, FIRST)
+            laser_chess_ai.evaluate_board(lzch, SECOND)
+            lzch.pop()
+
+    def batched():
+        laser_chess_ai.evaluate_boards(
+            boards_after_moves(lzch.board, FIRST, moves), SECOND)
+
+    return {f"{len(moves)} children, one at a time":
+                timeit(one_at_a_time, number=number) / number * 1e6,
+            f"{len(moves)} children, batched":
+                timeit(batched, number=number) / number * 1e6}
+
+def bench_transposition_table(depth: int = 3) -> Dict[str, float]:
+    """Times, in seconds, minimax on ACE without a transposition table and
+    with one, and finds the table's hit rate."""
+    def search(table):
+        lzch = LaserChess(ACE)
+        if table is None:
+            return laser_chess_ai._minimax_filtered(
+                lzch, depth, FIRST, laser_chess_ai.distinct_legal_moves)
+        return laser_chess_ai.minimax(lzch, depth, FIRST, table)
+
+    table = TranspositionTable()
+    no_table_time = timeit(lambda: search(None), number=1)
+    table_time = timeit(lambda: search(table), number=1)
+    return {f"depth {depth}, no table (s)": no_table_time,
+            f"depth {depth}, table (s)": table_time,
+            "table hit rate": table.hit_rate}
+
+def bench_move_ordering(depths: Tuple[int, ...] = (3, 4)) \
+        -> Dict[str, float]:
+    """Times, in seconds, minimax on ACE with move ordering at each depth,
+    and finds how often a cutoff happens at the first move tried."""
+    results = {}
+    for depth in depths:
+        ordering = laser_chess_ai.MoveOrdering()
+        results[f"depth {depth} (s)"] = timeit(
+            lambda: laser_chess_ai.minimax(LaserChess(ACE), depth, FIRST,
+                                           ordering=ordering), number=1)
+        results[f"depth {depth} first move cutoffs"] = \
+            ordering.first_move_cutoff_rate
+    return results
+
+def bench_parallel_search(depth: int = 3,
+                          workers: Tuple[int, ...] = (1, 2, 4, 8)) \
+        -> Dict[str, float]:
+    """Times, in seconds, parallel_minimax on ACE and SOPHIE with each
+    number of workers, and how many times faster than one worker it is.
+    More workers than os.cpu_count() can't be any faster."""
+    results = {}
+    for name in ("ACE", "SOPHIE"):
+        setup = STANDARD_SETUPS[name]
+        one_worker = None
+        for count in workers:
+            seconds = timeit(lambda: parallel_minimax(
+                LaserChess(setup), depth, FIRST, workers=count), number=1)
+            if one_worker is None:
+                one_worker = seconds
+            results[f"{name}, {count} workers (s)"] = seconds
+            results[f"{name}, {count} workers speedup"] = one_worker / seconds
+    return results
+
+# The selective searches of laser_chess_ai.minimax, as its keyword
+# arguments, to compare.
+SELECTIVE_SEARCHES = {
+    "full width": {},
+    "null move": {"null_move": True},
+    "late move reductions": {"late_move_reductions": True},
+    "both": {"null_move": True, "late_move_reductions": True}}
+
+def bench_selective_search(depth: int = 4,
+                           names: Tuple[str, ...] = ("ACE", "SOPHIE")) \
+        -> Dict[str, float]:
+    """Times, in seconds, minimax with each of SELECTIVE_SEARCHES, and
+    counts the nodes it searches."""
+    results = {}
+    for name in names:
+        for search, options in SELECTIVE_SEARCHES.items():
+            stats = laser_chess_ai.SearchStats()
+            laser_chess_ai.minimax(LaserChess(STANDARD_SETUPS[name]), depth,
+                                   FIRST, stats=stats, **options)
+            results[f"{name}, {search} (s)"] = stats.elapsed
+            results[f"{name}, {search} nodes"] = stats.total_nodes
+    return results
+
+def self_play(setup: np.ndarray, depth: int, first_options: dict,
+              second_options: dict, max_moves: int = 60) -> int:
+    """Plays a game of minimax at depth against itself from setup, FIRST
+    searching with first_options and SECOND with second_options (keyword
+    arguments of minimax). Returns the winner, or 0 if there is none after
+    max_moves moves."""
+    lzch = LaserChess(setup)
+    options = {FIRST: first_options, SECOND: second_options}
+    for _ in range(max_moves):
+        if lzch.winner != 0:
+            break
+        _, coord, move = laser_chess_ai.minimax(lzch, depth, lzch.turn,
+                                                **options[lzch.turn])
+        lzch.move_then_laser(coord, move)
+    return lzch.winner
+
+def self_play_match(options: dict, depth: int = 4, max_moves: int = 20) \
+        -> Dict[str, float]:
+    """Plays minimax with options (keyword arguments of minimax) against
+    the full-width search from every standard setup, once as each player,
+    and counts its wins, draws and losses. Null moves are only tried from
+    depth 4 (2 below the root, NULL_MOVE_REDUCTION + 1 to go), and late
+    move reductions from depth 3, so a shallower match doesn't test null
+    moves at all. At depth 4 a move takes about 9 seconds, so the whole
+    match takes about half an hour."""
+    results = {"wins": 0, "draws": 0, "losses": 0}
+    for setup in STANDARD_SETUPS.values():
+        for player in (FIRST, SECOND):
+            if player == FIRST:
+                winner = self_play(setup, depth, options, {}, max_moves)
+            else:
+                winner = self_play(setup, depth, {}, options, max_moves)
+            if winner == 0:
+                results["draws"] += 1
+            elif winner == player:
+                results["wins"] += 1
+            else:
+                results["losses"] += 1
+    return results
+
+def print_results(title: str, results: Dict[str, float], unit: str) -> None:
+    print(title)
+    for name, value in results.items():
+        print(f"  {name:<30} {value:12.3f} {unit}")
+
+def main():
+    print_results("Position keys", bench_zobrist(), "us")
+    print_branching_factors()
+    print_results("Laser traces", bench_batch_trace(), "per second")
+    print_results("Leaf evaluation (SOPHIE)", bench_leaf_evaluation(), "us")
+    print_results("Transposition table (ACE)", bench_transposition_table(),
+                  "")
+    print_results("Move ordering (ACE)", bench_move_ordering(), "")
+    print_results(f"Parallel search ({os.cpu_count()} CPUs)",
+                  bench_parallel_search(), "")
+    print_results("Selective search, depth 4", bench_selective_search(), "")
+    print_results("Null move and LMR against full width, depth 4",
+                  self_play_match(SELECTIVE_SEARCHES["both"], depth=4),
+                  "games")
+
+if __name__ == "__main__":
+    main()
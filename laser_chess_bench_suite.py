@@ -0,0 +1,179 @@
+from laser_chess import LaserChess
+from laser_chess_consts import *
+import laser_chess_ai
+
+import numpy as np
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple
+
+"""A fixed set of engine benchmarks, kept in a history file to catch
+regressions from one commit to the next.
+
+Each run times every workload (the best of its repeats, in seconds) and
+appends the results to a JSON history file, with the commit and the
+machine they were measured on. A workload is flagged as a regression if
+it took longer than the median of the last few runs on the same machine
+by more than the threshold. Run the module to run the suite:
+    python laser_chess_bench_suite.py [--max-depth 3] [--threshold 0.2]
+
+The history is kept in bench_history.json next to this module by default,
+which git ignores: it belongs to the machine, not to the code."""
+
+DEFAULT_HISTORY_PATH = Path(__file__).with_name("bench_history.json")
+
+# A run is a regression if it is this much slower than the median,
+# of this many earlier runs.
+DEFAULT_THRESHOLD = 0.2
+DEFAULT_WINDOW = 5
+
+DEFAULT_REPEAT = 3
+
+class Workload(NamedTuple):
+    """A benchmark: run() is timed, repeat times, and the best is kept."""
+    run: Callable[[], object]
+    repeat: int = DEFAULT_REPEAT
+
+def _minimax_workload(board: np.ndarray, depth: int, player: int) -> Workload:
+    # a new board (and so a new table) every time
+    return Workload(lambda: laser_chess_ai.minimax(LaserChess(board), depth,
+                                                   player),
+                    1 if depth >= 4 else DEFAULT_REPEAT)
+
+def _evaluate_boards(number: int) -> None:
+    lzch = LaserChess(SOPHIE)
+    evaluate_board = laser_chess_ai.evaluate_board
+    # turning a laser changes its path, as moves in a search do, and each
+    # player's is turned in turn
+    laser_moves = [(FIRST, (ROWS - 1, COLUMNS - 1)), (SECOND, (0, 0))]
+    for i in range(number):
+        player, coord = laser_moves[i % 2]
+        lzch.push(coord, CW, player)
+        evaluate_board(lzch, -player)
+        lzch.pop()
+
+def _trace_lasers(number: int) -> None:
+    lzch = LaserChess(ACE)
+    for _ in range(number):
+        # flips the turn, so both lasers are traced
+        lzch._shoot_laser_path_piece(capture=False)
+
+def workloads(max_depth: int = 4) -> Dict[str, Workload]:
+    """The suite's workloads by name, minimax only up to max_depth."""
+    suite = {}
+    for depth in range(2, max_depth + 1):
+        for name, setup in STANDARD_SETUPS.items():
+            suite[f"minimax {name} depth {depth}"] = \
+                _minimax_workload(setup, depth, FIRST)
+    for depth in range(2, max_depth + 1):
+        suite[f"minimax tactical depth {depth}"] = \
+            _minimax_workload(laser_chess_ai.TACTICAL_BOARD, depth, FIRST)
+    suite["push, evaluate_board, pop x 10k"] = \
+        Workload(lambda: _evaluate_boards(10000))
+    suite["_shoot_laser_path_piece x 100k"] = \
+        Workload(lambda: _trace_lasers(100000))
+    return suite
+
+def machine_info() -> Dict[str, object]:
+    """What the results were measured on."""
+    return {"platform": platform.platform(),
+            "machine": platform.machine(),
+            "processor": platform.processor(),
+            "cpu_count": os.cpu_count(),
+            "python": platform.python_version(),
+            "numpy": np.__version__}
+
+def git_commit() -> str:
+    """The commit of the code benchmarked, or None outside a git checkout."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+            text=True, check=True, cwd=Path(__file__).parent).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_suite(suite: Dict[str, Workload], repeat: int = None) \
+        -> Dict[str, float]:
+    """Times each workload, the best of its repeats (or of repeat, if it
+    is given), in seconds."""
+    results = {}
+    for name, workload in suite.items():
+        times = []
+        for _ in range(workload.repeat if repeat is None else repeat):
+            start = time.perf_counter()
+            workload.run()
+            times.append(time.perf_counter() - start)
+        results[name] = min(times)
+    return results
+
+def load_history(path: Path = DEFAULT_HISTORY_PATH) -> List[dict]:
+    path = Path(path)
+    if not path.exists():
+        return []
+    with open(path) as history_file:
+        return json.load(history_file)
+
+def save_history(history: List[dict], path: Path = DEFAULT_HISTORY_PATH) \
+        -> None:
+    with open(path, "w") as history_file:
+        json.dump(history, history_file, indent=1)
+
+def find_regressions(history: List[dict], run: dict,
+                     threshold: float = DEFAULT_THRESHOLD,
+                     window: int = DEFAULT_WINDOW) -> Dict[str, tuple]:
+    """The workloads of run slower than the median of the last window runs
+    in history on the same machine by more than threshold (a fraction),
+    as {name: (seconds, median)}."""
+    earlier = [past_run for past_run in history
+               if past_run["machine"] == run["machine"]]
+    regressions = {}
+    for name, seconds in run["results"].items():
+        past = [past_run["results"][name] for past_run in earlier
+                if name in past_run["results"]][-window:]
+        if not past:
+            continue
+        median = statistics.median(past)
+        if seconds > median * (1 + threshold):
+            regressions[name] = (seconds, median)
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Runs the benchmark suite and checks for regressions.")
+    parser.add_argument("--history", default=DEFAULT_HISTORY_PATH)
+    parser.add_argument("--max-depth", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=None,
+                        help="repeats of every workload (default: 3, "
+                             "1 for minimax at depth 4)")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--window", type=int, default=DEFAULT_WINDOW)
+    parser.add_argument("--no-save", action="store_true",
+                        help="don't add the run to the history")
+    args = parser.parse_args()
+
+    run = {"date": datetime.datetime.now().isoformat(timespec="seconds"),
+           "commit": git_commit(),
+           "machine": machine_info(),
+           "results": run_suite(workloads(args.max_depth), args.repeat)}
+    history = load_history(args.history)
+    regressions = find_regressions(history, run, args.threshold, args.window)
+    for name, seconds in run["results"].items():
+        flag = ""
+        if name in regressions:
+            flag = f"  REGRESSION, median {regressions[name][1]:.4f}"
+        print(f"{name:>34}: {seconds:.4f} s{flag}")
+    if not args.no_save:
+        history.append(run)
+        save_history(history, args.history)
+    if regressions:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,592 @@
+import numpy as np
+from typing import Iterator, Sequence, Tuple, Union
+from laser_chess_consts import *
+from laser_chess import BoardState, LaserChess, LaserPath, MoveRecord, \
+  DIRECTION_INDEX, DISTINCT_ROTATIONS, LASER_DIRECTIONS, MOVE_ORDER, REFLECTION_TABLE, SQUARE_COORD, STOP, \
+  ZOBRIST_PIECES, ZOBRIST_SECOND, coord_within_bounds, find_orient, find_piece, find_player, num_orientations, square_mask
+
+"""
+A bitboard version of the Laser Chess engine.
+
+The 8 x 10 board has 80 squares, so any set of squares fits in one Python
+integer, with square row * COLUMNS + column as bit number. The position is
+kept as such sets of squares (bitboards):
+
+- occupied[player] has the squares of player's pieces,
+- pieces[piece_type] has the squares holding that type of piece (for both
+  players), and
+- orient_planes[0] and orient_planes[1] hold the low and high bit of each
+  piece's orientation.
+
+Moves are generated for all pieces at once by shifting bitboards and
+masking them, and the laser jumps from piece to piece along precomputed
+rays instead of checking every empty square on the way.
+
+BitboardLaserChess plays by exactly the same rules as LaserChess and has
+the same methods, so it can be used wherever a LaserChess is searched,
+including laser_chess_ai.minimax.
+"""
+
+SQUARES = ROWS * COLUMNS
+FULL_BOARD = (1 << SQUARES) - 1
+
+def square_bit(location: Tuple[int, int]) -> int:
+  """
+  Returns the bitboard with only the square at location.
+  requires: location is within the bounds of the board
+  """
+  return 1 << (location[0] * COLUMNS + location[1])
+
+def _squares_where(condition) -> int:
+  """
+  Returns the bitboard of the squares whose coordinates satisfy condition.
+  """
+  bitboard = 0
+  for square, coord in enumerate(SQUARE_COORD):
+    if condition(coord):
+      bitboard |= 1 << square
+  return bitboard
+
+# SHIFT[move] is how far a piece's bit moves along the bitboard for a move,
+# and MOVE_SOURCES[move] has the squares a piece can make that move from
+# without leaving the board (so shifts never wrap around a row).
+SHIFT = {move: move[0] * COLUMNS + move[1] for move in MOVE_MOVES}
+MOVE_SOURCES = {
+  move: _squares_where(
+    lambda coord, move=move: coord_within_bounds((coord[0] + move[0],
+                                                  coord[1] + move[1])))
+  for move in MOVE_MOVES}
+
+# FORBIDDEN[player] has the squares player's pieces may never move onto.
+FORBIDDEN = {
+  FIRST: _squares_where(lambda coord: coord[1] == 0) \
+         | square_bit((0, COLUMNS - 2)) | square_bit((ROWS - 1, COLUMNS - 2)),
+  SECOND: _squares_where(lambda coord: coord[1] == COLUMNS - 1) \
+          | square_bit((0, 1)) | square_bit((ROWS - 1, 1))}
+
+# RAYS[direction][square] has the squares after square in that direction
+# up to the edge of the board, and RAY_PATHS the same squares in order.
+def _ray(square: int, direction: Tuple[int, int]) -> Tuple[Tuple[int, int], ...]:
+  i, j = SQUARE_COORD[square]
+  ray = []
+  while coord_within_bounds((i + direction[0], j + direction[1])):
+    i, j = i + direction[0], j + direction[1]
+    ray.append((i, j))
+  return tuple(ray)
+
+RAY_PATHS = tuple(tuple(_ray(square, direction) for square in range(SQUARES))
+                  for direction in LASER_DIRECTIONS)
+RAYS = tuple(tuple(sum(square_bit(coord) for coord in ray) for ray in rays)
+             for rays in RAY_PATHS)
+# Rays going N or W run towards lower square numbers.
+RAY_DECREASING = tuple(direction in {N, W} for direction in LASER_DIRECTIONS)
+
+PIECE_TYPE_ORDER = (DEFLECTOR, SWITCH, DEFENDER, KING, LASER)
+
+def _shift(bitboard: int, shift: int) -> int:
+  """
+  Shifts every square of bitboard by shift square numbers.
+  """
+  if shift > 0:
+    return (bitboard << shift) & FULL_BOARD
+  return bitboard >> -shift
+
+class BitboardLaserChess():
+  """
+  The BitboardLaserChess object is a Laser Chess game kept as bitboards.
+  It has the same methods as LaserChess and plays by the same rules; its
+  board attribute is built from the bitboards when asked for, so it is
+  read-only.
+  """
+
+  def __init__(self, setup_method: np.ndarray, player_to_move: int = FIRST):
+    """
+    Constructs a Laser Chess board.
+    By default, the first player goes first.
+
+    requires: setup_method is set up like for LaserChess
+              player_to_move is FIRST or SECOND
+    """
+    assert player_to_move in PLAYER
+    assert isinstance(setup_method, np.ndarray)
+
+    assert np.shape(setup_method) == (ROWS, COLUMNS)
+    assert setup_method[0, 0] in {-11, -10} # second player laser
+    assert setup_method[ROWS - 1, COLUMNS - 1] in {10, 11} # first player laser
+    assert KING_1 in setup_method # first player king
+    assert KING_2 in setup_method # second player king
+
+    self._load_board(setup_method)
+    self.turn = player_to_move
+    self.winner = 0
+    self._move_stack = []
+    self._laser_paths = {}
+
+  def _load_board(self, board: np.ndarray) -> None:
+    """
+    Sets the bitboards from an 8 x 10 board of piece integers.
+    """
+    self.occupied = {FIRST: 0, SECOND: 0}
+    self.pieces = {piece_type: 0 for piece_type in PIECE_TYPES}
+    self.orient_planes = [0, 0]
+    self._board_key = 0
+    for square, piece in enumerate(np.ravel(board).tolist()):
+      if piece != 0:
+        self._put(square, piece)
+
+  @classmethod
+  def from_state(cls, state: BoardState) -> 'BitboardLaserChess':
+    """
+    Makes a game from a BoardState, without checking the board again.
+    """
+    lzch = cls.__new__(cls)
+    lzch._load_board(state.board)
+    lzch.turn = state.turn
+    lzch.winner = state.winner
+    lzch._move_stack = []
+    lzch._laser_paths = {}
+    return lzch
+
+  @classmethod
+  def from_game(cls, game: LaserChess) -> 'BitboardLaserChess':
+    """
+    Makes a bitboard game in the same position as the LaserChess game.
+    """
+    return cls.from_state(game.state())
+
+  def state(self) -> BoardState:
+    """
+    Returns a BoardState snapshot of the game.
+    """
+    return BoardState(self.board, self.turn, self.winner)
+
+  def copy(self) -> 'BitboardLaserChess':
+    """
+    Returns a copy of the game. Moves pushed before the copy can still be
+    popped from it.
+    """
+    lzch = self.__class__.__new__(self.__class__)
+    lzch.occupied = dict(self.occupied)
+    lzch.pieces = dict(self.pieces)
+    lzch.orient_planes = list(self.orient_planes)
+    lzch._board_key = self._board_key
+    lzch.turn = self.turn
+    lzch.winner = self.winner
+    # pop puts back the bitboards saved by push and changes them
+    # afterwards, so the copy gets its own
+    lzch._move_stack = [(record, (dict(occupied), dict(pieces),
+                                  list(orient_planes)))
+                        for record, (occupied, pieces, orient_planes)
+                        in self._move_stack]
+    lzch._laser_paths = dict(self._laser_paths)
+    return lzch
+
+  @property
+  def zobrist_key(self) -> int:
+    """
+    The Zobrist key of the position, equal to LaserChess.zobrist_key.
+    """
+    if self.turn == SECOND:
+      return self._board_key ^ ZOBRIST_SECOND
+    return self._board_key
+
+  @property
+  def board(self) -> np.ndarray:
+    """
+    The board as an 8 x 10 array of piece integers, like LaserChess.board.
+    Changing it doesn't change the game.
+    """
+    board = np.zeros((ROWS, COLUMNS), dtype=BOARD_DTYPE)
+    flat = board.ravel()
+    occupied = self.occupied[FIRST] | self.occupied[SECOND]
+    while occupied:
+      square = (occupied & -occupied).bit_length() - 1
+      flat[square] = self._piece_at(square)
+      occupied &= occupied - 1
+    return board
+
+  def _piece_at(self, square: int) -> int:
+    """
+    Returns the piece integer on the square number, 0 if it's empty.
+    """
+    bit = 1 << square
+    if self.occupied[FIRST] & bit:
+      player = FIRST
+    elif self.occupied[SECOND] & bit:
+      player = SECOND
+    else:
+      return 0
+    for piece_type in PIECE_TYPE_ORDER:
+      if self.pieces[piece_type] & bit:
+        break
+    orient = (self.orient_planes[0] >> square & 1) \
+             | (self.orient_planes[1] >> square & 1) << 1
+    return player * (piece_type + orient)
+
+  def _put(self, square: int, piece: int) -> None:
+    """
+    Puts the piece integer on the empty square number.
+    """
+    bit = 1 << square
+    orient = find_orient(piece)
+    self._board_key ^= ZOBRIST_PIECES[square][piece]
+    self.occupied[find_player(piece)] |= bit
+    self.pieces[find_piece(piece)] |= bit
+    if orient & 1:
+      self.orient_planes[0] |= bit
+    if orient & 2:
+      self.orient_planes[1] |= bit
+
+  def _remove(self, square: int) -> None:
+    """
+    Empties the square number.
+    """
+    self._board_key ^= ZOBRIST_PIECES[square][self._piece_at(square)]
+    keep = FULL_BOARD ^ (1 << square)
+    for player in PLAYER:
+      self.occupied[player] &= keep
+    for piece_type in PIECE_TYPES:
+      self.pieces[piece_type] &= keep
+    self.orient_planes[0] &= keep
+    self.orient_planes[1] &= keep
+
+  def _set_square(self, square: int, piece: int) -> None:
+    """
+    Replaces whatever is on the square number with the piece integer.
+    """
+    self._remove(square)
+    if piece != 0:
+      self._put(square, piece)
+
+  def _bitboards(self) -> tuple:
+    """
+    Returns every bitboard, to put back later with _restore_bitboards.
+    """
+    return (dict(self.occupied), dict(self.pieces), list(self.orient_planes))
+
+  def _restore_bitboards(self, bitboards: tuple) -> None:
+    self.occupied, self.pieces, self.orient_planes = bitboards
+
+  def print_winner(self) -> None:
+    LaserChess.print_winner(self)
+
+  def _move_sources(self, player: int) -> dict:
+    """
+    For every "move" action, finds the bitboard of squares that player's
+    pieces can legally make that action from: shift the movable pieces,
+    keep the destinations they may land on, and shift them back.
+    """
+    own = self.occupied[player]
+    empty = FULL_BOARD ^ (self.occupied[FIRST] | self.occupied[SECOND])
+    movers = own & ~self.pieces[LASER]
+    switches = own & self.pieces[SWITCH]
+    swappable = self.pieces[DEFLECTOR] | self.pieces[DEFENDER]
+    allowed = ~FORBIDDEN[player]
+
+    sources = {}
+    for move, shift in SHIFT.items():
+      in_bounds = MOVE_SOURCES[move]
+      destinations = allowed & \
+        ((_shift(movers & in_bounds, shift) & empty) |
+         (_shift(switches & in_bounds, shift) & swappable))
+      sources[move] = _shift(destinations, -shift)
+    return sources
+
+  def legal_moves(self, player: int = None, distinct: bool = False) \
+      -> Iterator[Tuple[Tuple[int, int], Union[Tuple[int, int], int]]]:
+    """
+    Generates every legal (location, move_type) pair for player (or
+    self.turn), in the same order as LaserChess.legal_moves. If distinct
+    is True, rotations that lead to the same position as another move are
+    left out, like there.
+
+    requires: player is FIRST or SECOND, or None
+    """
+    if player is None:
+      player = self.turn
+    sources = self._move_sources(player)
+    own = self.occupied[player]
+    while own:
+      square = (own & -own).bit_length() - 1
+      own &= own - 1
+      coord = SQUARE_COORD[square]
+      if distinct:
+        rotations = DISTINCT_ROTATIONS[find_piece(self._piece_at(square))]
+      else:
+        rotations = ROTATION_MOVES
+      for move in MOVE_ORDER:
+        if move in ROTATION_MOVES:
+          if move in rotations:
+            yield (coord, move)
+        elif sources[move] >> square & 1:
+          yield (coord, move)
+
+  def make_move(self, location: Tuple[int, int], \
+                move_type: Union[Tuple[int, int], int],
+                player_turn = None) -> bool:
+    """
+    Makes the move if it is valid, like LaserChess.make_move, and returns
+    whether it was valid. As there, the forbidden squares are only checked
+    when player_turn is given.
+
+    requires: location is within the bounds of the board
+              move_type is one of the allowed move type
+              player_turn is a valid player or None
+    """
+    assert coord_within_bounds(location)
+    assert move_type in LEGAL_MOVES
+    assert player_turn in PLAYER or player_turn is None
+
+    if not player_turn is None:
+      self.turn = player_turn
+
+    square = int(location[0]) * COLUMNS + int(location[1])
+    if not self.occupied[self.turn] >> square & 1:
+      return False
+    piece = self._piece_at(square)
+
+    if move_type in ROTATION_MOVES:
+      piece_type = find_piece(piece)
+      orient = (find_orient(piece) + move_type) % num_orientations(piece_type)
+      self._set_square(square, self.turn * (piece_type + orient))
+      return True
+
+    new_y, new_x = square // COLUMNS + move_type[0], square % COLUMNS + move_type[1]
+    if find_piece(piece) == LASER or not coord_within_bounds((new_y, new_x)):
+      return False
+    new_square = new_y * COLUMNS + new_x
+    if not player_turn is None and FORBIDDEN[player_turn] >> new_square & 1:
+      return False
+
+    other = self._piece_at(new_square)
+    if other == 0 or (find_piece(piece) == SWITCH and
+                      find_piece(other) in {DEFLECTOR, DEFENDER}):
+      self._set_square(square, other)
+      self._set_square(new_square, piece)
+      return True
+    return False
+
+  def _trace_laser(self, player: int) -> Tuple[list, bool]:
+    """
+    Follows the laser of player from its corner, without changing
+    anything, jumping straight to the next piece along its ray. Returns
+    the list of squares the laser passes, and whether the piece on the
+    last square is hit.
+
+    requires: player is FIRST or SECOND
+    """
+    occupied = self.occupied[FIRST] | self.occupied[SECOND]
+    if player == SECOND:
+      square = 0
+      horizontal, vertical = E, S
+    else: # player == FIRST
+      square = SQUARES - 1
+      horizontal, vertical = W, N
+    if LASER_HORT == find_orient(self._piece_at(square)):
+      direction = DIRECTION_INDEX[horizontal]
+    else:
+      direction = DIRECTION_INDEX[vertical]
+
+    laser_path = []
+    while True:
+      laser_path.append(SQUARE_COORD[square])
+      direction, hit = REFLECTION_TABLE[self._piece_at(square)][direction]
+      if direction == STOP:
+        return (laser_path, hit)
+      blockers = RAYS[direction][square] & occupied
+      ray_path = RAY_PATHS[direction][square]
+      if not blockers:
+        laser_path.extend(ray_path)
+        return (laser_path, False)
+      if RAY_DECREASING[direction]:
+        next_square = blockers.bit_length() - 1
+      else:
+        next_square = (blockers & -blockers).bit_length() - 1
+      steps = abs(next_square - square)
+      if LASER_DIRECTIONS[direction][0] != 0:
+        steps //= COLUMNS
+      laser_path.extend(ray_path[:steps - 1])
+      square = next_square
+
+  def piece_count(self, player: int) -> int:
+    """
+    Returns how many pieces player has on the board.
+    """
+    return bin(self.occupied[player]).count("1")
+
+  def king_coord(self, player: int) -> Union[Tuple[int, int], None]:
+    """
+    Returns where player's king is, or None if it has been captured.
+    """
+    king = self.pieces[KING] & self.occupied[player]
+    if not king:
+      return None
+    return SQUARE_COORD[king.bit_length() - 1]
+
+  def laser_engaged_pieces(self) -> int:
+    """
+    Returns how many pieces of FIRST minus how many pieces of SECOND are
+    on the path of either laser, like LaserChess.laser_engaged_pieces.
+    """
+    mask = self.laser_path(FIRST).mask | self.laser_path(SECOND).mask
+    return bin(mask & self.occupied[FIRST]).count("1") - \
+           bin(mask & self.occupied[SECOND]).count("1")
+
+  def laser_paths_after_move(self, location: Tuple[int, int],
+                             move_type: Union[Tuple[int, int], int]) \
+      -> Tuple[LaserPath, LaserPath]:
+    """
+    Returns the LaserPath of FIRST's and SECOND's laser as they would be
+    right after the piece on location makes move_type, like
+    LaserChess.laser_paths_after_move. The move is pushed and popped, which
+    leaves the game as it was.
+
+    requires: move_type is a legal move of the piece on location
+    """
+    player = find_player(
+      self._piece_at(int(location[0]) * COLUMNS + int(location[1])))
+    self.push(location, move_type, player, laser=False)
+    laser_paths = (self.laser_path(FIRST), self.laser_path(SECOND))
+    self.pop()
+    return laser_paths
+
+  def laser_path(self, player: int) -> LaserPath:
+    """
+    Returns where player's laser would go if it were fired now, like
+    LaserChess.laser_path. The path is cached with the Zobrist key of the
+    board it was traced on, so it is only traced again once the board
+    changes.
+
+    requires: player is FIRST or SECOND
+    """
+    cached = self._laser_paths.get(player)
+    if cached is not None and cached[0] == self._board_key:
+      return cached[1]
+    path, hit = self._trace_laser(player)
+    laser_coord = path[-1]
+    piece = self._piece_at(laser_coord[0] * COLUMNS + laser_coord[1]) \
+            if hit else None
+    laser_path = LaserPath(tuple(path), square_mask(path), piece)
+    self._laser_paths[player] = (self._board_key, laser_path)
+    return laser_path
+
+  def _shoot_laser_path_piece(self, player_turn = None, capture = True):
+    """
+    The player in player_turn shoots the laser, like
+    LaserChess._shoot_laser_path_piece. This returns the piece eliminated
+    and the path of the laser taken.
+
+    requires: player_turn is FIRST or SECOND, or None (self.turn is used)
+    """
+    assert player_turn in PLAYER or player_turn is None
+
+    if not player_turn is None:
+      self.turn = player_turn
+
+    destroyed_piece = None
+    if self.winner != 0:
+      return (destroyed_piece, [])
+
+    laser_path, piece_captured = self._trace_laser(self.turn)
+
+    if piece_captured and capture:
+      laser_coord = laser_path[-1]
+      square = laser_coord[0] * COLUMNS + laser_coord[1]
+      destroyed_piece = self._piece_at(square)
+      if find_piece(destroyed_piece) == KING:
+        self.winner = -find_player(destroyed_piece)
+      self._remove(square)
+
+    self.turn = -self.turn  # change turns
+    return (destroyed_piece, laser_path)
+
+  def shoot_laser(self, player_turn = None) -> Union[int, None]:
+    """
+    Shoots the laser of player_turn (or self.turn), and returns the piece
+    eliminated, or None otherwise.
+    """
+    return self._shoot_laser_path_piece(player_turn, capture=True)[0]
+
+  def shoot_laser_path(self, player_turn = None, capture = True) \
+      -> Sequence[Tuple[int, int]]:
+    """
+    Shoots the laser of player_turn (or self.turn), and returns its path.
+    """
+    return self._shoot_laser_path_piece(player_turn, capture)[1]
+
+  def move_then_laser(self, location: Tuple[int, int], \
+                      move_type: Union[Tuple[int, int], int], \
+                      player_turn = None) -> Tuple[bool, int]:
+    """
+    A player makes a move and then shoots the laser, in one go, like
+    LaserChess.move_then_laser.
+    """
+    if not player_turn is None:
+      self.turn = player_turn
+
+    valid_move = self.make_move(location, move_type, self.turn)
+    if True == valid_move:
+      piece_eliminated = self.shoot_laser(self.turn)
+    else:
+      piece_eliminated = None
+    if (not piece_eliminated is None) and find_piece(piece_eliminated) == KING:
+      self.winner = -find_player(piece_eliminated) # other player wins
+    return (valid_move, piece_eliminated)
+
+  def push(self, location: Tuple[int, int], \
+           move_type: Union[Tuple[int, int], int], \
+           player_turn = None, laser = True) -> Union[MoveRecord, None]:
+    """
+    Makes the move like LaserChess.push, so that pop can take it back.
+    Returns the MoveRecord of the move, or None if the move is invalid,
+    in which case nothing changes.
+    """
+    prev_turn = self.turn
+    prev_winner = self.winner
+    prev_key = self._board_key
+    bitboards = self._bitboards()
+    if not player_turn is None:
+      self.turn = player_turn
+    old_piece = self._piece_at(int(location[0]) * COLUMNS + int(location[1]))
+
+    if not self.make_move(location, move_type, self.turn):
+      self.turn = prev_turn
+      return None
+
+    if move_type in MOVE_MOVES:
+      new_location = (location[0] + move_type[0], location[1] + move_type[1])
+    else:
+      new_location = None
+
+    captured_piece = None
+    captured_coord = None
+    if laser:
+      captured_piece, laser_path = self._shoot_laser_path_piece(self.turn)
+      if not captured_piece is None:
+        captured_coord = laser_path[-1]
+
+    record = MoveRecord(location, move_type, new_location, old_piece,
+                        captured_piece, captured_coord, prev_turn, prev_winner,
+                        prev_key)
+    self._move_stack.append((record, bitboards))
+    return record
+
+  def pop(self) -> MoveRecord:
+    """
+    Takes back the last move made by push, restoring the board, the turn
+    and the winner. Returns the MoveRecord of the move taken back.
+
+    requires: there is a move made by push that hasn't been popped
+    """
+    record, bitboards = self._move_stack.pop()
+    self._restore_bitboards(bitboards)
+    self.turn = record.turn
+    self.winner = record.winner
+    self._board_key = record.board_key
+    return record
+
+  def __str__(self) -> str:
+    """
+    Returns the string representing the board as a bunch of geometric shapes.
+    """
+    return str(LaserChess.from_state(self.state()))
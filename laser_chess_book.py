@@ -0,0 +1,180 @@
+from laser_chess import BoardState, LaserChess
+from laser_chess_consts import *
+from laser_chess_tt import decode_move, encode_move, position_key
+import laser_chess_ai
+from laser_chess_ai import CoordType, MoveType
+
+import numpy as np
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Tuple, Union
+
+"""An opening book for the standard setups.
+
+Every game from a standard setup starts from the same position, so the
+early searches are the same in every game. build_book searches the first
+plies of each setup deeply, once, and saves the best move and score of
+each position to a file. minimax and iterative_deepening look a position
+up in the book (a dict, keyed by Zobrist key) before searching it.
+
+The file is a NumPy array of BOOK_DTYPE records, one per position, so
+19 bytes each. Positions are keyed by their Zobrist key with the player
+to move (see laser_chess_tt.position_key), which doesn't depend on the
+setup, so one book covers all of them.
+
+To build the default book (it can be stopped and run again to carry on):
+    python laser_chess_book.py --plies 4 --depth 4 --width 3"""
+
+DEFAULT_BOOK_PATH = Path(__file__).with_name("opening_book.npy")
+
+BOOK_DTYPE = np.dtype([("key", "<u8"), ("move", "<i2"), ("depth", "i1"),
+                       ("score", "<f8")])
+
+class BookEntry(NamedTuple):
+    """What the book knows about a position: the score and best move a
+    search of depth found, like minimax returns them."""
+    score: float
+    coord: CoordType
+    move: MoveType
+    depth: int
+
+class OpeningBook:
+    """Best moves of positions, looked up by Zobrist key."""
+
+    def __init__(self):
+        self._entries = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: int) -> bool:
+        return key in self._entries
+
+    def get(self, key: int) -> Union[BookEntry, None]:
+        return self._entries.get(key)
+
+    def lookup(self, lzch: LaserChess, player: int) -> Union[BookEntry, None]:
+        """Returns the entry of lzch's position with player to move, or None
+        if it isn't in the book."""
+        return self._entries.get(position_key(lzch, player))
+
+    def add(self, key: int, entry: BookEntry) -> None:
+        """Adds the entry, unless the book has the position searched
+        deeper already."""
+        old_entry = self._entries.get(key)
+        if old_entry is None or old_entry.depth <= entry.depth:
+            self._entries[key] = entry
+
+    @classmethod
+    def load(cls, path: Union[str, Path] = DEFAULT_BOOK_PATH) -> 'OpeningBook':
+        """Loads a book saved by save."""
+        book = cls()
+        for key, move, depth, score in np.load(path).tolist():
+            coord, move = decode_move(move)
+            book._entries[key] = BookEntry(score, coord, move, depth)
+        return book
+
+    def save(self, path: Union[str, Path] = DEFAULT_BOOK_PATH) -> None:
+        """Saves the book, sorted by key. The old file is only replaced once
+        the new one is written, so a build stopped midway keeps its book."""
+        records = np.array(
+            [(key, encode_move(entry.coord, entry.move), entry.depth,
+              entry.score) for key, entry in sorted(self._entries.items())],
+            dtype=BOOK_DTYPE)
+        path = Path(path)
+        temporary = path.with_name(path.name + ".tmp")
+        with open(temporary, "wb") as book_file:
+            np.save(book_file, records)
+        os.replace(temporary, path)
+
+def _book_moves(lzch: LaserChess, player: int, best: Tuple[CoordType, MoveType],
+                width: int) -> List[Tuple[CoordType, MoveType]]:
+    """The moves of player followed from a book position: the best move,
+    then the moves that look best one move ahead, up to width of them."""
+    scored = []
+    for coord, move in laser_chess_ai.distinct_legal_moves(lzch, player):
+        lzch.push(coord, move, player)
+        scored.append((player * laser_chess_ai.evaluate_board(lzch, -player),
+                       (coord, move)))
+        lzch.pop()
+    scored.sort(key=lambda score_move: score_move[0], reverse=True)
+    moves = [] if best[0] is None else [best]
+    for _, coord_move in scored:
+        if len(moves) >= width:
+            break
+        if not coord_move in moves:
+            moves.append(coord_move)
+    return moves
+
+def _expand_position(state_bytes: bytes, player: int, depth: int, width: int,
+                     entry: Union[BookEntry, None]) \
+        -> Tuple[int, BookEntry, List[bytes]]:
+    """Searches a book position to depth, unless entry already has it, and
+    returns its key, its entry and the positions its book moves lead to."""
+    lzch = LaserChess.from_state(BoardState.from_bytes(state_bytes))
+    if entry is None or entry.depth < depth:
+        score, coord, move = laser_chess_ai.minimax(lzch, depth, player)
+        entry = BookEntry(score, coord, move, depth)
+    children = []
+    for coord, move in _book_moves(lzch, player, (entry.coord, entry.move),
+                                   width):
+        lzch.push(coord, move, player)
+        if lzch.winner == 0:
+            children.append(lzch.state().to_bytes())
+        lzch.pop()
+    return (position_key(lzch, player), entry, children)
+
+def build_book(path: Union[str, Path] = DEFAULT_BOOK_PATH, plies: int = 4,
+               depth: int = 4, width: int = 3, workers: int = None,
+               setups: Dict[str, np.ndarray] = STANDARD_SETUPS) -> OpeningBook:
+    """Builds the book of the first plies moves from each setup, searching
+    every position depth moves deep, in workers processes (os.cpu_count()
+    if None). From each position, the book follows width moves (see
+    _book_moves), so it has up to width ** plies positions a setup.
+
+    The book is saved to path after each ply. If path already has a book,
+    the positions in it searched at least depth deep aren't searched
+    again, so a build that was stopped carries on where it was."""
+    path = Path(path)
+    book = OpeningBook.load(path) if path.exists() else OpeningBook()
+    player = FIRST
+    frontier = {}
+    for setup in setups.values():
+        lzch = LaserChess(setup)
+        frontier[position_key(lzch, player)] = lzch.state().to_bytes()
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for ply in range(plies):
+            futures = [executor.submit(_expand_position, state_bytes, player,
+                                       depth, width, book.get(key))
+                       for key, state_bytes in frontier.items()]
+            next_frontier = {}
+            for future in futures:
+                key, entry, children = future.result()
+                book.add(key, entry)
+                for state_bytes in children:
+                    child = LaserChess.from_state(
+                        BoardState.from_bytes(state_bytes))
+                    next_frontier[position_key(child, -player)] = state_bytes
+            book.save(path)
+            print(f"ply {ply + 1}: {len(frontier)} positions, "
+                  f"{len(book)} in the book")
+            frontier = next_frontier
+            player = -player
+    return book
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Builds the opening book for the standard setups.")
+    parser.add_argument("--output", default=DEFAULT_BOOK_PATH)
+    parser.add_argument("--plies", type=int, default=4)
+    parser.add_argument("--depth", type=int, default=4)
+    parser.add_argument("--width", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+    build_book(args.output, args.plies, args.depth, args.width, args.workers)
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,9 @@ import numpy as np
 ROWS = 8
 COLUMNS = 10
 
+# Every piece integer fits in a signed byte, so boards are stored as int8.
+BOARD_DTYPE = np.int8
+
 # Player type
 FIRST = 1
 SECOND = -1
@@ -117,7 +120,7 @@ ACE = [[-11, 0,   0,  0, -43, -50, -43, -23, 0,  0],
        [  0, 0,   0,  0,   0,   0, -23,   0, 0,  0],
        [  0, 0,   0,  0,   0,   0,   0,  20, 0,  0],
        [  0, 0,  21, 41,  50,  41,   0,   0, 0, 11]]
-ACE = np.array(ACE)
+ACE = np.array(ACE, dtype=BOARD_DTYPE)
 
 CURIOSITY = [[-11,  0,   0,  0, -43, -50, -43, -31,   0,  0],
              [  0,  0,   0,  0,   0,   0,   0,   0,   0,  0],
@@ -127,7 +130,7 @@ CURIOSITY = [[-11,  0,   0,  0, -43, -50, -43, -31,   0,  0],
              [  0,  0,   0, 22,   0,   0, -23,   0,   0,  0],
              [  0,  0,   0,  0,   0,   0,   0,   0,   0,  0],
              [  0,  0,  31, 41,  50,  41,   0,   0,   0, 11]]
-CURIOSITY = np.array(CURIOSITY)
+CURIOSITY = np.array(CURIOSITY, dtype=BOARD_DTYPE)
 
 GRAIL = [[-11,   0,   0,   0, -22, -43, -23,   0,   0,   0],
          [  0,   0,   0,   0,   0, -50,   0,   0,   0,   0],
@@ -137,7 +140,7 @@ GRAIL = [[-11,   0,   0,   0, -22, -43, -23,   0,   0,   0],
          [  0,   0,   0,  31,  41,  20,   0,   0,   0,  22],
          [  0,   0,   0,   0,  50,   0,   0,   0,   0,   0],
          [  0,   0,   0,  21,  41,  20,   0,   0,   0,  11]]
-GRAIL = np.array(GRAIL)
+GRAIL = np.array(GRAIL, dtype=BOARD_DTYPE)
 
 MERCURY = [[-11,   0,   0,   0, -22, -50, -23,   0,   0,  31],
            [  0,   0,   0,   0,   0, -43, -23,   0,   0,   0],
@@ -147,7 +150,7 @@ MERCURY = [[-11,   0,   0,   0, -22, -50, -23,   0,   0,  31],
            [  0,   0,   0,   0,  41,   0,  31,   0,   0,  21],
            [  0,   0,   0,  21,  41,   0,   0,   0,   0,   0],
            [-31,   0,   0,  21,  50,  20,   0,   0,   0,  11]]
-MERCURY = np.array(MERCURY)
+MERCURY = np.array(MERCURY, dtype=BOARD_DTYPE)
 
 SOPHIE = [[-11,   0,   0,   0, -50,  21, -23,   0,   0,   0],
           [  0,   0,   0, -43,   0, -40,   0,   0,   0,  22],
@@ -157,7 +160,11 @@ SOPHIE = [[-11,   0,   0,   0, -50,  21, -23,   0,   0,   0],
           [-23,   0, -31,   0,  21,  20,   0,   0,   0,  22],
           [-20,   0,   0,   0,  42,   0,  41,   0,   0,   0],
           [  0,   0,   0,  21, -23,  50,   0,   0,   0,  11]]
-SOPHIE = np.array(SOPHIE)
+SOPHIE = np.array(SOPHIE, dtype=BOARD_DTYPE)
+
+# The standard setups, by name.
+STANDARD_SETUPS = {"ACE": ACE, "CURIOSITY": CURIOSITY, "GRAIL": GRAIL,
+                   "MERCURY": MERCURY, "SOPHIE": SOPHIE}
 
 # //////////////////////////////////////////////////////////////////////
 
@@ -0,0 +1,195 @@
+from laser_chess import LaserChess
+from laser_chess_consts import *
+from laser_chess_ai import KING_VALUE, CoordType, MoveType, \
+    distinct_legal_moves, evaluate_board, move_square_mask
+from laser_chess_tt import position_key
+
+import random
+import time
+from math import inf, log, sqrt, tanh
+from typing import Tuple, Union
+
+"""Monte Carlo tree search, an alternative to laser_chess_ai.minimax.
+
+Each iteration walks down the tree from the root, taking the child with
+the best UCT score (its average result plus a bonus for being tried
+little), adds one untried move there, and plays a rollout from it: random
+moves, made with push and taken back with pop, so the board is never
+copied. Moves touching a laser are more likely, since they are the ones
+that capture. A rollout stops when a king is hit or after rollout_plies
+moves, and a game still going is scored by evaluate_board. The result is
+added to every node on the way back up.
+
+The tree is kept between searches: if the position searched next is one
+the tree has already reached (after the move played and the reply), its
+subtree becomes the new root and its results are kept."""
+
+# The constant weighing the tried-little bonus in UCT.
+EXPLORATION = sqrt(2)
+
+DEFAULT_ITERATIONS = 1000
+ROLLOUT_PLIES = 20
+
+# How much likelier a rollout makes moves touching a laser's path.
+LASER_MOVE_WEIGHT = 4
+
+class Node:
+    """A position in the tree, reached by playing coord, move from its
+    parent's. total is the sum of the results of the rollouts through it,
+    from FIRST's side, between -1 and 1 each."""
+    __slots__ = ("parent", "coord", "move", "player", "key", "winner",
+                 "children", "untried", "visits", "total")
+
+    def __init__(self, parent: 'Node', coord: CoordType, move: MoveType,
+                 lzch: LaserChess, player: int):
+        self.parent = parent
+        self.coord = coord
+        self.move = move
+        self.player = player  # the player to move here
+        self.key = position_key(lzch, player)
+        self.winner = lzch.winner
+        self.children = []
+        self.untried = None  # the moves left to expand, once visited
+        self.visits = 0
+        self.total = 0.0
+
+    def uct_child(self, exploration: float) -> 'Node':
+        """The child the player to move here is best off trying next."""
+        log_visits = log(self.visits)
+        return max(self.children, key=lambda child:
+                   self.player * child.total / child.visits +
+                   exploration * sqrt(log_visits / child.visits))
+
+class MCTS:
+    """A Monte Carlo tree search, which keeps its tree from one search to
+    the next."""
+
+    def __init__(self, exploration: float = EXPLORATION,
+                 rollout_plies: int = ROLLOUT_PLIES,
+                 laser_move_weight: float = LASER_MOVE_WEIGHT,
+                 seed: int = None):
+        self.exploration = exploration
+        self.rollout_plies = rollout_plies
+        self.laser_move_weight = laser_move_weight
+        self.random = random.Random(seed)
+        self.root = None
+        self.iterations = 0  # how many the last search did
+
+    def _reuse_root(self, key: int) -> Union[Node, None]:
+        """Finds the position with the Zobrist key at most two moves below
+        the root, so what the tree knows about it is kept."""
+        if self.root is None:
+            return None
+        nodes = [self.root]
+        for _ in range(3):
+            for node in nodes:
+                if node.key == key:
+                    node.parent = None
+                    return node
+            nodes = [child for node in nodes for child in node.children]
+        return None
+
+    def search(self, lzch: LaserChess, max_player: int,
+               iterations: int = None,
+               time_limit_ms: float = None) \
+            -> Tuple[float, CoordType, MoveType]:
+        """Searches lzch's position with max_player to move for iterations
+        iterations, or until time_limit_ms milliseconds have passed if it
+        is given (whichever comes first, if both are). Without either, it
+        does DEFAULT_ITERATIONS iterations. At least one iteration is
+        always done.
+
+        Returns (eval, coord, move) like laser_chess_ai.minimax: the most
+        tried move, and its average result from FIRST's side, between -1
+        and 1 (or inf or -inf if the move hits a king)."""
+        deadline = None
+        if not time_limit_ms is None:
+            deadline = time.perf_counter() + time_limit_ms / 1000
+        elif iterations is None:
+            iterations = DEFAULT_ITERATIONS
+        self.root = self._reuse_root(position_key(lzch, max_player))
+        if self.root is None:
+            self.root = Node(None, None, None, lzch, max_player)
+        if self.root.winner != 0:
+            return (inf * self.root.winner, None, None)
+
+        self.iterations = 0
+        while True:
+            self._iterate(lzch)
+            self.iterations += 1
+            if not iterations is None and self.iterations >= iterations:
+                break
+            if not deadline is None and time.perf_counter() >= deadline:
+                break
+
+        best = max(self.root.children, key=lambda child: child.visits)
+        if best.winner != 0:
+            return (inf * best.winner, best.coord, best.move)
+        return (best.total / best.visits, best.coord, best.move)
+
+    def _iterate(self, lzch: LaserChess) -> None:
+        """One selection, expansion, rollout and update, leaving lzch as it
+        was."""
+        node = self.root
+        pushed = 0
+        try:
+            # selection
+            while node.winner == 0 and node.untried == []:
+                node = node.uct_child(self.exploration)
+                lzch.push(node.coord, node.move, -node.player)
+                pushed += 1
+            # expansion
+            if node.winner == 0:
+                if node.untried is None:
+                    node.untried = distinct_legal_moves(lzch, node.player)
+                    self.random.shuffle(node.untried)
+                coord, move = node.untried.pop()
+                lzch.push(coord, move, node.player)
+                pushed += 1
+                child = Node(node, coord, move, lzch, -node.player)
+                node.children.append(child)
+                node = child
+            # rollout
+            result = self._rollout(lzch, node.player)
+        finally:
+            for _ in range(pushed):
+                lzch.pop()
+        # update
+        while not node is None:
+            node.visits += 1
+            node.total += result
+            node = node.parent
+
+    def _rollout(self, lzch: LaserChess, player: int) -> float:
+        """Plays random moves from lzch's position with player to move,
+        takes them back, and returns the result from FIRST's side: 1 or -1
+        if a king is hit, and otherwise evaluate_board's score squashed
+        between them."""
+        pushed = 0
+        try:
+            while lzch.winner == 0 and pushed < self.rollout_plies:
+                lzch.push(*self._rollout_move(lzch, player), player)
+                pushed += 1
+                player = -player
+            if lzch.winner != 0:
+                return float(lzch.winner)
+            return tanh(evaluate_board(lzch, player) / KING_VALUE)
+        finally:
+            for _ in range(pushed):
+                lzch.pop()
+
+    def _rollout_move(self, lzch: LaserChess, player: int) \
+            -> Tuple[CoordType, MoveType]:
+        """A random move of player's, more likely if it touches a laser."""
+        moves = list(lzch.legal_moves(player))
+        laser_mask = lzch.laser_path(FIRST).mask | lzch.laser_path(SECOND).mask
+        weights = [self.laser_move_weight
+                   if move_square_mask(coord, move) & laser_mask else 1
+                   for coord, move in moves]
+        return self.random.choices(moves, weights)[0]
+
+def mcts(lzch: LaserChess, max_player: int,
+         iterations: int = None, time_limit_ms: float = None,
+         seed: int = None) -> Tuple[float, CoordType, MoveType]:
+    """Searches with a new MCTS, see MCTS.search."""
+    return MCTS(seed=seed).search(lzch, max_player, iterations, time_limit_ms)
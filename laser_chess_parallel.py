@@ -0,0 +1,90 @@
+from laser_chess import BoardState, LaserChess
+from laser_chess_consts import *
+from laser_chess_ai import QUIESCENCE_DEPTH, CoordType, MoveOrdering, \
+    MoveType, _minimax_filtered, _quiescence, distinct_legal_moves
+from laser_chess_tt import TranspositionTable
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from math import inf
+from typing import Tuple
+
+"""Minimax with the root moves spread over a pool of processes.
+
+Each root move is searched by a worker process, on a board rebuilt from
+its BoardState bytes. The best score found so far (from the root player's
+side) is shared by all workers: each one reads it before starting a root
+move and searches with it as its alpha (beta for SECOND), so a move that
+can't beat it is cut off early, and raises it when it finishes a move
+that does. A move searched with the bound can only score below its real
+score when the real score can't beat the bound, so the best score is the
+same as minimax finds.
+
+Every worker keeps its own transposition table and move ordering for all
+the root moves it searches."""
+
+# Set in each worker by _start_worker.
+_best_score = None
+_table = None
+_ordering = None
+
+def _start_worker(best_score, table_mb: float) -> None:
+    global _best_score, _table, _ordering
+    _best_score = best_score
+    _table = TranspositionTable(table_mb)
+    _ordering = MoveOrdering()
+
+def _search_root_move(game_class, state_bytes: bytes, coord: CoordType,
+                      move: MoveType, depth: int, max_player: int,
+                      quiescence_depth: int) -> float:
+    """Searches a root move in a worker, and returns its score. The score
+    is only exact if it beats the shared best score."""
+    lzch = game_class.from_state(BoardState.from_bytes(state_bytes))
+    lzch.push(coord, move, max_player)
+    # _best_score is from max_player's side, so SECOND's is negated
+    bound = _best_score.value
+    if max_player == FIRST:
+        alpha, beta = bound, inf
+    else:
+        alpha, beta = -inf, -bound
+    score = _minimax_filtered(lzch, depth - 1, -max_player,
+                              distinct_legal_moves, alpha, beta,
+                              table=_table, ordering=_ordering, ply=1,
+                              quiescence_depth=quiescence_depth)[0]
+    with _best_score.get_lock():
+        if max_player * score > _best_score.value:
+            _best_score.value = max_player * score
+    return score
+
+def parallel_minimax(lzch: LaserChess, depth: int, max_player: int,
+                     workers: int = None, table_mb: float = 16,
+                     quiescence_depth: int = QUIESCENCE_DEPTH) \
+        -> Tuple[float, CoordType, MoveType]:
+    """Finds the same best score as laser_chess_ai.minimax, searching the
+    root moves in workers processes (os.cpu_count() if None), each with a
+    transposition table of table_mb megabytes. Returns (score, coord, move)
+    like minimax. Among moves with the best score, the one returned may
+    not be the one minimax returns."""
+    if lzch.winner != 0 or depth == 0:
+        return (_quiescence(lzch, max_player, -inf, inf, quiescence_depth),
+                None, None)
+
+    # Moves likely to be good go first, to raise the shared score early.
+    root_moves = MoveOrdering().order(
+        lzch, distinct_legal_moves(lzch, max_player), max_player, 0)
+    state_bytes = lzch.state().to_bytes()
+
+    best_score = multiprocessing.Value("d", -inf)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_start_worker,
+                             initargs=(best_score, table_mb)) as executor:
+        futures = {executor.submit(_search_root_move, type(lzch), state_bytes,
+                                   coord, move, depth, max_player,
+                                   quiescence_depth):
+                   (coord, move) for coord, move in root_moves}
+        results = {futures[future]: future.result()
+                   for future in as_completed(futures)}
+
+    # the first of the best moves in the order they were given out
+    best_coord, best_move = max(root_moves, key=lambda coord_move:
+                                max_player * results[coord_move])
+    return (results[(best_coord, best_move)], best_coord, best_move)
@@ -0,0 +1,98 @@
+from laser_chess import LaserChess
+from laser_chess_bitboard import BitboardLaserChess
+from laser_chess_ai import CoordType, MoveType
+from laser_chess_consts import *
+
+import argparse
+import time
+from typing import Dict, Tuple
+
+"""Perft: counting the move sequences of each length from a position.
+
+perft(lzch, depth) walks every sequence of depth legal moves (every move
+make_move accepts, not just the distinct ones), making each move and
+firing the laser like move_then_laser, with push and pop, and counts the
+positions reached. A game that ends (a king is hit) before depth moves
+has no moves left, so it adds nothing. At the last move, the moves are
+counted without being made.
+
+Any change to move generation or move making has to give exactly the
+counts in PERFT_COUNTS, and so does every engine class. Run the module
+to check them and print how many moves a second each engine makes."""
+
+ENGINES = {"LaserChess": LaserChess, "BitboardLaserChess": BitboardLaserChess}
+
+# PERFT_COUNTS[setup][depth - 1] is perft at depth from the setup, with
+# FIRST to move.
+PERFT_COUNTS = {
+    "ACE": (82, 6715, 545950),
+    "CURIOSITY": (78, 6098, 471805),
+    "GRAIL": (75, 5575, 412175),
+    "MERCURY": (73, 5341, 371641),
+    "SOPHIE": (79, 5996, 449426),
+}
+
+def perft(lzch, depth: int) -> int:
+    """Counts the move sequences of depth moves from lzch's position, with
+    lzch.turn to move. lzch is left as it was."""
+    if lzch.winner != 0:
+        return 0
+    if depth == 0:
+        return 1
+    if depth == 1:
+        return sum(1 for _ in lzch.legal_moves(lzch.turn))
+    nodes = 0
+    for coord, move in list(lzch.legal_moves(lzch.turn)):
+        lzch.push(coord, move)
+        try:
+            nodes += perft(lzch, depth - 1)
+        finally:
+            lzch.pop()
+    return nodes
+
+def divide(lzch, depth: int) -> Dict[Tuple[CoordType, MoveType], int]:
+    """perft split by the first move, to find which move a count is wrong
+    after."""
+    counts = {}
+    for coord, move in list(lzch.legal_moves(lzch.turn)):
+        lzch.push(coord, move)
+        try:
+            counts[(coord, move)] = perft(lzch, depth - 1)
+        finally:
+            lzch.pop()
+    return counts
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Checks perft counts from the standard setups.")
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--engine", choices=tuple(ENGINES), default=None,
+                        help="only this engine (default: all of them)")
+    args = parser.parse_args()
+    engines = ENGINES if args.engine is None else \
+        {args.engine: ENGINES[args.engine]}
+
+    failed = False
+    for engine_name, engine in engines.items():
+        for setup_name, setup in STANDARD_SETUPS.items():
+            for depth in range(1, args.depth + 1):
+                start = time.perf_counter()
+                nodes = perft(engine(setup), depth)
+                seconds = time.perf_counter() - start
+                expected = PERFT_COUNTS[setup_name][depth - 1] \
+                    if depth <= len(PERFT_COUNTS[setup_name]) else None
+                if expected is None:
+                    verdict = ""
+                elif nodes == expected:
+                    verdict = "ok"
+                else:
+                    verdict = f"WRONG, expected {expected}"
+                    failed = True
+                print(f"{engine_name:>18} {setup_name:>9} depth {depth}: "
+                      f"{nodes:>9} nodes, {nodes / seconds:>9.0f} nodes/s "
+                      f"{verdict}")
+    if failed:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
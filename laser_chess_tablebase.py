@@ -0,0 +1,385 @@
+from laser_chess import BoardState, LaserChess, find_orient, find_piece, \
+    make_empty_board, make_piece, num_orientations, FORBIDDEN_SQUARES
+from laser_chess_consts import *
+from laser_chess_ai import CoordType, MoveType
+
+import numpy as np
+import argparse
+import itertools
+from pathlib import Path
+from typing import List, Tuple, Union
+
+"""Endgame tablebases for positions with few pieces left.
+
+Both players always keep their laser (lasers can't be hit) and their king
+(or the game is over), so a position's material is the set of its other
+pieces: its "extras". A tablebase has every position of one material, with
+either player to move, and for each one the result with best play, as the
+number of plies until a king is hit: positive if the player to move wins,
+negative if they lose, and 0 if neither can force a win (a draw, since
+the game has no other way to end).
+
+The results are found by retrograde analysis. Every position's moves are
+made once, to find the positions they lead to, and then, for n = 1, 2, ...,
+the positions winning in n plies (a move to a position lost in n - 1) and
+losing in n (every move leads to a position won in at most n - 1, one of
+them exactly n - 1) are marked, until no more are. A move hitting a piece
+other than a king leads to a smaller material, so its tablebase is built
+first.
+
+Tables are saved as .npy arrays of int16, one per material, which
+Tablebases opens memory-mapped. Sizes, for a side to move, the lasers'
+orientations, the kings' squares and each extra's square and orientation:
+  KLvKL (no extras): 51,200 positions (100 KB), built in seconds.
+  one extra: up to 16 million positions (33 MB), about an hour.
+  two extras: up to 5 billion positions, which is out of reach.
+The table is indexed by every combination, but only the positions a game
+can reach are searched."""
+
+DEFAULT_TABLEBASE_DIR = Path(__file__).with_name("tablebases")
+
+# A won tablebase position scores TABLEBASE_WIN minus its distance, more
+# than evaluate_board gives any position short of a hit king, so the search
+# goes for the fastest win and the slowest loss.
+TABLEBASE_WIN = 10000
+
+SQUARES = ROWS * COLUMNS
+FIRST_LASER_SQUARE = SQUARES - 1
+SECOND_LASER_SQUARE = 0
+
+EXTRA_TYPES = (DEFENDER, SWITCH, DEFLECTOR)
+PIECE_LETTER = {DEFENDER: "F", SWITCH: "S", DEFLECTOR: "D"}
+LETTER_PIECE = {letter: piece for piece, letter in PIECE_LETTER.items()}
+
+# Type alias:
+Material = Tuple[int, ...]  # extras as signed piece types, e.g. (20, -30)
+
+def normalize_material(extras) -> Material:
+    """Puts the extras in the order tables index them: FIRST's first, then
+    by piece type."""
+    return tuple(sorted(extras, reverse=True))
+
+def material_name(material: Material) -> str:
+    """Names a material like KLDvKLS: FIRST's king, laser and extras, then
+    SECOND's (F for defenders, S for switches, D for deflectors)."""
+    first = "".join(PIECE_LETTER[piece] for piece in material if piece > 0)
+    second = "".join(PIECE_LETTER[-piece] for piece in material if piece < 0)
+    return f"KL{first}vKL{second}"
+
+def parse_material(name: str) -> Material:
+    """The opposite of material_name."""
+    first, second = name.split("v")
+    assert first.startswith("KL") and second.startswith("KL"), name
+    return normalize_material(
+        [LETTER_PIECE[letter] for letter in first[2:]] +
+        [-LETTER_PIECE[letter] for letter in second[2:]])
+
+def sub_materials(material: Material) -> List[Material]:
+    """The materials left after one of the extras is hit."""
+    return sorted({material[:i] + material[i + 1:]
+                   for i in range(len(material))})
+
+def edge_value(value: int) -> int:
+    """The result of a move for the player making it, from the result of
+    the position it leads to for the other player."""
+    if value < 0:
+        return 1 - value
+    elif value > 0:
+        return -1 - value
+    return 0
+
+class Tablebase:
+    """The results of every position of one material. values is None until
+    they are built or loaded."""
+
+    def __init__(self, material: Material, values: np.ndarray = None):
+        self.material = normalize_material(material)
+        # the digits of an index: player to move, the lasers' orientations,
+        # the kings' squares, and square * orientations + orientation for
+        # each extra
+        self.radices = [2, 2, 2, SQUARES, SQUARES] + \
+            [SQUARES * num_orientations(abs(piece)) for piece in self.material]
+        self.size = int(np.prod(self.radices, dtype=np.int64))
+        assert values is None or values.shape == (self.size,)
+        self.values = values
+
+    @property
+    def name(self) -> str:
+        return material_name(self.material)
+
+    def index(self, board: np.ndarray, player: int) -> Union[int, None]:
+        """The index of board with player to move, or None if the board's
+        material isn't this table's."""
+        board = board.ravel()
+        kings = {}
+        extras = {}
+        for square in np.flatnonzero(board).tolist():
+            piece = int(board[square])
+            if square in {FIRST_LASER_SQUARE, SECOND_LASER_SQUARE}:
+                continue
+            piece_type = find_piece(piece)
+            signed_type = piece_type if piece > 0 else -piece_type
+            if piece_type == KING:
+                kings[signed_type] = square
+            else:
+                extras.setdefault(signed_type, []).append(
+                    square * num_orientations(piece_type) + find_orient(piece))
+        if len(kings) != 2:
+            return None
+        digits = [0 if player == FIRST else 1,
+                  find_orient(int(board[FIRST_LASER_SQUARE])),
+                  find_orient(int(board[SECOND_LASER_SQUARE])),
+                  kings[KING], kings[-KING]]
+        # pieces of the same type go in the order of their squares
+        for signed_type in self.material:
+            squares = extras.get(signed_type)
+            if not squares:
+                return None
+            digits.append(squares.pop(0))
+        if any(extras.values()):
+            return None
+        index = 0
+        for digit, radix in zip(digits, self.radices):
+            index = index * radix + digit
+        return index
+
+    def probe(self, lzch: LaserChess, player: int) -> Union[int, None]:
+        """The result of lzch's position with player to move (see the
+        module), or None if its material isn't this table's."""
+        index = self.index(lzch.board, player)
+        if index is None:
+            return None
+        return int(self.values[index])
+
+    def save(self, directory: Union[str, Path] = DEFAULT_TABLEBASE_DIR) \
+            -> Path:
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"{self.name}.npy"
+        np.save(path, self.values)
+        return path
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> 'Tablebase':
+        """Opens a table saved by save, memory-mapped."""
+        path = Path(path)
+        return cls(parse_material(path.stem), np.load(path, mmap_mode="r"))
+
+class Tablebases:
+    """The tablebases of several materials, probed by the search."""
+
+    def __init__(self, directory: Union[str, Path, None] =
+                 DEFAULT_TABLEBASE_DIR):
+        self._tables = {}
+        self._max_pieces = 0
+        if not directory is None and Path(directory).is_dir():
+            for path in sorted(Path(directory).glob("KL*vKL*.npy")):
+                self.add(Tablebase.load(path))
+
+    def __contains__(self, material: Material) -> bool:
+        return normalize_material(material) in self._tables
+
+    def __len__(self) -> int:
+        return len(self._tables)
+
+    def add(self, table: Tablebase) -> None:
+        self._tables[table.material] = table
+        # kings and lasers, and the extras
+        self._max_pieces = max(self._max_pieces, 4 + len(table.material))
+
+    def probe(self, lzch: LaserChess, player: int) -> Union[int, None]:
+        """The result of lzch's position with player to move (see the
+        module), or None if no table has its material."""
+        if lzch.winner != 0 or lzch.piece_count(FIRST) + \
+           lzch.piece_count(SECOND) > self._max_pieces:
+            return None
+        extras = []
+        for piece in lzch.board.ravel().tolist():
+            piece_type = find_piece(piece)
+            if piece_type in EXTRA_TYPES:
+                extras.append(piece_type if piece > 0 else -piece_type)
+        table = self._tables.get(normalize_material(extras))
+        if table is None:
+            return None
+        return table.probe(lzch, player)
+
+    def score(self, lzch: LaserChess, player: int) -> Union[float, None]:
+        """Like probe, but as a score from FIRST's side like evaluate_board
+        gives (see TABLEBASE_WIN), or None if no table has the position."""
+        value = self.probe(lzch, player)
+        if value is None:
+            return None
+        elif value == 0:
+            return 0.0
+        return float(player * np.sign(value) * (TABLEBASE_WIN - abs(value)))
+
+    def move_value(self, lzch: LaserChess, coord: CoordType, move: MoveType,
+                   player: int) -> Union[int, None]:
+        """The result of player's move for player, like probe gives them,
+        or None if the position it leads to isn't in the tables."""
+        lzch.push(coord, move, player)
+        try:
+            if lzch.winner != 0:
+                return 1 if lzch.winner == player else -1
+            value = self.probe(lzch, -player)
+        finally:
+            lzch.pop()
+        return None if value is None else edge_value(value)
+
+    def best_move(self, lzch: LaserChess, player: int) \
+            -> Union[Tuple[float, CoordType, MoveType], None]:
+        """The tables' best move for player, as (score, coord, move) like
+        laser_chess_ai.minimax returns: the fastest win, otherwise a draw,
+        otherwise the slowest loss. None if the tables can't tell, because
+        the moves that would reach the position's result lead to material
+        no table has."""
+        def preference(value: int) -> Tuple[int, int]:
+            if value > 0:
+                return (2, -value)
+            elif value == 0:
+                return (1, 0)
+            return (0, -value)
+
+        best = None
+        for coord, move in lzch.legal_moves(player, distinct=True):
+            value = self.move_value(lzch, coord, move, player)
+            if value is None:
+                continue
+            if best is None or preference(value) > preference(best[0]):
+                best = (value, coord, move)
+        if best is None or best[0] != self.probe(lzch, player):
+            return None
+        return (self.score(lzch, player), best[1], best[2])
+
+def _positions(table: Tablebase):
+    """Yields (index, board, player) for every position of table a game
+    can reach. That includes positions where the laser of the player who
+    moved last points at a piece: the piece it hit may have been blocking
+    it."""
+    material = table.material
+    extra_choices = []
+    for piece in material:
+        extra_choices.append([(square, orient) for square in range(SQUARES)
+                              for orient in range(num_orientations(abs(piece)))])
+    corners = {FIRST_LASER_SQUARE, SECOND_LASER_SQUARE}
+    king_squares = {player: [square for square in range(SQUARES)
+                             if not square in corners and
+                             not square in FORBIDDEN_SQUARES[player]]
+                    for player in PLAYER}
+    for player, laser1, laser2 in itertools.product((FIRST, SECOND), (0, 1),
+                                                    (0, 1)):
+        for king1, king2 in itertools.product(king_squares[FIRST],
+                                              king_squares[SECOND]):
+            if king1 == king2:
+                continue
+            for extras in itertools.product(*extra_choices):
+                squares = [square for square, _ in extras]
+                if len(set(squares) | {king1, king2} | corners) != \
+                   len(squares) + 4:
+                    continue
+                # pieces of the same type are only taken in square order
+                if any(material[i] == material[i + 1] and
+                       squares[i] > squares[i + 1]
+                       for i in range(len(material) - 1)):
+                    continue
+                board = make_empty_board()
+                board.flat[FIRST_LASER_SQUARE] = make_piece(FIRST, LASER,
+                                                            laser1)
+                board.flat[SECOND_LASER_SQUARE] = make_piece(SECOND, LASER,
+                                                             laser2)
+                board.flat[king1] = KING_1
+                board.flat[king2] = KING_2
+                for piece, (square, orient) in zip(material, extras):
+                    board.flat[square] = make_piece(
+                        FIRST if piece > 0 else SECOND, abs(piece), orient)
+                yield (table.index(board, player), board, player)
+
+def build_tablebase(material, tablebases: Tablebases = None,
+                    directory: Union[str, Path, None] = None) -> Tablebase:
+    """Builds the tablebase of material (extras as signed piece types),
+    first building any smaller one it needs that tablebases doesn't have.
+    The tables built are added to tablebases and, if directory is given,
+    saved there."""
+    material = normalize_material(material)
+    if tablebases is None:
+        tablebases = Tablebases(None)
+    for sub_material in sub_materials(material):
+        if not sub_material in tablebases:
+            build_tablebase(sub_material, tablebases, directory)
+    table = Tablebase(material)
+    table.values = np.zeros(table.size, dtype=np.int16)
+
+    # Every position's moves, as the index of the position they lead to,
+    # or (if they hit a piece) -1 and their result, known already.
+    positions = []
+    move_starts = []
+    move_targets = []
+    move_results = []
+    for index, board, player in _positions(table):
+        lzch = LaserChess.from_state(BoardState(board, player))
+        positions.append(index)
+        move_starts.append(len(move_targets))
+        for coord, move in lzch.legal_moves(player, distinct=True):
+            record = lzch.push(coord, move, player)
+            if record.captured_piece is None:
+                move_targets.append(table.index(lzch.board, -player))
+                move_results.append(0)
+            else:
+                move_targets.append(-1)
+                if lzch.winner != 0:
+                    move_results.append(1 if lzch.winner == player else -1)
+                else:
+                    move_results.append(edge_value(
+                        tablebases.probe(lzch, -player)))
+            lzch.pop()
+
+    positions = np.array(positions, dtype=np.int64)
+    move_starts = np.array(move_starts, dtype=np.int64)
+    move_results = np.array(move_results, dtype=np.int16)
+    # the positions' numbers in positions, instead of their indices
+    position_number = np.full(table.size, -1, dtype=np.int64)
+    position_number[positions] = np.arange(len(positions))
+    move_targets = np.array(move_targets, dtype=np.int64)
+    in_table = move_targets >= 0
+    move_targets = position_number[np.where(in_table, move_targets, 0)]
+
+    values = np.zeros(len(positions), dtype=np.int16)
+    last_result = int(np.abs(move_results).max(initial=0))
+    plies = 0
+    while True:
+        plies += 1
+        target_values = values[move_targets]
+        move_values = np.where(
+            in_table,
+            np.where(target_values < 0, 1 - target_values,
+                     np.where(target_values > 0, -1 - target_values, 0)),
+            move_results)
+        undecided = values == 0
+        wins = undecided & np.logical_or.reduceat(move_values == plies,
+                                                  move_starts)
+        losses = undecided & \
+            (np.maximum.reduceat(move_values, move_starts) < 0) & \
+            (np.minimum.reduceat(move_values, move_starts) == -plies)
+        values[wins] = plies
+        values[losses] = -plies
+        if not (wins | losses).any() and plies >= last_result:
+            break
+
+    table.values[positions] = values
+    tablebases.add(table)
+    if not directory is None:
+        table.save(directory)
+    return table
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Builds endgame tablebases, like KLvKL or KLDvKL.")
+    parser.add_argument("materials", nargs="+")
+    parser.add_argument("--directory", default=DEFAULT_TABLEBASE_DIR)
+    args = parser.parse_args()
+    tablebases = Tablebases(args.directory)
+    for name in args.materials:
+        build_tablebase(parse_material(name), tablebases, args.directory)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+from laser_chess import MOVE_ORDER, ZOBRIST_SECOND
+from laser_chess_consts import *
+
+import numpy as np
+from typing import Tuple, Union
+
+"""A transposition table for laser_chess_ai's minimax search.
+
+The same position is reached again and again in a search, by different
+move orders (rotations commute with almost everything), so the table
+remembers what was found about each position searched: its score, how deep
+it was searched, whether the score is exact or only a bound, and the best
+move found there.
+
+The table has a fixed memory budget. Positions are spread over buckets by
+their Zobrist key, and each bucket has two slots: the first keeps the
+deepest search of the positions landing in the bucket, the second always
+takes the newest one."""
+
+# Bound types: what a stored score says about the position's real score.
+EXACT = 0
+LOWER = 1  # the real score is at least the stored one
+UPPER = 2  # the real score is at most the stored one
+
+DEFAULT_TABLE_MB = 16
+
+SLOTS = 2  # depth-preferred, always-replace
+DEPTH_PREFERRED = 0
+ALWAYS_REPLACE = 1
+
+# Bytes one slot takes: key, score, depth, bound and move.
+SLOT_BYTES = 8 + 8 + 1 + 1 + 2
+
+NO_MOVE = -1
+MOVE_INDEX = {move: index for index, move in enumerate(MOVE_ORDER)}
+
+# Type alliases:
+MoveType = Union[int, Tuple[int, int]]
+CoordType = Tuple[int, int]
+
+def encode_move(coord: CoordType, move: MoveType) -> int:
+    """Packs a move into one small integer."""
+    if coord is None:
+        return NO_MOVE
+    square = int(coord[0]) * COLUMNS + int(coord[1])
+    return square * len(MOVE_ORDER) + MOVE_INDEX[move]
+
+def decode_move(code: int) -> Tuple[CoordType, MoveType]:
+    """The opposite of encode_move. NO_MOVE decodes to (None, None)."""
+    if code == NO_MOVE:
+        return (None, None)
+    square, index = divmod(code, len(MOVE_ORDER))
+    return (divmod(square, COLUMNS), MOVE_ORDER[index])
+
+def position_key(lzch, player: int) -> int:
+    """The Zobrist key of lzch's board with player to move. The key
+    lzch.zobrist_key uses lzch.turn instead, which isn't always the player
+    the search is choosing a move for."""
+    key = lzch.zobrist_key
+    if lzch.turn != player:
+        key ^= ZOBRIST_SECOND
+    return key
+
+class TranspositionTable:
+    """A fixed-size table of searched positions, keyed by Zobrist key."""
+
+    def __init__(self, megabytes: float = DEFAULT_TABLE_MB):
+        buckets = int(megabytes * 2 ** 20) // (SLOTS * SLOT_BYTES)
+        assert buckets >= 1, "the table must fit at least one bucket"
+        # round down to a power of two so the bucket is just the low bits
+        self.buckets = 1 << (buckets.bit_length() - 1)
+        self._mask = self.buckets - 1
+
+        shape = (self.buckets, SLOTS)
+        self._keys = np.zeros(shape, dtype=np.uint64)
+        self._scores = np.zeros(shape, dtype=np.float64)
+        self._depths = np.full(shape, -1, dtype=np.int8)  # -1 is empty
+        self._bounds = np.zeros(shape, dtype=np.int8)
+        self._moves = np.full(shape, NO_MOVE, dtype=np.int16)
+
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+
+    @property
+    def nbytes(self) -> int:
+        """The memory the table's arrays take."""
+        return sum(array.nbytes for array in (self._keys, self._scores,
+                   self._depths, self._bounds, self._moves))
+
+    @property
+    def hit_rate(self) -> float:
+        """The fraction of probes that found their position."""
+        if self.probes == 0:
+            return 0.0
+        return self.hits / self.probes
+
+    def clear(self) -> None:
+        """Forgets every position and resets the counts."""
+        self._depths.fill(-1)
+        self._moves.fill(NO_MOVE)
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+
+    def probe(self, key: int) \
+        -> Union[Tuple[int, float, int, CoordType, MoveType], None]:
+        """Looks up the position with the Zobrist key. Returns (depth, score,
+        bound, coord, move) if it is stored, otherwise None."""
+        self.probes += 1
+        bucket = key & self._mask
+        for slot in range(SLOTS):
+            if self._depths[bucket, slot] >= 0 and \
+               int(self._keys[bucket, slot]) == key:
+                self.hits += 1
+                coord, move = decode_move(int(self._moves[bucket, slot]))
+                return (int(self._depths[bucket, slot]),
+                        float(self._scores[bucket, slot]),
+                        int(self._bounds[bucket, slot]), coord, move)
+        return None
+
+    def store(self, key: int, depth: int, score: float, bound: int,
+              coord: CoordType, move: MoveType) -> None:
+        """Stores what a search of depth found about the position with the
+        Zobrist key. It takes the depth-preferred slot if it is searched at
+        least as deep as what is there (or is the same position), and the
+        always-replace slot otherwise."""
+        self.stores += 1
+        bucket = key & self._mask
+        if self._depths[bucket, DEPTH_PREFERRED] <= depth or \
+           int(self._keys[bucket, DEPTH_PREFERRED]) == key:
+            slot = DEPTH_PREFERRED
+        else:
+            slot = ALWAYS_REPLACE
+        self._keys[bucket, slot] = key
+        self._scores[bucket, slot] = score
+        self._depths[bucket, slot] = depth
+        self._bounds[bucket, slot] = bound
+        self._moves[bucket, slot] = encode_move(coord, move)
@@ -5,6 +5,10 @@ import laser_chess
 from laser_chess import LaserChess
 from laser_chess_consts import *
 import laser_chess_ai
+from laser_chess_tt import TranspositionTable
+from laser_chess_book import DEFAULT_BOOK_PATH, OpeningBook
+from laser_chess_tablebase import Tablebases
+from laser_chess_mcts import MCTS
 
 from typing import Tuple, List, TypedDict
 from pathlib import Path
@@ -21,6 +25,11 @@ button and press A for counterclockwise, D for clockwise.
 
 SQUARE_SIZE = 50
 
+# How long the AI thinks about each move, in milliseconds.
+AI_TIME_LIMIT_MS = 2000
+# The search the AI uses: "minimax" or "mcts".
+AI_ENGINE = "minimax"
+
 # Colour tuples
 WHITE  = (255, 255, 255)
 BLACK  = (0, 0, 0)
@@ -98,6 +107,16 @@ def main():
 
   ai = False
   evaluate = False
+  # the AI's transposition table, kept from move to move
+  ai_table = TranspositionTable()
+  # the opening book, if one was built (see laser_chess_book)
+  ai_book = OpeningBook.load() if DEFAULT_BOOK_PATH.exists() else None
+  # the endgame tablebases built (see laser_chess_tablebase), if any
+  ai_tablebases = Tablebases()
+  # the MCTS engine's tree, kept from move to move
+  ai_mcts = MCTS()
+  # the line the AI expects after its move
+  ai_pv = []
 
   # I initially draw the screen first, in case bad stuff happens.
   SCREEN = laser_chess_screen()
@@ -109,7 +128,15 @@ def main():
           terminate()
           return
       if ai and laser_board.winner == 0 and cur_player == SECOND:
-        thing = laser_chess_ai.minimax(laser_board, depth=3, max_player=cur_player)
+        if AI_ENGINE == "mcts":
+          thing = ai_mcts.search(laser_board, cur_player,
+                                 time_limit_ms=AI_TIME_LIMIT_MS)
+        else:
+          thing = laser_chess_ai.iterative_deepening(
+            laser_board, AI_TIME_LIMIT_MS, max_player=cur_player,
+            table=ai_table, book=ai_book, tablebases=ai_tablebases,
+            pv=ai_pv)
+          print(f"Expected line: {ai_pv}")
         print(thing) 
         points, loc, move = thing
         if not None in {loc, move}:
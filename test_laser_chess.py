@@ -1,6 +1,7 @@
 from laser_chess import *
 from laser_chess_consts import *
 import pytest
+import random
 import unittest
 
 def board_with_corner_kings():
@@ -426,6 +427,374 @@ class TestLaserMisc():
     print(test_board)
     assert test_board.shoot_laser(FIRST) == KING_2
 
+class TestLaserTables():
+  def test_reflection_table(self):
+    n, e, s, w = (DIRECTION_INDEX[d] for d in (N, E, S, W))
+    assert REFLECTION_TABLE[FLEC_NE1][w] == (n, False)
+    assert REFLECTION_TABLE[FLEC_NE2][e] == (STOP, True)
+    assert REFLECTION_TABLE[SWITCH_NWSE2][s] == (w, False)
+    assert REFLECTION_TABLE[FEND_N1][s] == (STOP, False)
+    assert REFLECTION_TABLE[FEND_N1][n] == (STOP, True)
+    assert REFLECTION_TABLE[LASER_V2][e] == (e, False)
+    assert REFLECTION_TABLE[0][n] == (n, False)
+
+  def test_laser_step(self):
+    assert LASER_STEP[DIRECTION_INDEX[N]][0] == STOP
+    assert LASER_STEP[DIRECTION_INDEX[E]][0] == 1
+    assert LASER_STEP[DIRECTION_INDEX[S]][0] == COLUMNS
+    assert LASER_STEP[DIRECTION_INDEX[E]][COLUMNS - 1] == STOP
+
+  def test_trace_does_not_change_board(self):
+    test_board = board_with_corner_kings()
+    test_board.board[6, 9] = FLEC_SW1
+    path, hit = test_board._trace_laser(FIRST)
+    assert path == [(7, 9), (6, 9), (6, 8)]
+    assert hit
+    assert test_board.board[6, 8] == KING_1
+    assert test_board.winner == 0
+
+"""This tests taking moves back with push and pop."""
+
+class TestPushPop():
+  def test_pop_restores_move(self):
+    test_board = LaserChess(ACE)
+    record = test_board.push((7, 4), N, FIRST)
+    assert record is not None
+    assert test_board.board[6, 4] == KING_1
+    assert test_board.turn == SECOND
+    test_board.pop()
+    assert (test_board.board == ACE).all()
+    assert test_board.turn == FIRST
+
+  def test_pop_restores_rotation_and_switch(self):
+    test_board = board_with_corner_kings()
+    test_board.board[3, 2] = SWITCH_NESW1
+    test_board.board[4, 3] = FLEC_SE1
+    before = test_board.board.copy()
+    test_board.push((7, 9), CCW, FIRST)
+    test_board.push((3, 2), SE, FIRST)
+    assert test_board.board[3, 2] == FLEC_SE1
+    assert test_board.board[4, 3] == SWITCH_NESW1
+    test_board.pop()
+    test_board.pop()
+    assert (test_board.board == before).all()
+
+  def test_pop_restores_capture_and_winner(self):
+    test_board = board_with_corner_kings()
+    test_board.board[3, 8] = FLEC_SW1
+    test_board.board[3, 1] = FLEC_SW2
+    before = test_board.board.copy()
+    record = test_board.push((3, 8), E, FIRST)
+    assert record.captured_piece == FLEC_SW2
+    assert record.captured_coord == (3, 1)
+    assert test_board.board[3, 1] == 0
+    test_board.pop()
+    assert (test_board.board == before).all()
+
+    test_board.board[6, 8] = 0
+    test_board.board[7, 5] = KING_1
+    record = test_board.push((7, 9), CCW, FIRST)
+    assert record.captured_piece == KING_1
+    assert test_board.winner == SECOND
+    test_board.pop()
+    assert test_board.winner == 0
+    assert test_board.board[7, 5] == KING_1
+
+  def test_invalid_push_changes_nothing(self):
+    test_board = LaserChess(ACE)
+    assert test_board.push((7, 9), N, FIRST) is None
+    assert test_board.push((0, 0), CW, FIRST) is None
+    assert (test_board.board == ACE).all()
+    assert test_board.turn == FIRST
+    with pytest.raises(IndexError):
+      test_board.pop()
+
+  def test_push_without_laser(self):
+    test_board = board_with_corner_kings()
+    test_board.board[3, 8] = FLEC_SW1
+    test_board.board[3, 1] = FLEC_SW2
+    record = test_board.push((3, 8), E, FIRST, laser=False)
+    assert record.captured_piece is None
+    assert test_board.board[3, 1] == FLEC_SW2
+    assert test_board.turn == FIRST
+
+"""This tests the compact board state."""
+
+class TestBoardState():
+  def test_boards_are_int8(self):
+    assert make_empty_board().dtype == BOARD_DTYPE
+    assert LaserChess(ACE).board.nbytes == ROWS * COLUMNS
+
+  def test_bytes_round_trip(self):
+    test_board = LaserChess(SOPHIE, SECOND)
+    test_board.winner = FIRST
+    data = test_board.state().to_bytes()
+    assert len(data) == ROWS * COLUMNS + 2
+    state = BoardState.from_bytes(data)
+    assert (state.board == SOPHIE).all()
+    assert state.turn == SECOND
+    assert state.winner == FIRST
+
+  def test_copies_do_not_share_board(self):
+    test_board = LaserChess(ACE)
+    state = test_board.state()
+    state_copy = state.copy()
+    game_copy = test_board.copy()
+    test_board.make_move((7, 4), N, FIRST)
+    assert (state.board == ACE).all()
+    assert (game_copy.board == ACE).all()
+    state_copy.board[7, 4] = 0
+    assert state.board[7, 4] == KING_1
+
+  def test_from_state(self):
+    test_board = LaserChess.from_state(BoardState(GRAIL.copy(), SECOND))
+    assert test_board.turn == SECOND
+    assert test_board.move_then_laser((0, 0), CCW)[0]
+    assert (GRAIL[0, 0] == LASER_V2)
+
+"""This tests generating the legal moves."""
+
+def tried_moves(test_board: LaserChess, player: int):
+  """
+  Finds the legal moves by trying every move with push and pop.
+  """
+  moves = []
+  for coord in SQUARE_COORD:
+    for move in MOVE_ORDER:
+      if test_board.push(coord, move, player, laser=False) is not None:
+        test_board.pop()
+        moves.append((coord, move))
+  return moves
+
+class TestLegalMoveGeneration():
+  def test_standard_setups(self):
+    for setup in (ACE, CURIOSITY, GRAIL, MERCURY, SOPHIE):
+      test_board = LaserChess(setup)
+      for player in PLAYER:
+        assert list(test_board.legal_moves(player)) == \
+               tried_moves(test_board, player)
+
+  def test_forbidden_and_switch_moves(self):
+    test_board = board_with_corner_kings()
+    test_board.board[4, 8] = SWITCH_NESW2
+    test_board.board[3, 9] = FLEC_NE1
+    test_board.board[4, 1] = SWITCH_NWSE1
+    test_board.board[3, 0] = FLEC_NW2
+    test_board.board[5, 2] = FEND_E2
+    for player in PLAYER:
+      assert list(test_board.legal_moves(player)) == \
+             tried_moves(test_board, player)
+    assert ((4, 1), SE) in test_board.legal_moves(FIRST)
+    assert not ((4, 8), NE) in test_board.legal_moves(SECOND)
+
+  def test_distinct_moves(self):
+    def resulting_keys(test_board, player, distinct):
+      keys = []
+      for coord, move in list(test_board.legal_moves(player, distinct)):
+        test_board.push(coord, move, player, laser=False)
+        keys.append(test_board.zobrist_key)
+        test_board.pop()
+      return keys
+
+    for setup in (ACE, CURIOSITY, GRAIL, MERCURY, SOPHIE):
+      test_board = LaserChess(setup)
+      for player in PLAYER:
+        test_board.turn = player
+        distinct_keys = resulting_keys(test_board, player, True)
+        all_keys = set(resulting_keys(test_board, player, False))
+        # rotating the king is the only move that changes nothing
+        all_keys.discard(test_board.zobrist_key)
+        assert len(set(distinct_keys)) == len(distinct_keys)
+        assert set(distinct_keys) == all_keys
+
+  def test_defaults_to_turn(self):
+    test_board = LaserChess(ACE, SECOND)
+    assert list(test_board.legal_moves()) == \
+           list(test_board.legal_moves(SECOND))
+
+"""This tests the Zobrist keys."""
+
+def scratch_key(test_board: LaserChess) -> int:
+  key = zobrist_board_key(test_board.board)
+  if test_board.turn == SECOND:
+    key ^= ZOBRIST_SECOND
+  return key
+
+class TestZobrist():
+  def test_key_follows_moves_and_captures(self):
+    test_board = LaserChess(ACE)
+    moves = [((7, 9), CCW), ((0, 0), CCW), ((6, 7), N), ((3, 5), S),
+             ((5, 2), W), ((0, 7), CW)]
+    for coord, move in moves:
+      test_board.move_then_laser(coord, move)
+      assert test_board.zobrist_key == scratch_key(test_board)
+
+    test_board = board_with_corner_kings()
+    test_board.board[3, 8] = FLEC_SW1
+    test_board.board[3, 1] = FLEC_SW2
+    test_board.rehash()
+    assert test_board.push((3, 8), E, FIRST).captured_piece == FLEC_SW2
+    assert test_board.zobrist_key == scratch_key(test_board)
+
+  def test_pop_restores_key(self):
+    test_board = LaserChess(GRAIL)
+    key = test_board.zobrist_key
+    test_board.push((7, 9), CCW)
+    test_board.push((2, 6), N)
+    assert test_board.zobrist_key != key
+    test_board.pop()
+    test_board.pop()
+    assert test_board.zobrist_key == key
+
+  def test_transpositions_share_keys(self):
+    one_way = LaserChess(ACE)
+    one_way.make_move((6, 7), N, FIRST)
+    one_way.make_move((2, 3), CW, FIRST)
+    other_way = LaserChess(ACE)
+    other_way.make_move((2, 3), CW, FIRST)
+    other_way.make_move((6, 7), N, FIRST)
+    assert one_way.zobrist_key == other_way.zobrist_key
+    other_way.turn = SECOND
+    assert one_way.zobrist_key != other_way.zobrist_key
+
+"""This tests the cached laser paths."""
+
+def traced_path(test_board: LaserChess, player: int) -> LaserPath:
+  path, hit = test_board._trace_laser(player)
+  return LaserPath(tuple(path), square_mask(path),
+                   test_board.board[path[-1]] if hit else None)
+
+class TestLaserPathCache():
+  def test_path_is_cached_until_touched(self):
+    test_board = LaserChess(ACE)
+    laser1 = test_board.laser_path(FIRST)
+    laser2 = test_board.laser_path(SECOND)
+    assert laser1 == traced_path(test_board, FIRST)
+    assert test_board.laser_path(FIRST) is laser1
+    # (2, 3) is off both laser paths, so neither is traced again
+    assert not laser1.mask & laser2.mask & square_mask([(2, 3)])
+    test_board.make_move((2, 3), CW, FIRST)
+    assert test_board.laser_path(FIRST) is laser1
+    assert test_board.laser_path(SECOND) is laser2
+    # rotating the laser changes its path
+    test_board.make_move((7, 9), CCW, FIRST)
+    assert test_board.laser_path(FIRST) is not laser1
+    assert test_board.laser_path(FIRST) == traced_path(test_board, FIRST)
+
+  def test_laser_path_does_not_change_game(self):
+    test_board = LaserChess(ACE, SECOND)
+    key = test_board.zobrist_key
+    test_board.laser_path(FIRST)
+    test_board.laser_path(SECOND)
+    assert (test_board.board == ACE).all()
+    assert test_board.turn == SECOND
+    assert test_board.zobrist_key == key
+
+  def test_pop_restores_paths(self):
+    test_board = board_with_corner_kings()
+    test_board.board[3, 8] = FLEC_SW1
+    test_board.board[3, 1] = FLEC_SW2
+    test_board.rehash()
+    laser1 = test_board.laser_path(FIRST)
+    assert laser1.piece is None
+    test_board.push((3, 8), E, FIRST)
+    assert test_board.laser_path(FIRST) == traced_path(test_board, FIRST)
+    test_board.pop()
+    assert test_board.laser_path(FIRST) is laser1
+
+  def test_random_games(self):
+    rng = random.Random(9)
+    for setup in (ACE, CURIOSITY, GRAIL, MERCURY, SOPHIE):
+      test_board = LaserChess(setup)
+      for _ in range(40):
+        if test_board.winner != 0:
+          break
+        for player in PLAYER:
+          assert test_board.laser_path(player) == \
+                 traced_path(test_board, player)
+        coord, move = rng.choice(list(test_board.legal_moves()))
+        test_board.push(coord, move)
+      while test_board._move_stack:
+        test_board.pop()
+        for player in PLAYER:
+          assert test_board.laser_path(player) == \
+                 traced_path(test_board, player)
+
+  def test_paths_after_move(self):
+    rng = random.Random(17)
+    for setup in (ACE, GRAIL, SOPHIE):
+      test_board = LaserChess(setup)
+      for _ in range(20):
+        if test_board.winner != 0:
+          break
+        laser_paths = (test_board.laser_path(FIRST),
+                       test_board.laser_path(SECOND))
+        board = test_board.board.copy()
+        key = test_board.zobrist_key
+        moves = list(test_board.legal_moves())
+        for coord, move in moves:
+          after = test_board.copy()
+          after.make_move(coord, move)
+          assert test_board.laser_paths_after_move(coord, move) == \
+                 (traced_path(after, FIRST), traced_path(after, SECOND))
+        assert (test_board.board == board).all()
+        assert test_board.zobrist_key == key
+        assert test_board.laser_path(FIRST) is laser_paths[0]
+        assert test_board.laser_path(SECOND) is laser_paths[1]
+        test_board.push(*rng.choice(moves))
+
+"""This tests the evaluation terms LaserChess keeps up to date."""
+
+def assert_eval_terms(test_board: LaserChess):
+  for player in PLAYER:
+    assert test_board.piece_count(player) == \
+           np.count_nonzero(np.sign(test_board.board) == player)
+    kings = list(zip(*np.where(test_board.board == player * KING)))
+    assert test_board.king_coord(player) == (kings[0] if kings else None)
+  laser_squares = set(test_board.laser_path(FIRST).path) | \
+                  set(test_board.laser_path(SECOND).path)
+  assert test_board.laser_engaged_pieces() == \
+         sum(int(np.sign(test_board.board[coord])) for coord in laser_squares)
+
+class TestEvalTerms():
+  def test_random_games(self):
+    rng = random.Random(15)
+    for setup in (ACE, CURIOSITY, GRAIL, MERCURY, SOPHIE):
+      test_board = LaserChess(setup)
+      assert_eval_terms(test_board)
+      while test_board.winner == 0 and len(test_board._move_stack) < 60:
+        coord, move = rng.choice(list(test_board.legal_moves()))
+        test_board.push(coord, move)
+        assert_eval_terms(test_board)
+      while test_board._move_stack:
+        test_board.pop()
+        assert_eval_terms(test_board)
+
+  def test_king_capture(self):
+    test_board = board_with_corner_kings()
+    test_board.board[6, 8] = 0
+    test_board.board[7, 5] = KING_1
+    test_board.rehash()
+    assert test_board.king_coord(FIRST) == (7, 5)
+    test_board.push((7, 9), CCW, FIRST)
+    assert test_board.king_coord(FIRST) is None
+    assert_eval_terms(test_board)
+    test_board.pop()
+    assert test_board.king_coord(FIRST) == (7, 5)
+
+  def test_copy_after_pop(self):
+    test_board = LaserChess(ACE)
+    test_board.push((7, 4), N)
+    test_board.push((0, 5), S)
+    copied = test_board.copy()
+    test_board.pop()
+    assert test_board.push((6, 4), NE, FIRST) is not None
+    copied.pop()
+    assert_eval_terms(copied)
+    copied.pop()
+    assert_eval_terms(copied)
+    assert (copied.board == ACE).all()
+
 def main():
     pytest.main()
 
@@ -0,0 +1,315 @@
+from laser_chess import *
+from laser_chess_consts import *
+from laser_chess_ai import *
+from laser_chess_ai import _minimax_filtered, _null_move_allowed, _quiescence
+import pytest
+import random
+import time
+
+"""This tests the search in laser_chess_ai."""
+
+def test_timeout_takes_back_moves():
+  lzch = LaserChess(ACE)
+  with pytest.raises(SearchTimeout):
+    _minimax_filtered(lzch, 3, FIRST, distinct_legal_moves,
+                      deadline=time.perf_counter() + 0.01)
+  assert (lzch.board == ACE).all()
+  assert lzch.turn == FIRST
+  assert lzch.zobrist_key == LaserChess(ACE).zobrist_key
+
+@pytest.mark.parametrize("time_limit_ms", (1, 300))
+def test_iterative_deepening_keeps_time(time_limit_ms):
+  lzch = LaserChess(SOPHIE)
+  start = time.perf_counter()
+  points, coord, move = iterative_deepening(lzch, time_limit_ms, SECOND)
+  # depth 1 always finishes, which can take a little longer than 1 ms
+  assert time.perf_counter() - start < time_limit_ms / 1000 + 0.2
+  assert (coord, move) in list(lzch.legal_moves(SECOND))
+  assert (lzch.board == SOPHIE).all()
+
+def test_iterative_deepening_matches_minimax():
+  lzch = LaserChess(GRAIL)
+  assert iterative_deepening(lzch, 60000, FIRST, max_depth=2) == \
+         minimax(lzch, 2, FIRST)
+
+def test_iterative_deepening_stops_at_win():
+  lzch = LaserChess(ACE)
+  lzch.board[0, 5] = 0
+  lzch.board[lzch.laser_path(FIRST).path[1]] = KING_2
+  lzch.rehash()
+  # FIRST's laser already points at the king, so keeping it there wins
+  assert iterative_deepening(lzch, 60000, FIRST)[0] == inf
+
+def test_move_ordering():
+  lzch = LaserChess(ACE)
+  moves = list(lzch.legal_moves(FIRST))
+  ordering = MoveOrdering()
+  ordering.cutoff(FIRST, 1, 2, (7, 3), N, True)
+  ordering.cutoff(FIRST, 3, 2, (7, 5), NE, False)
+  ordering.cutoff(FIRST, 3, 3, (7, 5), NE, True)
+  ordering.cutoff(FIRST, 3, 1, (7, 2), NW, False)
+  assert ordering.killers[3] == [((7, 2), NW), ((7, 5), NE)]
+  assert ordering.history[(FIRST, (7, 5), NE)] == 13
+  assert ordering.first_move_cutoff_rate == 0.5
+
+  ordered = ordering.order(lzch, moves, FIRST, 3, ((6, 7), N))
+  assert len(ordered) == len(moves) and set(ordered) == set(moves)
+  assert ordered[0] == ((6, 7), N)
+  laser_mask = lzch.laser_path(FIRST).mask | lzch.laser_path(SECOND).mask
+  touching = [move_square_mask(coord, move) & laser_mask != 0
+              for coord, move in ordered[1:]]
+  laser_moves = touching.count(True)
+  assert touching == [True] * laser_moves + [False] * (len(touching) - laser_moves)
+  # killers come next, the one with the better history first
+  assert ordered[laser_moves + 1:laser_moves + 3] == \
+         [((7, 5), NE), ((7, 2), NW)]
+  assert ordered[laser_moves + 3] == ((7, 3), N)
+
+@pytest.mark.parametrize("setup", (ACE, CURIOSITY, MERCURY))
+def test_ordering_keeps_scores(setup):
+  lzch = LaserChess(setup)
+  ordering = MoveOrdering()
+  for depth in (1, 2):
+    unordered = _minimax_filtered(lzch, depth, SECOND, distinct_legal_moves)
+    ordered = _minimax_filtered(lzch, depth, SECOND, distinct_legal_moves,
+                                ordering=ordering)
+    assert ordered[0] == unordered[0]
+  assert ordering.cutoffs > 0
+
+@pytest.mark.parametrize("setup", (ACE, SOPHIE, TACTICAL_BOARD))
+def test_moves_that_change_captures(setup):
+  lzch = LaserChess(setup)
+  for player in PLAYER:
+    init_captures = laser_captures(lzch)
+    changing = []
+    for coord, move in lzch.legal_moves(player, distinct=True):
+      test_board = LaserChess(setup)
+      test_board.make_move(coord, move, player)
+      if laser_captures(test_board) != init_captures:
+        changing.append((coord, move))
+    assert moves_that_change_captures(lzch, player) == changing
+    assert (lzch.board == setup).all()
+
+def test_quiescence():
+  lzch = LaserChess(TACTICAL_BOARD)
+  assert _quiescence(lzch, FIRST, -inf, inf, 0) == \
+         evaluate_board(lzch, FIRST) < inf
+  assert _quiescence(lzch, FIRST, -inf, inf, 1) == inf
+  assert (lzch.board == TACTICAL_BOARD).all()
+  # a capture that can't beat beta isn't looked for
+  assert _quiescence(lzch, FIRST, -inf, -100, 2) == \
+         evaluate_board(lzch, FIRST)
+
+def scratch_evaluate_board(lzch: LaserChess, player: int) -> float:
+  """
+  evaluate_board as it was before LaserChess kept its terms up to date.
+  """
+  if lzch.winner != 0:
+    return inf * lzch.winner
+  eval_points = PIECE_VALUE * (count_player_pieces(lzch, FIRST) -
+                               count_player_pieces(lzch, SECOND))
+  path1 = lzch._trace_laser(FIRST)[0]
+  path2 = lzch._trace_laser(SECOND)[0]
+  laser1_end = path1[-1]
+  laser2_end = path2[-1]
+  laser_engaged_pieces = 0
+  for coord in set(path1) | set(path2):
+    if lzch.board[coord] > 0:
+      laser_engaged_pieces += 1
+    elif lzch.board[coord] < 0:
+      laser_engaged_pieces -= 1
+  eval_points += PIECE_VALUE * FUTURE_SIGHT * laser_engaged_pieces
+  king1_coord = find_king(lzch.board, FIRST)
+  king2_coord = find_king(lzch.board, SECOND)
+  king_eval1 = eval_laser_in_kings(laser1_end, king1_coord, king2_coord)
+  king_eval2 = eval_laser_in_kings(laser2_end, king1_coord, king2_coord)
+  if player == FIRST:
+    if king1_coord in {laser1_end, laser2_end}:
+      eval_points -= KING_VALUE
+    elif king2_coord == laser1_end:
+      eval_points += KING_VALUE * FUTURE_SIGHT
+    else:
+      eval_points += king_eval1 + king_eval2
+  elif player == SECOND:
+    if king2_coord in {laser2_end, laser1_end}:
+      eval_points += KING_VALUE
+    elif king1_coord == laser2_end:
+      eval_points -= KING_VALUE * FUTURE_SIGHT
+    else:
+      eval_points += king_eval1 + king_eval2
+  return eval_points
+
+def test_evaluate_board_unchanged():
+  rng = random.Random(150)
+  for setup in (ACE, CURIOSITY, GRAIL, MERCURY, SOPHIE, TACTICAL_BOARD):
+    lzch = LaserChess(setup)
+    for _ in range(80):
+      for player in PLAYER:
+        assert evaluate_board(lzch, player) == \
+               scratch_evaluate_board(lzch, player)
+      if lzch.winner != 0:
+        break
+      lzch.push(*rng.choice(list(lzch.legal_moves())))
+
+def test_evaluate_boards():
+  rng = random.Random(16)
+  for setup in (ACE, CURIOSITY, GRAIL, MERCURY, SOPHIE, TACTICAL_BOARD):
+    lzch = LaserChess(setup)
+    for _ in range(20):
+      if lzch.winner != 0:
+        break
+      moves = list(lzch.legal_moves())
+      children = []
+      for coord, move in moves:
+        lzch.push(coord, move)
+        children.append(lzch.copy())
+        lzch.pop()
+      boards = np.array([child.board for child in children])
+      for player in PLAYER:
+        assert list(evaluate_boards(boards, player)) == \
+               [evaluate_board(child, player) for child in children]
+      lzch.push(*rng.choice(moves))
+
+def test_batch_leaves_keeps_scores():
+  for setup in (ACE, SOPHIE, TACTICAL_BOARD):
+    lzch = LaserChess(setup)
+    for depth in (1, 2):
+      assert _minimax_filtered(lzch, depth, SECOND, distinct_legal_moves,
+                               batch_leaves=True)[0] == \
+             _minimax_filtered(lzch, depth, SECOND, distinct_legal_moves)[0]
+
+def tried_laser_changes(lzch: LaserChess, player: int):
+  """
+  Finds the moves that change a laser by making each of them.
+  """
+  init_lasers = (lzch.laser_path(FIRST), lzch.laser_path(SECOND))
+  changing = []
+  for coord, move in lzch.legal_moves(player):
+    test_board = lzch.copy()
+    test_board.make_move(coord, move, player)
+    if (test_board.laser_path(FIRST), test_board.laser_path(SECOND)) != \
+       init_lasers:
+      changing.append((coord, move))
+  return changing
+
+@pytest.mark.parametrize("setup", (ACE, CURIOSITY, GRAIL, MERCURY, SOPHIE))
+def test_moves_that_change_laser(setup):
+  lzch = LaserChess(setup)
+  for player in PLAYER:
+    key = lzch.zobrist_key
+    changing = moves_that_change_laser(lzch, player)
+    assert changing == tried_laser_changes(lzch, player)
+    assert (lzch.board == setup).all()
+    assert lzch.zobrist_key == key
+    assert lzch.turn == FIRST and lzch._move_stack == []
+    assert legal_minus_laser(lzch, player) == \
+           set(lzch.legal_moves(player)) - set(changing)
+
+def test_search_stats():
+  lzch = LaserChess(GRAIL)
+  stats = SearchStats()
+  assert minimax(lzch, 2, FIRST, stats=stats) == minimax(lzch, 2, FIRST)
+  assert stats.nodes[0] == 1
+  assert stats.nodes[1] == len(distinct_legal_moves(lzch, FIRST))
+  # every position past the depth-0 ones is a quiescence node, and each
+  # is evaluated once
+  assert stats.quiescence_nodes > 0
+  assert stats.leaves <= stats.nodes[2] + stats.quiescence_nodes
+  assert stats.total_nodes == sum(stats.nodes) + stats.quiescence_nodes
+  assert 0 < stats.first_move_cutoffs <= stats.cutoffs
+  assert 0 < stats.laser_time < stats.elapsed
+  assert 0 < stats.push_time < stats.elapsed
+  assert stats.nodes_per_second > 0
+  assert "cutoffs" in str(stats)
+  # without quiescence search, the leaves are the depth-0 positions (not
+  # counting those the table has) and nothing is counted twice
+  stats = SearchStats()
+  minimax(lzch, 2, FIRST, stats=stats, quiescence_depth=0)
+  assert stats.quiescence_nodes == 0
+  assert 0 < stats.leaves <= stats.nodes[2]
+  assert stats.total_nodes == sum(stats.nodes)
+  # a position where a king was hit is a leaf too
+  stats = SearchStats()
+  minimax(LaserChess(TACTICAL_BOARD), 1, FIRST, stats=stats,
+          quiescence_depth=0)
+  assert stats.leaves == stats.nodes[1]
+
+def test_iterative_deepening_reports():
+  lzch = LaserChess(ACE)
+  reports = []
+  stats = SearchStats()
+  move_thought = iterative_deepening(
+    lzch, 60000, SECOND, max_depth=3, stats=stats,
+    report=lambda depth, thought, iteration_stats:
+      reports.append((depth, thought, iteration_stats)))
+  assert [depth for depth, _, _ in reports] == [1, 2, 3]
+  assert reports[-1][1] == move_thought
+  assert [len(iteration_stats.nodes) for _, _, iteration_stats in reports] \
+         == [2, 3, 4]
+  assert stats.total_nodes == sum(iteration_stats.total_nodes
+                                  for _, _, iteration_stats in reports)
+  assert stats.cutoffs == sum(iteration_stats.cutoffs
+                              for _, _, iteration_stats in reports)
+
+def test_null_move_allowed():
+  lzch = LaserChess(ACE)
+  assert _null_move_allowed(lzch, FIRST, -inf, -100)
+  assert not _null_move_allowed(lzch, FIRST, -inf, inf)
+  assert not _null_move_allowed(lzch, FIRST, -inf, 100)
+  assert _null_move_allowed(lzch, SECOND, 100, inf)
+  # a king on the other laser's path can't pass
+  lzch.board[0, 5] = 0
+  lzch.board[lzch.laser_path(FIRST).path[1]] = KING_2
+  lzch.rehash()
+  assert not _null_move_allowed(lzch, SECOND, 100, inf)
+
+def test_selective_search():
+  lzch = LaserChess(MERCURY)
+  full_stats = SearchStats()
+  minimax(lzch, 4, FIRST, stats=full_stats, quiescence_depth=0)
+  for options in ({"null_move": True}, {"late_move_reductions": True}):
+    stats = SearchStats()
+    points, coord, move = minimax(lzch, 4, FIRST, stats=stats,
+                                  quiescence_depth=0, **options)
+    assert stats.total_nodes < full_stats.total_nodes
+    assert (coord, move) in list(lzch.legal_moves(FIRST))
+    assert (lzch.board == MERCURY).all()
+    # a win in one isn't pruned away
+    assert minimax(LaserChess(TACTICAL_BOARD), 4, FIRST, quiescence_depth=0,
+                   **options)[0] == inf
+
+@pytest.mark.parametrize("setup", (ACE, SOPHIE))
+def test_principal_variation(setup):
+  lzch = LaserChess(setup)
+  pv = []
+  points, coord, move = minimax(lzch, 3, FIRST, pv=pv)
+  assert pv[0] == (coord, move) and len(pv) == 3
+  assert (lzch.board == setup).all()
+  # the line is legal, and its last position scores what minimax did
+  player = FIRST
+  for line_coord, line_move in pv:
+    assert (line_coord, line_move) in list(lzch.legal_moves(player))
+    lzch.push(line_coord, line_move, player)
+    player = -player
+  assert points == _quiescence(lzch, player, -inf, inf, QUIESCENCE_DEPTH)
+  id_pv = []
+  iterative_deepening(LaserChess(setup), 60000, FIRST, max_depth=3, pv=id_pv)
+  assert id_pv == pv
+
+def test_multi_pv():
+  lzch = LaserChess(SOPHIE)
+  best = multi_pv(lzch, 2, FIRST, k=3)
+  assert len(best) == 3 and (lzch.board == SOPHIE).all()
+  assert best[0].score == minimax(LaserChess(SOPHIE), 2, FIRST)[0]
+  # each score is exact: what searching after the move finds
+  exact = []
+  for coord, move in distinct_legal_moves(lzch, FIRST):
+    lzch.push(coord, move, FIRST)
+    exact.append(minimax(lzch, 1, SECOND)[0])
+    lzch.pop()
+  exact.sort(reverse=True)
+  assert [root_move.score for root_move in best] == exact[:3]
+  for root_move in best:
+    assert root_move.pv[0] == (root_move.coord, root_move.move)
+  assert [root_move.score for root_move in multi_pv(lzch, 2, SECOND, k=2)] \
+         == sorted(score for score, *_ in multi_pv(lzch, 2, SECOND, k=50))[:2]
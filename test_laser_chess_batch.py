@@ -0,0 +1,67 @@
+from laser_chess import *
+from laser_chess_consts import *
+from laser_chess_batch import *
+import random
+
+"""This tests that tracing many lasers at once agrees with LaserChess."""
+
+def random_boards(n: int, seed: int = 0):
+  """
+  Makes n random boards with both lasers and kings, and other pieces
+  scattered on them, and a random player to shoot on each.
+  """
+  rng = random.Random(seed)
+  pieces = [piece for piece in REFLECTION_TABLE
+            if find_piece(piece) in {DEFLECTOR, SWITCH, DEFENDER}]
+  boards = np.zeros((n, ROWS, COLUMNS), dtype=BOARD_DTYPE)
+  for board in boards:
+    board[0, 0] = rng.choice([LASER_H2, LASER_V2])
+    board[ROWS - 1, COLUMNS - 1] = rng.choice([LASER_H1, LASER_V1])
+    squares = rng.sample(range(1, ROWS * COLUMNS - 1), rng.randint(2, 40))
+    board[SQUARE_COORD[squares[0]]] = KING_1
+    board[SQUARE_COORD[squares[1]]] = KING_2
+    for square in squares[2:]:
+      board[SQUARE_COORD[square]] = rng.choice(pieces)
+  players = np.array([rng.choice([FIRST, SECOND]) for _ in range(n)])
+  return boards, players
+
+def test_random_boards_agree():
+  boards, players = random_boards(2000)
+  end_squares, captured, path_masks = trace_lasers(boards, players, paths=True)
+  for i in range(len(boards)):
+    path, hit = LaserChess(boards[i])._trace_laser(players[i])
+    assert tuple(end_squares[i]) == path[-1]
+    assert captured[i] == (boards[i][path[-1]] if hit else 0)
+    assert set(zip(*np.nonzero(path_masks[i]))) == set(path)
+
+def test_standard_setups():
+  setups = np.array([ACE, CURIOSITY, GRAIL, MERCURY, SOPHIE])
+  for player in PLAYER:
+    end_squares, captured = trace_lasers(setups, player)
+    for i, setup in enumerate(setups):
+      piece, path = LaserChess(setup)._shoot_laser_path_piece(player)
+      assert tuple(end_squares[i]) == path[-1]
+      assert captured[i] == (0 if piece is None else piece)
+
+def test_empty_batch():
+  end_squares, captured = trace_lasers(
+    np.zeros((0, ROWS, COLUMNS), dtype=BOARD_DTYPE), FIRST)
+  assert end_squares.shape == (0, 2)
+  assert captured.shape == (0,)
+
+def test_boards_after_moves():
+  rng = random.Random(16)
+  for setup in (ACE, CURIOSITY, GRAIL, MERCURY, SOPHIE):
+    lzch = LaserChess(setup)
+    for _ in range(20):
+      if lzch.winner != 0:
+        break
+      player = lzch.turn
+      moves = list(lzch.legal_moves(player))
+      boards = boards_after_moves(lzch.board, player, moves)
+      assert boards.shape == (len(moves), ROWS, COLUMNS)
+      for board, (coord, move) in zip(boards, moves):
+        lzch.push(coord, move, player)
+        assert (lzch.board == board).all()
+        lzch.pop()
+      lzch.push(*rng.choice(moves))
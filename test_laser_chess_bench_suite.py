@@ -0,0 +1,46 @@
+from laser_chess_bench_suite import *
+
+"""This tests the benchmark suite's bookkeeping, not the engine's speed."""
+
+def make_run(results, machine = "a"):
+  return {"date": "", "commit": None, "machine": {"name": machine},
+          "results": results}
+
+def test_find_regressions():
+  history = [make_run({"x": seconds, "y": 1.0}) for seconds in
+             (9.0, 1.0, 1.2, 0.8, 1.1, 0.9)] + \
+            [make_run({"x": 0.1}, machine = "b")]
+  # the median of the last 5 on machine a is 1.0
+  assert find_regressions(history, make_run({"x": 1.19, "y": 1.0})) == {}
+  assert find_regressions(history, make_run({"x": 1.3, "y": 1.0})) == \
+         {"x": (1.3, 1.0)}
+  assert find_regressions(history, make_run({"x": 1.3}), threshold = 0.5) \
+         == {}
+  # with a window of 6, the 9.0 counts, and the median is 1.05
+  assert find_regressions(history, make_run({"x": 1.25})) != {}
+  assert find_regressions(history, make_run({"x": 1.25}), window = 6) == {}
+  # other machines and new workloads aren't compared
+  assert find_regressions(history, make_run({"x": 5.0}, machine = "c")) == {}
+  assert find_regressions(history, make_run({"z": 5.0})) == {}
+
+def test_run_suite_and_history(tmp_path):
+  calls = []
+  suite = {"append": Workload(lambda: calls.append(1), repeat = 2)}
+  results = run_suite(suite)
+  assert list(results) == ["append"] and results["append"] >= 0
+  assert len(calls) == 2
+  path = tmp_path / "history.json"
+  assert load_history(path) == []
+  run = {"date": "", "commit": git_commit(), "machine": machine_info(),
+         "results": results}
+  save_history([run], path)
+  assert load_history(path) == [run]
+
+def test_workloads():
+  suite = workloads(max_depth = 3)
+  assert "minimax SOPHIE depth 3" in suite
+  assert "minimax tactical depth 2" in suite
+  assert not "minimax ACE depth 4" in suite
+  assert "push, evaluate_board, pop x 10k" in suite
+  assert "_shoot_laser_path_piece x 100k" in suite
+  assert workloads()["minimax ACE depth 4"].repeat == 1
@@ -0,0 +1,109 @@
+from laser_chess import *
+from laser_chess_consts import *
+from laser_chess_bitboard import *
+import laser_chess_ai
+import random
+import pytest
+
+"""This tests that the bitboard engine agrees with LaserChess."""
+
+SETUPS = (ACE, CURIOSITY, GRAIL, MERCURY, SOPHIE)
+
+def slow_legal_moves(lzch: LaserChess, player: int):
+  """
+  Finds the legal moves of player by trying every move on LaserChess.
+  """
+  legal_moves = []
+  for coord in zip(*np.where(np.sign(lzch.board) == player)):
+    coord = (int(coord[0]), int(coord[1]))
+    for move in MOVE_ORDER:
+      if lzch.push(coord, move, player, laser=False) is not None:
+        lzch.pop()
+        legal_moves.append((coord, move))
+  return legal_moves
+
+def assert_same_game(game: LaserChess, bitboard: BitboardLaserChess):
+  assert (game.board == bitboard.board).all()
+  assert game.turn == bitboard.turn
+  assert game.winner == bitboard.winner
+  assert game.zobrist_key == bitboard.zobrist_key
+  for player in PLAYER:
+    assert game.piece_count(player) == bitboard.piece_count(player)
+    assert game.king_coord(player) == bitboard.king_coord(player)
+  assert game.laser_engaged_pieces() == bitboard.laser_engaged_pieces()
+  for player in PLAYER:
+    assert laser_chess_ai.evaluate_board(game, player) == \
+           laser_chess_ai.evaluate_board(bitboard, player)
+
+@pytest.mark.parametrize("setup", SETUPS)
+def test_random_games_agree(setup):
+  rng = random.Random(int(setup.sum()))
+  for _ in range(5):
+    game = LaserChess(setup)
+    bitboard = BitboardLaserChess(setup)
+    for _ in range(60):
+      if game.winner != 0:
+        break
+      player = game.turn
+      legal_moves = slow_legal_moves(game, player)
+      assert list(bitboard.legal_moves(player)) == legal_moves
+      for opponent_laser in PLAYER:
+        assert game._trace_laser(opponent_laser) == \
+               bitboard._trace_laser(opponent_laser)
+        assert game.laser_path(opponent_laser) == \
+               bitboard.laser_path(opponent_laser)
+
+      assert laser_chess_ai.moves_that_change_laser(game, player) == \
+             laser_chess_ai.moves_that_change_laser(bitboard, player)
+
+      coord, move = rng.choice(legal_moves)
+      assert game.move_then_laser(coord, move) == \
+             bitboard.move_then_laser(coord, move)
+      assert_same_game(game, bitboard)
+
+def test_illegal_moves_agree():
+  game = LaserChess(ACE)
+  bitboard = BitboardLaserChess(ACE)
+  for coord in SQUARE_COORD:
+    for move in MOVE_ORDER:
+      for player in (FIRST, SECOND, None):
+        assert game.make_move(coord, move, player) == \
+               bitboard.make_move(coord, move, player)
+        assert_same_game(game, bitboard)
+
+def test_push_pop_agree():
+  game = LaserChess(SOPHIE)
+  bitboard = BitboardLaserChess(SOPHIE)
+  records = []
+  for coord, move in [((6, 6), N), ((5, 0), CW), ((5, 4), CW), ((1, 3), S)]:
+    records.append(game.push(coord, move))
+    assert bitboard.push(coord, move) == records[-1]
+    assert_same_game(game, bitboard)
+  for record in reversed(records):
+    assert bitboard.pop() == game.pop() == record
+    assert_same_game(game, bitboard)
+
+def test_copy_after_pop():
+  bitboard = BitboardLaserChess(ACE)
+  bitboard.push((7, 4), N)
+  bitboard.push((0, 5), S)
+  copied = bitboard.copy()
+  bitboard.pop()
+  assert bitboard.push((6, 4), NE, FIRST) is not None
+  expected = LaserChess(ACE)
+  expected.push((7, 4), N)
+  copied.pop()
+  assert (copied.board == expected.board).all()
+  assert list(copied.legal_moves(SECOND)) == \
+         list(expected.legal_moves(SECOND))
+  copied.pop()
+  assert (copied.board == ACE).all()
+  assert copied.zobrist_key == LaserChess(ACE).zobrist_key
+
+def test_minimax_agrees():
+  for setup in (ACE, SOPHIE):
+    game = LaserChess(setup)
+    bitboard = BitboardLaserChess(setup)
+    assert laser_chess_ai.minimax(game, 2, FIRST, quiescence_depth=1) == \
+           laser_chess_ai.minimax(bitboard, 2, FIRST, quiescence_depth=1)
+    assert_same_game(game, bitboard)
@@ -0,0 +1,71 @@
+from laser_chess import *
+from laser_chess_consts import *
+from laser_chess_book import *
+from laser_chess_tt import position_key
+import laser_chess_ai
+from math import inf
+
+"""This tests the opening book."""
+
+def test_save_and_load(tmp_path):
+  book = OpeningBook()
+  book.add(3, BookEntry(1.5, (7, 3), N, 4))
+  book.add(2 ** 64 - 1, BookEntry(-inf, (0, 6), CCW, 2))
+  book.add(5, BookEntry(inf, None, None, 0))
+  path = tmp_path / "book.npy"
+  book.save(path)
+  # a small header, then 19 bytes a position
+  assert path.stat().st_size <= 256 + 3 * BOOK_DTYPE.itemsize
+  loaded = OpeningBook.load(path)
+  assert len(loaded) == 3
+  for key in (3, 2 ** 64 - 1, 5):
+    assert loaded.get(key) == book.get(key)
+  assert loaded.get(4) is None
+
+def test_deeper_entries_stay():
+  book = OpeningBook()
+  book.add(7, BookEntry(1.0, (7, 3), N, 4))
+  book.add(7, BookEntry(2.0, (7, 4), N, 3))
+  assert book.get(7).score == 1.0
+  book.add(7, BookEntry(3.0, (7, 5), N, 4))
+  assert book.get(7).score == 3.0
+
+def test_build_book(tmp_path):
+  path = tmp_path / "book.npy"
+  book = build_book(path, plies=2, depth=1, width=2, workers=1,
+                    setups={"ACE": ACE})
+  lzch = LaserChess(ACE)
+  # the setup, and the two positions FIRST's book moves lead to
+  assert len(book) == 3
+  score, coord, move = laser_chess_ai.minimax(lzch, 1, FIRST)
+  assert book.lookup(lzch, FIRST) == (score, coord, move, 1)
+  lzch.push(coord, move, FIRST)
+  assert book.lookup(lzch, SECOND).coord is not None
+  assert len(OpeningBook.load(path)) == 3
+
+def test_build_book_resumes(tmp_path):
+  path = tmp_path / "book.npy"
+  build_book(path, plies=1, depth=1, width=2, workers=1, setups={"ACE": ACE})
+  resumed = build_book(path, plies=2, depth=1, width=2, workers=1,
+                       setups={"ACE": ACE})
+  fresh = build_book(tmp_path / "fresh.npy", plies=2, depth=1, width=2,
+                     workers=1, setups={"ACE": ACE})
+  assert len(resumed) == len(fresh)
+  for key in fresh._entries:
+    assert resumed.get(key) == fresh.get(key)
+
+def test_search_uses_book():
+  lzch = LaserChess(SOPHIE)
+  book = OpeningBook()
+  # a move no search would pick, to tell the book was used
+  book.add(position_key(lzch, SECOND), BookEntry(0.0, (0, 0), CW, 3))
+  assert laser_chess_ai.minimax(lzch, 2, SECOND, book=book) == \
+         (0.0, (0, 0), CW)
+  assert laser_chess_ai.iterative_deepening(lzch, 10, SECOND, book=book) == \
+         (0.0, (0, 0), CW)
+  # searches deeper than the book's aren't answered by it
+  assert laser_chess_ai.minimax(lzch, 1, FIRST, book=book) == \
+         laser_chess_ai.minimax(lzch, 1, FIRST)
+  book.add(position_key(lzch, FIRST), BookEntry(0.0, (0, 0), CW, 1))
+  assert laser_chess_ai.minimax(lzch, 2, FIRST, book=book) == \
+         laser_chess_ai.minimax(lzch, 2, FIRST)
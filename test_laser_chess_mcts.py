@@ -0,0 +1,64 @@
+from laser_chess import *
+from laser_chess_consts import *
+from laser_chess_mcts import *
+from laser_chess_ai import TACTICAL_BOARD
+import pytest
+import time
+
+"""This tests the Monte Carlo tree search."""
+
+@pytest.mark.parametrize("setup", (ACE, SOPHIE))
+def test_search_leaves_board(setup):
+  lzch = LaserChess(setup)
+  engine = MCTS(seed=20)
+  score, coord, move = engine.search(lzch, SECOND, iterations=150)
+  assert engine.iterations == 150
+  assert (coord, move) in list(lzch.legal_moves(SECOND))
+  assert -1 <= score <= 1
+  assert (lzch.board == setup).all() and lzch.turn == FIRST
+  assert lzch.zobrist_key == LaserChess(setup).zobrist_key
+  assert engine.root.visits == 150
+  assert sum(child.visits for child in engine.root.children) == 150
+
+def test_finds_winning_move():
+  lzch = LaserChess(TACTICAL_BOARD)
+  score, coord, move = mcts(lzch, FIRST, iterations=300, seed=1)
+  assert score == inf
+  lzch.push(coord, move, FIRST)
+  assert lzch.winner == FIRST
+
+def test_time_limit():
+  lzch = LaserChess(GRAIL)
+  engine = MCTS(seed=3)
+  start = time.perf_counter()
+  engine.search(lzch, FIRST, time_limit_ms=200)
+  assert time.perf_counter() - start < 0.4
+  assert engine.iterations > 1
+  # with both, whichever runs out first stops it
+  engine.search(lzch, FIRST, iterations=5, time_limit_ms=60000)
+  assert engine.iterations == 5
+  # even when the iterations are the default number
+  engine.search(lzch, FIRST, iterations=DEFAULT_ITERATIONS,
+                time_limit_ms=60000)
+  assert engine.iterations == DEFAULT_ITERATIONS
+
+def test_same_seed_same_search():
+  lzch = LaserChess(CURIOSITY)
+  assert mcts(lzch, FIRST, 100, seed=7) == mcts(lzch, FIRST, 100, seed=7)
+
+def test_tree_reuse():
+  lzch = LaserChess(MERCURY)
+  engine = MCTS(seed=5)
+  score, coord, move = engine.search(lzch, FIRST, iterations=300)
+  lzch.push(coord, move, FIRST)
+  reply = max(engine.root.children, key=lambda child: child.visits)
+  reply = max(reply.children, key=lambda child: child.visits)
+  lzch.push(reply.coord, reply.move, SECOND)
+  kept = reply.visits
+  assert kept > 0
+  engine.search(lzch, FIRST, iterations=50)
+  assert engine.root is reply and engine.root.parent is None
+  assert engine.root.visits == kept + 50
+  # a position the tree hasn't reached starts a new one
+  engine.search(LaserChess(ACE), FIRST, iterations=10)
+  assert engine.root.visits == 10
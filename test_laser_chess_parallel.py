@@ -0,0 +1,26 @@
+from laser_chess import *
+from laser_chess_consts import *
+from laser_chess_bitboard import BitboardLaserChess
+from laser_chess_parallel import parallel_minimax
+import laser_chess_ai
+import pytest
+from math import inf
+
+"""This tests that the parallel search finds the same scores as minimax."""
+
+@pytest.mark.parametrize("setup", (ACE, GRAIL, SOPHIE))
+def test_same_score_as_minimax(setup):
+  lzch = LaserChess(setup)
+  for player in PLAYER:
+    score, coord, move = parallel_minimax(lzch, 2, player, workers=2)
+    assert score == laser_chess_ai.minimax(lzch, 2, player)[0]
+    assert (coord, move) in list(lzch.legal_moves(player))
+    assert (lzch.board == setup).all()
+
+def test_bitboard_and_won_games():
+  bitboard = BitboardLaserChess(CURIOSITY)
+  assert parallel_minimax(bitboard, 2, FIRST, workers=2)[0] == \
+         laser_chess_ai.minimax(LaserChess(CURIOSITY), 2, FIRST)[0]
+  lzch = LaserChess(ACE)
+  lzch.winner = SECOND
+  assert parallel_minimax(lzch, 2, FIRST, workers=2) == (-inf, None, None)
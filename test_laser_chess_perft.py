@@ -0,0 +1,28 @@
+from laser_chess import *
+from laser_chess_bitboard import BitboardLaserChess
+from laser_chess_consts import *
+from laser_chess_perft import *
+import pytest
+
+"""This checks move generation against the perft counts."""
+
+@pytest.mark.parametrize("setup_name", STANDARD_SETUPS)
+@pytest.mark.parametrize("engine", (LaserChess, BitboardLaserChess))
+def test_perft_counts(engine, setup_name):
+  setup = STANDARD_SETUPS[setup_name]
+  lzch = engine(setup)
+  for depth, expected in enumerate(PERFT_COUNTS[setup_name], 1):
+    assert perft(lzch, depth) == expected
+  assert (lzch.board == setup).all()
+  assert lzch.turn == FIRST and lzch.zobrist_key == LaserChess(setup).zobrist_key
+
+def test_divide():
+  lzch = LaserChess(SOPHIE)
+  counts = divide(lzch, 2)
+  assert len(counts) == PERFT_COUNTS["SOPHIE"][0]
+  assert sum(counts.values()) == PERFT_COUNTS["SOPHIE"][1]
+
+def test_perft_of_finished_game():
+  lzch = LaserChess(ACE)
+  lzch.winner = FIRST
+  assert perft(lzch, 2) == 0
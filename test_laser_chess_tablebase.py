@@ -0,0 +1,130 @@
+from laser_chess import *
+from laser_chess_consts import *
+from laser_chess_tablebase import *
+from laser_chess_tablebase import _positions
+import laser_chess_ai
+import pytest
+import random
+
+"""This tests the endgame tablebases."""
+
+def test_material_names():
+  assert material_name(()) == "KLvKL"
+  assert material_name(normalize_material((-SWITCH, DEFLECTOR, DEFLECTOR))) \
+         == "KLDDvKLS"
+  assert parse_material("KLDDvKLS") == (DEFLECTOR, DEFLECTOR, -SWITCH)
+  assert parse_material("KLvKLF") == (-DEFENDER,)
+  assert sub_materials((DEFLECTOR, DEFLECTOR, -SWITCH)) == \
+         [(DEFLECTOR, -SWITCH), (DEFLECTOR, DEFLECTOR)]
+
+def test_index():
+  table = Tablebase((DEFLECTOR, DEFLECTOR))
+  board = make_empty_board()
+  board[7, 4] = KING_1
+  board[0, 5] = KING_2
+  board[3, 3] = FLEC_NW1
+  assert table.index(board, FIRST) is None
+  board[2, 6] = FLEC_SE1
+  indices = {table.index(board, player) for player in PLAYER}
+  assert len(indices) == 2 and all(0 <= index < table.size
+                                   for index in indices)
+  board[2, 6] = FLEC_SE2
+  assert table.index(board, FIRST) is None
+
+@pytest.fixture(scope="module")
+def bare_tablebase(tmp_path_factory):
+  directory = tmp_path_factory.mktemp("tablebases")
+  build_tablebase((), Tablebases(None), directory)
+  return Tablebases(directory)
+
+def test_load_memory_mapped(bare_tablebase):
+  assert len(bare_tablebase) == 1 and () in bare_tablebase
+  table = bare_tablebase._tables[()]
+  assert isinstance(table.values, np.memmap)
+  assert table.values.dtype == np.int16 and table.values.size == 51200
+
+def test_results_agree_with_moves(bare_tablebase):
+  """
+  Every decided position and some drawn ones get the best of their moves'
+  results.
+  """
+  rng = random.Random(19)
+  table = bare_tablebase._tables[()]
+  checked = 0
+  for index, board, player in _positions(table):
+    value = int(table.values[index])
+    if value == 0 and rng.random() > 0.02:
+      continue
+    lzch = LaserChess.from_state(BoardState(board, player))
+    assert bare_tablebase.probe(lzch, player) == value
+    move_values = [bare_tablebase.move_value(lzch, coord, move, player)
+                   for coord, move in lzch.legal_moves(player, distinct=True)]
+    wins = [move_value for move_value in move_values if move_value > 0]
+    if value > 0:
+      assert min(wins) == value
+    elif value < 0:
+      assert max(move_values) < 0 and min(move_values) == value
+    else:
+      assert wins == [] and max(move_values) == 0
+    checked += 1
+  assert checked > 1000
+
+def test_search_uses_tablebase(bare_tablebase):
+  board = make_empty_board()
+  board[5, 4] = KING_1
+  board[7, 2] = KING_2  # on FIRST's laser, once it is turned west
+  lzch = LaserChess(board)
+  assert bare_tablebase.probe(lzch, FIRST) == 1
+  score, coord, move = bare_tablebase.best_move(lzch, FIRST)
+  assert (score, coord) == (TABLEBASE_WIN - 1, (7, 9))
+  assert move in ROTATION_MOVES
+  assert laser_chess_ai.minimax(lzch, 3, FIRST,
+                                tablebases=bare_tablebase) == \
+         (score, coord, move)
+  # with SECOND to move, the search below the root takes the tables' scores
+  lzch.turn = SECOND
+  tablebase_eval = bare_tablebase.score(lzch, SECOND)
+  assert laser_chess_ai._minimax_filtered(
+    lzch, 2, SECOND, laser_chess_ai.distinct_legal_moves,
+    tablebases=bare_tablebase, ply=1)[0] == tablebase_eval
+  lzch.turn = FIRST
+  assert bare_tablebase.probe(LaserChess(ACE), FIRST) is None
+
+def test_laser_lined_up_after_capture(bare_tablebase):
+  """
+  FIRST's laser points at SECOND's king, which can happen after the laser
+  hits the piece in between. SECOND, to move, wins by turning its laser.
+  """
+  board = make_empty_board()
+  board[0, 0] = LASER_V2
+  board[7, 9] = LASER_H1
+  board[7, 5] = KING_2
+  board[0, 5] = KING_1
+  lzch = LaserChess.from_state(BoardState(board, SECOND))
+  assert bare_tablebase.probe(lzch, SECOND) == 1
+  assert bare_tablebase.score(lzch, SECOND) == -(TABLEBASE_WIN - 1)
+  assert bare_tablebase.best_move(lzch, SECOND)[1] == (0, 0)
+
+def test_best_move_without_sub_tables():
+  """
+  With only KLvKLF loaded, the result of capturing the defender isn't
+  known, so the tables can't give a move reaching the position's result.
+  """
+  board = make_empty_board()
+  board[5, 4] = KING_1
+  board[0, 5] = KING_2
+  board[7, 5] = make_piece(SECOND, DEFENDER, 1)  # hit by FIRST's laser, turned
+  table = Tablebase((-DEFENDER,))
+  table.values = np.zeros(table.size, dtype=np.int16)
+  # pretend turning the laser is the only way to win
+  table.values[table.index(board, FIRST)] = 3
+  tablebases = Tablebases(None)
+  tablebases.add(table)
+  lzch = LaserChess(board)
+  assert tablebases.probe(lzch, FIRST) == 3
+  assert tablebases.move_value(lzch, (7, 9), CW, FIRST) is None
+  assert tablebases.best_move(lzch, FIRST) is None
+  # so the search searches the root instead
+  points, coord, move = laser_chess_ai.minimax(lzch, 1, FIRST,
+                                               tablebases=tablebases)
+  assert (coord, move) in list(lzch.legal_moves(FIRST))
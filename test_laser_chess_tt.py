@@ -0,0 +1,69 @@
+from laser_chess import *
+from laser_chess_consts import *
+from laser_chess_tt import *
+import laser_chess_ai
+import pytest
+
+"""This tests the transposition table."""
+
+def test_moves_encode_and_decode():
+  for coord in SQUARE_COORD:
+    for move in MOVE_ORDER:
+      assert decode_move(encode_move(coord, move)) == (coord, move)
+  assert decode_move(encode_move(None, None)) == (None, None)
+
+def test_memory_budget():
+  for megabytes in (0.01, 1, 3):
+    table = TranspositionTable(megabytes)
+    assert table.nbytes <= megabytes * 2 ** 20
+    assert table.buckets & (table.buckets - 1) == 0
+  with pytest.raises(AssertionError):
+    TranspositionTable(0)
+
+def test_store_and_probe():
+  table = TranspositionTable(0.01)
+  assert table.probe(12345) is None
+  table.store(12345, 3, 1.5, LOWER, (7, 9), CW)
+  assert table.probe(12345) == (3, 1.5, LOWER, (7, 9), CW)
+  assert table.probe(12345 + table.buckets) is None
+  assert table.hit_rate == 0.5 / 1.5
+
+def test_replacement():
+  table = TranspositionTable(0.01)
+  deep, other, newest = 7, 7 + table.buckets, 7 + 2 * table.buckets
+  table.store(deep, 4, 1.0, EXACT, None, None)
+  # shallower searches go to the always-replace slot
+  table.store(other, 2, 2.0, EXACT, None, None)
+  table.store(newest, 1, 3.0, EXACT, None, None)
+  assert table.probe(deep)[0] == 4
+  assert table.probe(other) is None
+  assert table.probe(newest)[0] == 1
+  # a search as deep takes the depth-preferred slot
+  table.store(other, 4, 2.0, UPPER, None, None)
+  assert table.probe(deep) is None
+  assert table.probe(other)[:3] == (4, 2.0, UPPER)
+  # the same position is always replaced where it is
+  table.store(other, 1, 5.0, EXACT, None, None)
+  assert table.probe(other)[:3] == (1, 5.0, EXACT)
+
+def test_position_key():
+  lzch = LaserChess(ACE)
+  assert position_key(lzch, FIRST) == lzch.zobrist_key
+  assert position_key(lzch, SECOND) == lzch.zobrist_key ^ ZOBRIST_SECOND
+  lzch.turn = SECOND
+  assert position_key(lzch, SECOND) == lzch.zobrist_key
+
+@pytest.mark.parametrize("setup", (ACE, GRAIL, SOPHIE))
+def test_minimax_with_table(setup):
+  lzch = LaserChess(setup)
+  no_table = laser_chess_ai._minimax_filtered(
+    lzch, 2, FIRST, laser_chess_ai.distinct_legal_moves,
+    quiescence_depth=laser_chess_ai.QUIESCENCE_DEPTH)
+  table = TranspositionTable(1)
+  assert laser_chess_ai.minimax(lzch, 2, FIRST, table)[0] == no_table[0]
+  assert (lzch.board == setup).all()
+  probes, hits = table.probes, table.hits
+  # searching again finds the root in the table
+  assert laser_chess_ai.minimax(lzch, 2, FIRST, table)[0] == no_table[0]
+  assert table.probes == probes + 1
+  assert table.hits == hits + 1